@@ -0,0 +1,453 @@
+"""
+Action Record Store
+Storage for issued meal coupons, hotel vouchers, compensations, rebookings and messages,
+backed by append-only JSONL journals or a local SQLite database
+"""
+
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+from json_export import write_json_atomic
+
+# Action type -> base file name (the existing JSON arrays under the data dir)
+ACTION_TYPES = {
+    'meal_coupons': 'meal_coupons.json',
+    'hotel_vouchers': 'hotel_vouchers.json',
+    'compensations': 'compensations.json',
+    'rebookings': 'rebookings.json',
+    'sent_messages': 'sent_messages.json',
+}
+
+# Journal entries accumulated before the journal is folded back into the snapshot
+DEFAULT_COMPACT_THRESHOLD = 1000
+
+# Upper bound on records coalesced into a single group commit
+DEFAULT_MAX_BATCH = 5000
+
+# Default SQLite database file for the sqlite backend
+DEFAULT_DB_FILE = "actions.db"
+
+
+class _CommitTicket:
+    """Completion handle for one submitted group of records"""
+    __slots__ = ('records', 'done', 'error')
+
+    def __init__(self, records: List[Dict]):
+        self.records = records
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommitWriter:
+    """
+    Background writer that coalesces concurrently submitted records into one
+    commit. Callers block until the batch containing their records is durable.
+    `after_commit` (e.g. compaction) runs once they are released; its errors are only logged.
+    """
+
+    def __init__(self, commit: Callable[[List[Dict]], None], name: str = "action-writer", max_batch: int = DEFAULT_MAX_BATCH,
+                 after_commit: Optional[Callable[[], None]] = None):
+        self._commit = commit
+        self._after_commit = after_commit
+        self._max_batch = max_batch
+        self._queue: "queue.Queue[_CommitTicket]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, records: List[Dict]):
+        """Queue records and wait until they are committed; re-raises commit errors"""
+        ticket = _CommitTicket(records)
+        self._queue.put(ticket)
+        ticket.done.wait()
+        if ticket.error is not None:
+            raise ticket.error
+
+    def _run(self):
+        while True:
+            tickets = [self._queue.get()]
+            pending = len(tickets[0].records)
+            # Drain whatever queued up while the previous batch was being written
+            while pending < self._max_batch:
+                try:
+                    ticket = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                tickets.append(ticket)
+                pending += len(ticket.records)
+
+            batch = [record for ticket in tickets for record in ticket.records]
+            error = None
+            try:
+                self._commit(batch)
+            except BaseException as e:
+                print(f"Error committing {len(batch)} action records: {e}")
+                error = e
+            for ticket in tickets:
+                ticket.error = error
+                ticket.done.set()
+
+            # The records are durable; housekeeping must not fail (or delay) their submitters
+            if error is None and self._after_commit is not None:
+                try:
+                    self._after_commit()
+                except Exception as e:
+                    print(f"Error after committing {len(batch)} action records: {e}")
+
+
+class ActionJournal:
+    """
+    One action type stored as a JSON snapshot (`<name>.json`) plus an append-only
+    journal (`<name>.jsonl`). Saves append one line per record; reads replay only
+    the journal bytes added since the previous read. Appends go through a single
+    group-commit writer thread, so concurrent requests share one fsync'd write.
+    """
+
+    def __init__(self, data_dir: str, filename: str, compact_threshold: int = DEFAULT_COMPACT_THRESHOLD):
+        self.snapshot_path = os.path.join(data_dir, filename)
+        self.journal_path = os.path.splitext(self.snapshot_path)[0] + ".jsonl"
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._records: Optional[List[Dict]] = None
+        self._snapshot_mtime = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._writer: Optional[GroupCommitWriter] = None
+
+    def append(self, record: Dict):
+        """Append a single record to the journal"""
+        self.extend([record])
+
+    def extend(self, records: List[Dict]):
+        """Append records to the journal; returns once they are on disk"""
+        if not records:
+            return
+        with self._lock:
+            if self._writer is None:
+                name = os.path.basename(self.journal_path)
+                self._writer = GroupCommitWriter(self._write_batch, name=f"writer-{name}", after_commit=self._maybe_compact)
+        self._writer.submit(records)
+
+    def _write_batch(self, records: List[Dict]):
+        """Commit one coalesced batch: a single append + fsync"""
+        payload = "".join(json.dumps(r) + "\n" for r in records)
+        with self._lock:
+            with open(self.journal_path, 'a') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _maybe_compact(self):
+        """Compact once the journal holds `compact_threshold` entries (runs after a commit)"""
+        with self._lock:
+            self.records()
+            if self._journal_entries >= self.compact_threshold:
+                self.compact()
+
+    def records(self) -> List[Dict]:
+        """All records: the snapshot followed by the replayed journal"""
+        with self._lock:
+            if self._records is None or self._snapshot_changed():
+                self._load_snapshot()
+            self._replay_journal()
+            return self._records
+
+    def compact(self):
+        """Fold the journal into the snapshot and truncate the journal"""
+        with self._lock:
+            records = self.records()
+            write_json_atomic(self.snapshot_path, records, indent=2)
+            open(self.journal_path, 'w').close()
+            self._snapshot_mtime = self._mtime(self.snapshot_path)
+            self._journal_offset = 0
+            self._journal_entries = 0
+
+    @staticmethod
+    def _mtime(path: str):
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _snapshot_changed(self) -> bool:
+        return self._mtime(self.snapshot_path) != self._snapshot_mtime
+
+    def _load_snapshot(self):
+        records = []
+        if os.path.exists(self.snapshot_path):
+            try:
+                with open(self.snapshot_path, 'r') as f:
+                    records = json.load(f)
+            except Exception as e:
+                print(f"Error loading {self.snapshot_path}: {e}")
+        self._records = records if isinstance(records, list) else []
+        self._snapshot_mtime = self._mtime(self.snapshot_path)
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def _replay_journal(self):
+        """Parse journal lines written since the last replay"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size < self._journal_offset:
+                # Journal was truncated by another process; start over from the snapshot
+                self._load_snapshot()
+            if size == self._journal_offset:
+                return
+            f.seek(self._journal_offset)
+            chunk = f.read(size - self._journal_offset)
+
+        # Only consume complete lines; a trailing partial line is picked up next time
+        end = chunk.rfind(b"\n") + 1
+        if not end:
+            return
+        # A crash between snapshot rename and journal truncation leaves entries
+        # that are already in the snapshot; skip those on the first replay
+        seen = {r.get('id') for r in self._records} if self._journal_offset == 0 and self._records else None
+        for line in chunk[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping corrupt journal line in {self.journal_path}: {e}")
+                continue
+            if seen is not None and record.get('id') in seen:
+                continue
+            self._records.append(record)
+            self._journal_entries += 1
+        self._journal_offset += end
+
+
+class JournalBackend:
+    """Action records kept as JSON snapshots plus append-only journals (the default)"""
+
+    name = "journal"
+
+    def __init__(self, data_dir: str, compact_threshold: int = DEFAULT_COMPACT_THRESHOLD):
+        self._journals = {
+            action_type: ActionJournal(data_dir, filename, compact_threshold)
+            for action_type, filename in ACTION_TYPES.items()
+        }
+
+    def extend(self, action_type: str, records: List[Dict]):
+        self._journals[action_type].extend(records)
+
+    def records(self, action_type: str) -> List[Dict]:
+        return self._journals[action_type].records()
+
+    def query(self, action_type: str, filters: Dict[str, str]) -> List[Dict]:
+        # No secondary indexes here; a filtered read is a scan of the replayed records
+        return [r for r in self.records(action_type) if all(_field_value(r, k) == v for k, v in filters.items())]
+
+    def compact(self, action_type: str):
+        self._journals[action_type].compact()
+
+
+class SQLiteBackend:
+    """
+    Action records in a local SQLite database (WAL mode) with indexes on
+    passenger_id, pnr and flight_number. Batches are written with executemany.
+    """
+
+    name = "sqlite"
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS action_records (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            action_type TEXT NOT NULL,
+            record_id TEXT,
+            passenger_id TEXT,
+            pnr TEXT,
+            flight_number TEXT,
+            data TEXT NOT NULL
+        )""",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_action_records_id ON action_records (action_type, record_id)",
+        "CREATE INDEX IF NOT EXISTS idx_action_records_passenger ON action_records (action_type, passenger_id)",
+        "CREATE INDEX IF NOT EXISTS idx_action_records_pnr ON action_records (action_type, pnr)",
+        "CREATE INDEX IF NOT EXISTS idx_action_records_flight ON action_records (action_type, flight_number)",
+    )
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writers: Dict[str, GroupCommitWriter] = {}
+        # Per action type: records read so far and the last seq seen
+        self._cache: Dict[str, List[Dict]] = {}
+        self._cache_seq: Dict[str, int] = {}
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside the writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def extend(self, action_type: str, records: List[Dict]):
+        with self._lock:
+            writer = self._writers.get(action_type)
+            if writer is None:
+                writer = GroupCommitWriter(
+                    lambda batch, action_type=action_type: self.insert_many(action_type, batch),
+                    name=f"writer-sqlite-{action_type}"
+                )
+                self._writers[action_type] = writer
+        writer.submit(records)
+
+    def insert_many(self, action_type: str, records: List[Dict]):
+        """Insert a batch in one transaction; records already present (same id) are skipped"""
+        rows = [
+            (
+                action_type,
+                r.get('id'),
+                _field_value(r, 'passenger_id'),
+                _field_value(r, 'pnr'),
+                _field_value(r, 'flight_number'),
+                json.dumps(r),
+            )
+            for r in records
+        ]
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO action_records "
+                "(action_type, record_id, passenger_id, pnr, flight_number, data) VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def records(self, action_type: str) -> List[Dict]:
+        """All records of a type, fetching only rows added since the previous call"""
+        with self._lock:
+            cached = self._cache.setdefault(action_type, [])
+            last_seq = self._cache_seq.get(action_type, 0)
+            rows = self._conn().execute(
+                "SELECT seq, data FROM action_records WHERE action_type = ? AND seq > ? ORDER BY seq",
+                (action_type, last_seq)
+            ).fetchall()
+            if rows:
+                cached.extend(json.loads(data) for _, data in rows)
+                self._cache_seq[action_type] = rows[-1][0]
+            return cached
+
+    def query(self, action_type: str, filters: Dict[str, str]) -> List[Dict]:
+        clauses = ["action_type = ?"]
+        params = [action_type]
+        for field, value in filters.items():
+            clauses.append(f"{field} = ?")
+            params.append(value)
+        rows = self._conn().execute(
+            f"SELECT data FROM action_records WHERE {' AND '.join(clauses)} ORDER BY seq", params
+        ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def compact(self, action_type: str):
+        # Nothing to fold; SQLite checkpoints its own WAL
+        self._conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+# Fields that can be used to filter action records
+QUERY_FIELDS = ('passenger_id', 'pnr', 'flight_number')
+
+
+def _field_value(record: Dict, field: str):
+    """Indexed field value; rebookings carry their flight as original_flight"""
+    if field == 'flight_number':
+        return record.get('flight_number') or record.get('original_flight')
+    return record.get(field)
+
+
+class ActionStore:
+    """Action records for every action type, stored through a pluggable backend"""
+
+    def __init__(self, data_dir: str, backend: str = "journal", db_path: Optional[str] = None,
+                 compact_threshold: int = DEFAULT_COMPACT_THRESHOLD):
+        self.data_dir = data_dir
+        if backend == "journal":
+            self.backend = JournalBackend(data_dir, compact_threshold)
+        elif backend == "sqlite":
+            self.backend = SQLiteBackend(db_path or os.path.join(data_dir, DEFAULT_DB_FILE))
+        else:
+            raise ValueError(f"Unknown action store backend: {backend}")
+
+    @staticmethod
+    def _check_type(action_type: str):
+        if action_type not in ACTION_TYPES:
+            raise ValueError(f"Unknown action type: {action_type}")
+
+    def append(self, action_type: str, record: Dict):
+        self.extend(action_type, [record])
+
+    def extend(self, action_type: str, records: List[Dict]):
+        """Commit a batch of records; returns once they are durable"""
+        self._check_type(action_type)
+        if records:
+            self.backend.extend(action_type, records)
+
+    def records(self, action_type: str) -> List[Dict]:
+        self._check_type(action_type)
+        return self.backend.records(action_type)
+
+    def query(self, action_type: str, **filters) -> List[Dict]:
+        """Records of a type matching all given passenger_id / pnr / flight_number filters"""
+        self._check_type(action_type)
+        unknown = set(filters) - set(QUERY_FIELDS)
+        if unknown:
+            raise ValueError(f"Unsupported filter(s): {', '.join(sorted(unknown))}")
+        filters = {k: v for k, v in filters.items() if v is not None}
+        return self.backend.query(action_type, filters)
+
+    def compact(self, action_type: Optional[str] = None):
+        """Compact one action type, or all of them"""
+        for name in [action_type] if action_type else ACTION_TYPES:
+            self._check_type(name)
+            self.backend.compact(name)
+
+
+def migrate_to_sqlite(data_dir: str, db_path: str) -> Dict[str, int]:
+    """Import the JSON snapshots and journals of every action type into SQLite"""
+    source = JournalBackend(data_dir)
+    target = SQLiteBackend(db_path)
+    counts = {}
+    for action_type in ACTION_TYPES:
+        records = source.records(action_type)
+        target.insert_many(action_type, records)
+        counts[action_type] = len(records)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain action record storage")
+    parser.add_argument("command", choices=["compact", "migrate"],
+                        help="compact: fold journals into the JSON snapshots; migrate: import JSON records into SQLite")
+    parser.add_argument("--data-dir", default="test_data")
+    parser.add_argument("--db", help=f"SQLite database path (default: <data-dir>/{DEFAULT_DB_FILE})")
+    parser.add_argument("--action-type", choices=sorted(ACTION_TYPES), help="Limit compaction to one action type")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        ActionStore(args.data_dir).compact(args.action_type)
+        print(f"✅ Compacted journals in {args.data_dir}")
+    elif args.command == "migrate":
+        db_path = args.db or os.path.join(args.data_dir, DEFAULT_DB_FILE)
+        counts = migrate_to_sqlite(args.data_dir, db_path)
+        for action_type, count in counts.items():
+            print(f"   {action_type}: {count} record(s)")
+        print(f"✅ Migrated action records to {db_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Background AI Enrichment
+Bounded worker pool that generates per-passenger LLM notes off the request thread, polled by token
+"""
+
+import queue
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_WORKERS = 2
+
+# Workers for bulk (per-flight) enrichments, which have their own queue
+DEFAULT_BULK_WORKERS = 1
+
+# Enrichments waiting for a worker before new ones are refused (a full widebody fits)
+DEFAULT_MAX_QUEUE = 512
+
+# Queued bulk enrichments a worker takes at once when a batch generator is configured
+# (the generator regroups them by profile, so a wider drain yields fuller groups)
+DEFAULT_BATCH_SIZE = 64
+
+# Seconds a finished enrichment stays retrievable by its token
+DEFAULT_RESULT_TTL = 600
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class _Enrichment:
+    """One queued LLM note; `done` is set once the note (or a failure) is in"""
+
+    def __init__(self, token: str, passenger_id: str, args: tuple):
+        self.token = token
+        self.passenger_id = passenger_id
+        self.args = args
+        self.status = PENDING
+        self.note: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.done = threading.Event()
+
+    def to_dict(self) -> Dict:
+        return {
+            "token": self.token,
+            "passenger_id": self.passenger_id,
+            "status": self.status,
+            "ai_generated": self.note is not None,
+            "ai_personalized_note": self.note,
+            "error": self.error,
+        }
+
+
+class EnrichmentPool:
+    """
+    Runs `generate(*args)` on `workers` daemon threads. Submissions for a passenger
+    whose enrichment is still pending or running get the existing token back,
+    and submissions are refused (None) once `max_queue` are waiting.
+    Bulk submissions (bulk=True) go to a separate queue served by `bulk_workers`,
+    so interactive notes never wait behind a whole flight. With `generate_batch`,
+    a bulk worker takes up to `batch_size` queued enrichments and hands their args
+    to one generate_batch([args, ...], on_note) call; each enrichment is finished
+    as soon as on_note(index, note) reports it.
+    """
+
+    def __init__(self, generate: Callable[..., Optional[str]], workers: int = DEFAULT_WORKERS,
+                 max_queue: int = DEFAULT_MAX_QUEUE, result_ttl: float = DEFAULT_RESULT_TTL,
+                 generate_batch: Optional[Callable[[List[tuple], Callable[[int, Optional[str]], None]],
+                                                   List[Optional[str]]]] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE, bulk_workers: int = DEFAULT_BULK_WORKERS):
+        self._generate = generate
+        self._generate_batch = generate_batch
+        self._batch_size = batch_size if generate_batch is not None else 1
+        self._workers = workers
+        self._bulk_workers = max(1, bulk_workers)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._bulk_queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._result_ttl = result_ttl
+        self._lock = threading.Lock()
+        self._by_token: Dict[str, _Enrichment] = {}
+        self._in_flight: Dict[str, _Enrichment] = {}
+        self._threads = []
+
+    def _start(self):
+        """Start the worker threads on first use (called with the lock held)"""
+        if self._threads:
+            return
+        workers = [(self._queue, 1, f"ai-enrichment-{i}") for i in range(self._workers)]
+        workers += [(self._bulk_queue, self._batch_size, f"ai-enrichment-bulk-{i}") for i in range(self._bulk_workers)]
+        for work_queue, batch_size, name in workers:
+            thread = threading.Thread(target=self._run, args=(work_queue, batch_size), name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, passenger_id: str, *args, bulk: bool = False) -> Optional[Dict]:
+        """Queue an enrichment and return its status dict, or None when its queue is full"""
+        with self._lock:
+            self._start()
+            self._prune()
+            existing = self._in_flight.get(passenger_id)
+            if existing is not None:
+                return existing.to_dict()
+            enrichment = _Enrichment(uuid.uuid4().hex, passenger_id, args)
+            try:
+                (self._bulk_queue if bulk else self._queue).put_nowait(enrichment)
+            except queue.Full:
+                return None
+            self._by_token[enrichment.token] = enrichment
+            self._in_flight[passenger_id] = enrichment
+            return enrichment.to_dict()
+
+    def get(self, token: str) -> Optional[Dict]:
+        """Current status of an enrichment, or None for an unknown/expired token"""
+        enrichment = self._by_token.get(token)
+        return enrichment.to_dict() if enrichment is not None else None
+
+    def wait(self, token: str, timeout: float) -> Optional[Dict]:
+        """Block up to `timeout` seconds for the enrichment to finish, then return its status"""
+        enrichment = self._by_token.get(token)
+        if enrichment is None:
+            return None
+        enrichment.done.wait(timeout)
+        return enrichment.to_dict()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "workers": self._workers,
+                "queued": self._queue.qsize(),
+                "bulk_queued": self._bulk_queue.qsize(),
+                "in_flight": len(self._in_flight),
+                "tracked": len(self._by_token),
+            }
+
+    def _prune(self):
+        """Forget finished enrichments older than the result TTL (called with the lock held)"""
+        cutoff = time.time() - self._result_ttl
+        expired = [token for token, e in self._by_token.items() if e.finished_at is not None and e.finished_at < cutoff]
+        for token in expired:
+            del self._by_token[token]
+
+    @staticmethod
+    def _take(work_queue: queue.Queue, batch_size: int) -> List[_Enrichment]:
+        """Block for one enrichment, then take whatever else is queued up to the batch size"""
+        batch = [work_queue.get()]
+        while len(batch) < batch_size:
+            try:
+                batch.append(work_queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _finish(self, enrichment: _Enrichment, work_queue: queue.Queue, note: Optional[str] = None,
+                error: Optional[str] = None):
+        """Publish one enrichment's outcome (once) and wake its waiters"""
+        with self._lock:
+            if enrichment.finished_at is not None:
+                return
+            enrichment.note = note
+            enrichment.error = error
+            enrichment.status = FAILED if error is not None else DONE
+            enrichment.finished_at = time.time()
+            self._in_flight.pop(enrichment.passenger_id, None)
+        enrichment.done.set()
+        work_queue.task_done()
+
+    def _run(self, work_queue: queue.Queue, batch_size: int):
+        while True:
+            batch = self._take(work_queue, batch_size)
+            for enrichment in batch:
+                enrichment.status = RUNNING
+            try:
+                if len(batch) > 1:
+                    notes = self._generate_batch(
+                        [enrichment.args for enrichment in batch],
+                        lambda index, note: self._finish(batch[index], work_queue, note)
+                    )
+                else:
+                    notes = [self._generate(*batch[0].args)]
+                for enrichment, note in zip(batch, notes):
+                    self._finish(enrichment, work_queue, note)
+            except Exception as e:
+                print(f"Error in AI enrichment for {', '.join(e_.passenger_id for e_ in batch)}: {e}")
+                for enrichment in batch:
+                    self._finish(enrichment, work_queue, error=str(e))
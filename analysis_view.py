@@ -0,0 +1,134 @@
+"""
+Materialized Disruption Analysis
+Per-flight recovery-action counts and costs kept between requests, recomputed only for flights whose disruption fields changed
+"""
+
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from data_store import DataStore
+from eligibility_engine import EligibilityEngine, default_engine, flight_delay
+
+# Actions reported by /api/disruption-analysis
+ANALYSIS_ACTIONS = ('meal', 'rebooking', 'hotel', 'compensation')
+
+# Flight fields an entry depends on; any change recomputes that flight only
+FLIGHT_FINGERPRINT_FIELDS = (
+    'flight_number', 'origin', 'destination', 'delay_minutes', 'status', 'is_disrupted', 'disruption_reason'
+)
+
+
+class _FlightEntry:
+    """One flight's fingerprint and its contribution to the totals (None when it contributes nothing)"""
+
+    def __init__(self, fingerprint: Tuple, analysis: Optional[Dict]):
+        self.fingerprint = fingerprint
+        self.analysis = analysis
+
+
+class DisruptionAnalysisView:
+    """
+    The disruption-analysis document, maintained across requests.
+    Each snapshot() compares every flight's FLIGHT_FINGERPRINT_FIELDS with the
+    stored entry and re-evaluates eligibility only for flights that changed (or
+    are new); running totals are adjusted by the difference. Reloading the
+    passengers file discards all entries.
+    """
+
+    def __init__(self, data_store: DataStore, engine: EligibilityEngine = default_engine):
+        self._data_store = data_store
+        self._engine = engine
+        self._lock = threading.Lock()
+        self._passengers_version: Optional[int] = None
+        self._reset_totals()
+        self.rebuilds = 0
+        self.flight_recomputes = 0
+
+    def _reset_totals(self):
+        self._entries: Dict[str, _FlightEntry] = {}
+        self._total_passengers = 0
+        self._total_cost = 0
+        self._actions = {action: 0 for action in ANALYSIS_ACTIONS}
+
+    def snapshot(self) -> Dict:
+        """The analysis document (same shape as the original per-request computation)"""
+        with self._lock:
+            flights = self._refresh()
+            return {
+                "timestamp": datetime.now().isoformat(),
+                "disrupted_flights": [dict(entry.analysis, recovery_actions=dict(entry.analysis['recovery_actions']))
+                                      for entry in flights if entry.analysis is not None],
+                "total_disrupted_passengers": self._total_passengers,
+                "recovery_actions_needed": dict(self._actions),
+                "estimated_total_cost": self._total_cost
+            }
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "flights": len(self._entries),
+                "rebuilds": self.rebuilds,
+                "flight_recomputes": self.flight_recomputes,
+            }
+
+    def _refresh(self) -> List[_FlightEntry]:
+        """Bring entries up to date and return them in flight file order (called with the lock held)"""
+        passengers_version = self._data_store.passengers_version()
+        if passengers_version != self._passengers_version:
+            self._reset_totals()
+            self._passengers_version = passengers_version
+            self.rebuilds += 1
+
+        current = []
+        seen = set()
+        for flight in self._data_store.flights():
+            key = flight.get('flight_id') or flight.get('flight_number')
+            fingerprint = tuple(flight.get(field) for field in FLIGHT_FINGERPRINT_FIELDS)
+            entry = self._entries.get(key)
+            if entry is None or entry.fingerprint != fingerprint:
+                self._apply(entry, -1)
+                entry = _FlightEntry(fingerprint, self._analyze(flight))
+                self._apply(entry, 1)
+                self._entries[key] = entry
+                self.flight_recomputes += 1
+            seen.add(key)
+            current.append(entry)
+
+        for key in [key for key in self._entries if key not in seen]:
+            self._apply(self._entries.pop(key), -1)
+        return current
+
+    def _apply(self, entry: Optional[_FlightEntry], sign: int):
+        """Add (sign=1) or remove (sign=-1) an entry's contribution to the totals"""
+        if entry is None or entry.analysis is None:
+            return
+        analysis = entry.analysis
+        self._total_passengers += sign * analysis['disrupted_passengers_count']
+        self._total_cost += sign * analysis['estimated_cost']
+        for action, count in analysis['recovery_actions'].items():
+            self._actions[action] += sign * count
+
+    def _analyze(self, flight: Dict) -> Optional[Dict]:
+        """One flight's analysis, or None when it is not disrupted or has no disrupted passengers"""
+        if not flight.get('is_disrupted'):
+            return None
+
+        table = self._data_store.passenger_table()
+        rows = table.rows_for('flight_number', flight.get('flight_number'))
+        result = self._engine.evaluate_rows(table, rows, flight_delay(flight))
+        disrupted_count = int(result.disrupted.sum())
+        if not disrupted_count:
+            return None
+
+        action_counts = result.action_counts()
+        return {
+            "flight_number": flight.get('flight_number'),
+            "origin": flight.get('origin'),
+            "destination": flight.get('destination'),
+            "delay_minutes": flight.get('delay_minutes'),
+            "disruption_reason": flight.get('disruption_reason'),
+            "disrupted_passengers_count": disrupted_count,
+            "recovery_actions": {action: action_counts.get(action, 0) for action in ANALYSIS_ACTIONS},
+            "estimated_cost": result.estimated_cost()
+        }
@@ -3,12 +3,28 @@ Flask API Server for Airline Disruption Management System
 Provides REST API endpoints to fetch flights, disruptions, and trigger LLM recommendations
 """
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
 import json
 import os
+import threading
+import time
 import uuid
 from datetime import datetime
+import numpy as np
+from data_store import DataStore
+from analysis_view import DisruptionAnalysisView
+from action_store import ActionStore, ACTION_TYPES, QUERY_FIELDS
+from disruption_detector import affected_passenger_count, expand_disruption
+from eligibility_engine import default_engine as eligibility_engine, flight_delay
+from llm_cache import open_cache
+from llm_client import OllamaClient
+from ai_enrichment import EnrichmentPool, DEFAULT_BULK_WORKERS, DEFAULT_WORKERS, DEFAULT_MAX_QUEUE
+from job_runner import JobRunner
+from mass_actions import is_passenger_id_list, resolve_selection, run_mass_action, DEFAULT_JOB_THRESHOLD
+from passenger_notes import PassengerNoteGenerator, DEFAULT_BATCH_SIZE
+from json_export import write_json_atomic
+from recommendation_engine import RecommendationEngine
 
 app = Flask(__name__)
 CORS(app)
@@ -19,31 +35,6 @@ TEST_DATA_DIR = "test_data"
 # Cache for loaded data
 _data_cache = {}
 
-# ========================
-# Aviation Constants & MCT Rules
-# ========================
-MINIMUM_CONNECTING_TIME = {
-    'LHR': 90,  # London Heathrow
-    'AUH': 75,  # Abu Dhabi
-    'DXB': 90,  # Dubai
-    'JFK': 120, # New York
-    'CDG': 90,  # Paris
-    'LAX': 120, # Los Angeles
-    'SFO': 120, # San Francisco
-    'BOM': 60,  # Mumbai
-    'DEL': 60,  # Delhi
-    'CAI': 60,  # Cairo
-    'SYD': 120, # Sydney
-    'JED': 60,  # Jeddah
-    'MAD': 90,  # Madrid
-}
-
-DELAY_THRESHOLDS = {
-    'short_meal': 120,      # 2 hours = 120 minutes for meal voucher
-    'medium_hotel': 720,    # 12 hours = 720 minutes for hotel needed
-    'high_compensation': 180  # 3 hours = 180 minutes for compensation eligible
-}
-
 def load_json_file(filename):
     """Load JSON file from test_data directory with caching"""
     if filename in _data_cache:
@@ -59,78 +50,31 @@ def load_json_file(filename):
         print(f"Error loading {filepath}: {e}")
         return {}
 
-def is_passenger_disrupted(passenger, flight):
-    """
-    Determine if a passenger is disrupted.
-    A passenger is disrupted if:
-    1. They have a connecting flight that will be missed due to delay
-    2. OR their arrival delay exceeds SLA threshold
-    3. OR their connection time < MCT at connection airport
-    """
-    delay_minutes = flight.get('delay_minutes', 0)
-    
-    # Check if passenger has connecting flight
-    connecting_flight = passenger.get('connecting_flight')
-    connection_airport = passenger.get('next_segment_arrival_iataCode')
-    
-    if not connecting_flight or not connection_airport:
-        # No connection - disrupted only if arrival delay is significant
-        return delay_minutes > 60  # More than 1 hour delay
-    
-    # Calculate if connection will be missed
-    mct = MINIMUM_CONNECTING_TIME.get(connection_airport, 90)
-    
-    # If delay_minutes >= MCT, passenger will miss connection
-    return delay_minutes >= mct
+# Indexed view over cached passengers/flights (rebuilt when a file is reloaded)
+data_store = DataStore(load_json_file)
 
-def calculate_disruption_eligibility(passenger, flight):
-    """
-    Calculate what recovery actions a disrupted passenger is eligible for
-    Returns: {eligible_for: ['meal', 'hotel', 'rebooking', 'compensation', 'transport'], priority: 'high'|'medium'|'low'}
-    """
-    eligibility = {
-        'eligible_for': [],
-        'priority': 'low',
-        'reason': '',
-        'passenger_id': passenger.get('id') or passenger.get('passenger_id')
-    }
-    
-    if not is_passenger_disrupted(passenger, flight):
-        return eligibility
-    
-    delay_minutes = flight.get('delay_minutes', 0)
-    loyalty_tier = passenger.get('loyalty_tier')
-    has_ssr = bool(passenger.get('special_service_request'))
-    
-    # Determine priority
-    if loyalty_tier in ['Platinum', 'Gold'] or has_ssr:
-        eligibility['priority'] = 'high'
-    elif delay_minutes > 180:
-        eligibility['priority'] = 'high'
-    elif delay_minutes > 120:
-        eligibility['priority'] = 'medium'
-    else:
-        eligibility['priority'] = 'low'
-    
-    # Determine eligible actions
-    if delay_minutes >= DELAY_THRESHOLDS['short_meal']:
-        eligibility['eligible_for'].append('meal')
-    
-    if delay_minutes >= DELAY_THRESHOLDS['high_compensation']:
-        eligibility['eligible_for'].append('compensation')
-    
-    # Rebooking always eligible if disrupted
-    if is_passenger_disrupted(passenger, flight):
-        eligibility['eligible_for'].append('rebooking')
-    
-    # Hotel only if next flight is next day
-    if delay_minutes >= DELAY_THRESHOLDS['medium_hotel']:
-        eligibility['eligible_for'].append('hotel')
-        eligibility['eligible_for'].append('transport')
-    
-    eligibility['reason'] = f"Disrupted passenger: {delay_minutes}min delay, Connection at {passenger.get('next_segment_arrival_iataCode', 'N/A')}"
-    
-    return eligibility
+# Disruption analysis aggregates, kept per flight between requests
+analysis_view = DisruptionAnalysisView(data_store)
+
+# Issued action records (meal coupons, vouchers, ...): 'journal' (JSONL) or 'sqlite' backend
+action_store = ActionStore(
+    TEST_DATA_DIR,
+    backend=os.environ.get('ACTION_STORE_BACKEND', 'journal'),
+    db_path=os.environ.get('ACTION_STORE_DB')
+)
+
+# Ollama responses keyed by (model, options, prompt); LLM_CACHE=off disables it
+llm_cache = open_cache(TEST_DATA_DIR)
+# Mass actions over more passengers than this run as background jobs (GET /api/actions/jobs/<id>)
+MASS_ACTION_JOB_THRESHOLD = int(os.environ.get('MASS_ACTION_JOB_THRESHOLD', DEFAULT_JOB_THRESHOLD))
+mass_action_jobs = JobRunner(name="mass-actions")
+
+# Background recommendation generation jobs (POST /api/recommendations/generate)
+recommendation_jobs = JobRunner(workers=int(os.environ.get('RECOMMENDATION_JOB_WORKERS', 1)), name="recommendations")
+_recommendations_lock = threading.Lock()
+
+# Shared Ollama client; its circuit breaker fails calls over to the rule-based path while Ollama is down
+llm_client = OllamaClient(cache=llm_cache)
 
 # ========================
 # API ENDPOINTS
@@ -144,20 +88,22 @@ def serve_index():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()}), 200
+    health = {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    health["llm"] = llm_client.status()
+    health["ai_enrichment"] = ai_enrichment.stats()
+    health["disruption_analysis"] = analysis_view.stats()
+    health["passenger_table"] = data_store.passenger_table().stats()
+    if llm_cache is not None:
+        health["llm_cache"] = llm_cache.stats()
+    return jsonify(health), 200
 
 @app.route('/api/flights', methods=['GET'])
 def get_all_flights():
     """Get list of all flights with disruption status"""
     try:
-        flights_data = load_json_file("flights_data.json")
+        flights_list = data_store.flights()
         disruptions_data = load_json_file("detected_disruptions.json")
         
-        # Handle both old and new data formats
-        flights_list = flights_data.get('flights', flights_data) if isinstance(flights_data, dict) else flights_data
-        if isinstance(flights_list, dict):
-            flights_list = list(flights_list.values())
-        
         flight_list = []
         disrupted_flights = {}
         
@@ -204,17 +150,10 @@ def get_all_flights():
 def get_flight_details(flight_id):
     """Get detailed information about a specific flight"""
     try:
-        flights_data = load_json_file("flights_data.json")
         disruptions_data = load_json_file("detected_disruptions.json")
-        passengers_data = load_json_file("passengers_data.json")
-        
-        # Handle both old and new data formats
-        flights_list = flights_data.get('flights', flights_data) if isinstance(flights_data, dict) else flights_data
-        if isinstance(flights_list, dict):
-            flights_list = list(flights_list.values())
         
         # Find flight
-        flight = next((f for f in flights_list if f.get('flight_id') == flight_id), None)
+        flight = data_store.get_flight(flight_id)
         if not flight:
             return jsonify({"error": "Flight not found"}), 404
         
@@ -223,9 +162,11 @@ def get_flight_details(flight_id):
         flight_number = flight.get('flight_number')
         if isinstance(disruptions_data, dict) and 'disruptions' in disruptions_data:
             disruption = next((d for d in disruptions_data['disruptions'] if d.get('flight_id') == flight_id or d.get('flight_number') == flight_number), None)
+            if disruption:
+                disruption = expand_disruption(disruption)
         
         # Get passengers for this flight (match by flight_id or flight_number)
-        passengers = [p for p in passengers_data if p.get('flight_id') == flight_id or p.get('flight_number') == flight_number]
+        passengers = data_store.passengers_for_flight(flight_id, flight_number)
         
         response = {
             "flight": flight,
@@ -243,14 +184,7 @@ def get_flight_details(flight_id):
 def get_flight_passengers(flight_id):
     """Get all passengers for a specific flight with filters"""
     try:
-        passengers_data = load_json_file("passengers_data.json")
         bookings_data = load_json_file("bookings_data.json")
-        flights_data = load_json_file("flights_data.json")
-        
-        # Handle both old and new data formats
-        flights_list = flights_data.get('flights', flights_data) if isinstance(flights_data, dict) else flights_data
-        if isinstance(flights_list, dict):
-            flights_list = list(flights_list.values())
         
         # Get query parameters for filtering
         vip_only = request.args.get('vip', 'false').lower() == 'true'
@@ -258,20 +192,25 @@ def get_flight_passengers(flight_id):
         connections_only = request.args.get('connections', 'false').lower() == 'true'
         
         # Find flight by ID and get flight_number
-        flight = next((f for f in flights_list if f.get('flight_id') == flight_id), None)
+        flight = data_store.get_flight(flight_id)
         flight_number = flight.get('flight_number') if flight else flight_id
         
-        # Match passengers by flight_id or flight_number
-        passengers = [p for p in passengers_data if p.get('flight_id') == flight_id or p.get('flight_number') == flight_number]
+        # Match passengers by flight_id or flight_number, then filter on the columnar table
+        table = data_store.passenger_table()
+        rows = np.union1d(table.rows_for('flight_id', flight_id), table.rows_for('flight_number', flight_number))
         
         # Apply filters
         if vip_only:
-            passengers = [p for p in passengers if p.get('loyalty_tier') in ['Gold', 'Platinum']]
+            rows = rows[table.categorical['loyalty_tier'].isin(rows, ['Gold', 'Platinum'])]
         if ssr_only:
-            passengers = [p for p in passengers if p.get('special_service_request')]
+            rows = rows[table.flags['has_ssr'][rows]]
         if connections_only:
             # Check if passenger has a connection from booking data
-            passengers = [p for p in passengers if any(b.get('pnr') == p.get('pnr') and len(b.get('flight_segments', [])) > 1 for b in bookings_data)]
+            connecting_pnrs = {b.get('pnr') for b in bookings_data if len(b.get('flight_segments', [])) > 1}
+            rows = rows[table.categorical['pnr'].isin(rows, connecting_pnrs)]
+        
+        # Only the matching records are fetched
+        passengers = table.records_at(rows)
         
         return jsonify({
             "flight_id": flight_id,
@@ -284,9 +223,10 @@ def get_flight_passengers(flight_id):
 
 @app.route('/api/disruptions', methods=['GET'])
 def get_disruptions():
-    """Get all detected disruptions"""
+    """Get all detected disruptions (?compact=true returns passenger references instead of full lists)"""
     try:
         disruptions_data = load_json_file("detected_disruptions.json")
+        compact = request.args.get('compact', 'false').lower() == 'true'
         
         if isinstance(disruptions_data, dict) and 'disruptions' in disruptions_data:
             disruptions = disruptions_data['disruptions']
@@ -294,9 +234,9 @@ def get_disruptions():
             disruptions = []
         
         return jsonify({
-            "disruptions": disruptions,
+            "disruptions": disruptions if compact else [expand_disruption(d) for d in disruptions],
             "total": len(disruptions),
-            "total_passengers_affected": sum(len(d.get('affected_passenger_list', [])) for d in disruptions)
+            "total_passengers_affected": sum(affected_passenger_count(d) for d in disruptions)
         }), 200
     except Exception as e:
         print(f"Error in get_disruptions: {e}")
@@ -333,28 +273,29 @@ def get_manager_summary():
         total_voucher_value = 0
         
         if isinstance(disruptions_data, dict) and 'disruptions' in disruptions_data:
-            total_passengers_affected = sum(len(d.get('affected_passenger_list', [])) for d in disruptions_data['disruptions'])
+            total_passengers_affected = sum(affected_passenger_count(d) for d in disruptions_data['disruptions'])
             total_cost = disruptions_data.get('total_estimated_cost', 0)
         
         # Count mass actions: meal coupons issued
         try:
-            if os.path.exists(os.path.join(TEST_DATA_DIR, "meal_coupons.json")):
-                meal_coupons = load_json_file("meal_coupons.json")
-                if isinstance(meal_coupons, list):
-                    meal_vouchers_issued = len(meal_coupons)
-                    total_voucher_value += sum(c.get('total_value', 0) for c in meal_coupons)
+            meal_coupons = action_store.records("meal_coupons")
+            meal_vouchers_issued = len(meal_coupons)
+            total_voucher_value += sum(c.get('total_value', 0) for c in meal_coupons)
         except:
             pass
         
         # Count mass actions: rebookings processed
         try:
-            if os.path.exists(os.path.join(TEST_DATA_DIR, "rebookings.json")):
-                rebookings = load_json_file("rebookings.json")
-                if isinstance(rebookings, list):
-                    passengers_reprotected = len([r for r in rebookings if r.get('status') == 'Confirmed'])
+            rebookings = action_store.records("rebookings")
+            passengers_reprotected = len([r for r in rebookings if r.get('status') == 'Confirmed'])
         except:
             pass
         
+        # Loyalty tiers of passengers on disrupted flights, counted on the columnar table
+        table = data_store.passenger_table()
+        disrupted_flights = [f.get('flight_number') for f in data_store.flights() if f.get('is_disrupted')]
+        tier_distribution = table.categorical['loyalty_tier'].counts(table.categorical['flight_number'].rows_in(disrupted_flights))
+        
         # Add hotel costs from recommendations (estimate $200 per night)
         if isinstance(recommendations_data, dict) and 'recommendations' in recommendations_data:
             for rec in recommendations_data['recommendations']:
@@ -373,7 +314,8 @@ def get_manager_summary():
             "vouchers_issued": meal_vouchers_issued,
             "passengers_reprotected": passengers_reprotected,
             "total_voucher_value": total_voucher_value,
-            "average_cost_per_passenger": total_cost / total_passengers_affected if total_passengers_affected > 0 else 0
+            "average_cost_per_passenger": total_cost / total_passengers_affected if total_passengers_affected > 0 else 0,
+            "tier_distribution": tier_distribution
         }), 200
     except Exception as e:
         print(f"Error in get_manager_summary: {e}")
@@ -381,92 +323,82 @@ def get_manager_summary():
 
 def query_ollama_for_passenger(passenger, flight, delay_minutes):
     """Query Ollama to generate unique suggestions for a specific passenger"""
-    import requests
-    
-    # Determine loyalty tier and service level
-    loyalty_tier = passenger.get('loyalty_tier', 'Guest')
-    ticket_class = passenger.get('ticket_class', passenger.get('fare_class_name', 'Economy'))
-    ssr = passenger.get('special_service_request')
-    next_dest = passenger.get('next_segment_arrival_iataCode', 'None')
-    
-    # Build tier-specific context
-    tier_benefits = ""
-    if loyalty_tier in ['Platinum', 'Gold']:
-        tier_benefits = f"This {loyalty_tier} tier passenger should receive: executive lounge access, priority rebooking, concierge service, complimentary upgrades."
-        service_level = "VIP/Executive"
-    elif loyalty_tier == 'Silver':
-        tier_benefits = "This Silver tier passenger should receive: lounge access, standard priority rebooking, meal vouchers."
-        service_level = "Premium"
-    else:
-        tier_benefits = "This standard tier passenger should receive: standard rebooking, meal vouchers, compensation per regulations."
-        service_level = "Standard"
-    
-    # Build class-specific compensation
-    class_compensation = ""
-    if ticket_class in ['First', 'Business']:
-        class_compensation = "As a premium cabin passenger, offer suite upgrades, premium hotel options, or cash compensation at higher tier."
-    else:
-        class_compensation = "As an economy/premium economy passenger, standard compensation and meal vouchers apply."
-    
-    # Build special needs context
-    special_needs = ""
-    if ssr:
-        special_needs = f"IMPORTANT: Passenger has special service requirement ({ssr}) - ensure dedicated assistance and priority handling."
-    
-    # Build connection context
-    connection_context = ""
-    if next_dest and next_dest != 'None':
-        connection_context = f"Passenger has tight connection to {next_dest}. Prioritize rebooking to preserve connection. If connection cannot be guaranteed, offer alternative routing."
-    else:
-        connection_context = "Passenger has no onward connection - focus on comfort and compensation."
-    
-    prompt = f"""You are an airline disruption manager providing personalized service recovery. Generate a unique, tailored recommendation.
+    return note_generator.note(passenger, flight, delay_minutes)
 
-PASSENGER PROFILE:
-- Name: {passenger.get('passenger_name', 'Unknown')}
-- Loyalty Status: {loyalty_tier} ({service_level} Service Level)
-- Ticket Class: {ticket_class}
-- Flight: {flight.get('flight_number')} ({flight.get('origin')} → {flight.get('destination')})
-- Delay: {delay_minutes} minutes
-- Next Connection: {next_dest}
+# Per-passenger LLM notes are generated off the request thread and fetched by token
+# Interactive notes have their own workers; bulk (per-flight) notes are taken in batches,
+# same-profile passengers share one prompt and each note is published as its chunk returns
+note_generator = PassengerNoteGenerator(llm_client, batch_size=int(os.environ.get('AI_NOTE_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+ai_enrichment = EnrichmentPool(
+    query_ollama_for_passenger,
+    workers=int(os.environ.get('AI_ENRICHMENT_WORKERS', DEFAULT_WORKERS)),
+    max_queue=int(os.environ.get('AI_ENRICHMENT_QUEUE', DEFAULT_MAX_QUEUE)),
+    generate_batch=note_generator.notes,
+    bulk_workers=int(os.environ.get('AI_ENRICHMENT_BULK_WORKERS', DEFAULT_BULK_WORKERS))
+)
 
-SERVICE GUIDELINES:
-{tier_benefits}
-{class_compensation}
-{special_needs if special_needs else ''}
-{connection_context}
+# Longest a server-sent-events stream waits for an enrichment before closing
+ENRICHMENT_STREAM_TIMEOUT = 120
 
-Generate a PERSONALIZED recommendation (2-3 sentences) that:
-1. Reflects their loyalty tier and service level
-2. Offers tier-appropriate solutions (mention specific benefits like lounge, concierge, upgrades for high tiers)
-3. Addresses their specific situation (connection, special needs, etc.)
-4. Provides concrete next steps
-
-IMPORTANT: Make it DIFFERENT for each tier. Platinum/Gold get executive treatment, Silver gets standard premium, others get basic + compensation.
-
-Keep response under 120 words and make it sound personal and empathetic."""
+def publish_recommendations(recommendations):
+    """
+    Merge freshly generated recommendations into recommendations.json (matched by
+    disruption_id, new fields over old) and swap the cached copy in one step, so
+    readers see either the old or the new document.
+    """
+    with _recommendations_lock:
+        current = load_json_file("recommendations.json")
+        current = current if isinstance(current, dict) else {}
+        merged = [dict(r) for r in current.get('recommendations', [])]
+        positions = {r.get('disruption_id'): i for i, r in enumerate(merged)}
+        generated_at = datetime.now().isoformat()
+        for rec in recommendations:
+            rec = {**rec, "generated_at": generated_at}
+            position = positions.get(rec.get('disruption_id'))
+            if position is None:
+                positions[rec.get('disruption_id')] = len(merged)
+                merged.append(rec)
+            else:
+                merged[position] = {**merged[position], **rec}
+        
+        document = {**current, "recommendations": merged}
+        write_json_atomic(os.path.join(TEST_DATA_DIR, "recommendations.json"), document, indent=2)
+        _data_cache["recommendations.json"] = document
 
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "llama2",
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.8, "num_predict": 180}
-            },
-            timeout=30
-        )
-        if response.status_code == 200:
-            return response.json().get("response", "").strip()
-    except Exception as e:
-        print(f"Ollama error: {e}")
+def run_recommendation_job(job):
+    """Regenerate recommendations for every disruption of a flight, then publish them"""
+    flight_id = job.params['flight_id']
+    disruptions_data = load_json_file("detected_disruptions.json")
+    disruptions = [
+        d for d in disruptions_data.get('disruptions', [])
+        if flight_id in (d.get('flight_id'), d.get('flight_number'))
+    ]
+    if not disruptions:
+        raise ValueError(f"No disruption detected for flight {flight_id}")
+    
+    job.set_total(len(disruptions))
+    engine = RecommendationEngine.from_records(disruptions, cache=llm_cache, llm=llm_client)
+    engine.on_progress = lambda index, rec: job.advance('fallback' if rec.get('source') == 'fallback_rule_based' else 'llm')
+    recommendations = engine.generate_recommendations()
     
-    return None
+    # Rule-based fallbacks only fill gaps; they never replace a stored recommendation
+    stored = {r.get('disruption_id') for r in load_json_file("recommendations.json").get('recommendations', [])}
+    published = [
+        r for r in recommendations
+        if r.get('source') != 'fallback_rule_based' or r.get('disruption_id') not in stored
+    ]
+    if published:
+        publish_recommendations(published)
+    
+    return {
+        "disruption_ids": [r.get('disruption_id') for r in recommendations],
+        "published": [r.get('disruption_id') for r in published],
+        "prompt_tokens": engine.prompt_size_report()['estimated_tokens']
+    }
 
 @app.route('/api/recommendations/generate', methods=['POST'])
 def generate_recommendations():
-    """Trigger LLM to generate recommendations for a disruption"""
+    """Queue a job that regenerates the LLM recommendations for a flight's disruptions"""
     try:
         data = request.get_json()
         flight_id = data.get('flight_id')
@@ -474,42 +406,53 @@ def generate_recommendations():
         if not flight_id:
             return jsonify({"error": "flight_id required"}), 400
         
-        # Return pre-computed recommendations (LLM integration optional)
+        job = recommendation_jobs.submit("recommendations", run_recommendation_job, key=flight_id, flight_id=flight_id)
+        
+        # Current (pre-generation) recommendations are returned as before; the job swaps in new ones
         recommendations_data = load_json_file("recommendations.json")
         
         return jsonify({
-            "status": "success",
-            "message": "Recommendations loaded",
+            "status": "accepted",
+            "message": "Recommendation generation queued",
+            "job_id": job.id,
+            "status_url": f"/api/recommendations/jobs/{job.id}",
+            "job": job.to_dict(),
             "recommendations": recommendations_data.get('recommendations', [])
-        }), 200
+        }), 202
     except Exception as e:
         print(f"Error in generate_recommendations: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/recommendations/jobs', methods=['GET'])
+def list_recommendation_jobs():
+    """Recent recommendation generation jobs, newest first"""
+    return jsonify({"jobs": [job.to_dict() for job in recommendation_jobs.jobs()]}), 200
+
+@app.route('/api/recommendations/jobs/<job_id>', methods=['GET'])
+def get_recommendation_job(job_id):
+    """Status and per-disruption progress of a recommendation generation job"""
+    job = recommendation_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
 @app.route('/api/passenger-suggestions/<passenger_id>', methods=['GET'])
 def get_passenger_suggestions(passenger_id):
     """Generate AI suggestions tailored for a specific passenger"""
     try:
         # Load all required data
-        passengers_data = load_json_file("passengers_data.json")
-        passenger = next((p for p in passengers_data if p.get('id') == passenger_id or p.get('passenger_id') == passenger_id), None)
+        passenger = data_store.get_passenger(passenger_id)
         
         if not passenger:
             return jsonify({"error": "Passenger not found"}), 404
         
-        flights_data = load_json_file("flights_data.json")
         recommendations_data = load_json_file("recommendations.json")
         
-        # Handle both old and new data formats
-        flights_list = flights_data.get('flights', flights_data) if isinstance(flights_data, dict) else flights_data
-        if isinstance(flights_list, dict):
-            flights_list = list(flights_list.values())
-        
         flight_number = passenger.get('flight_number')
         disruption_id = f"DISR_{flight_number}"
         
         # Get flight and recommendations
-        flight = next((f for f in flights_list if f.get('flight_number') == flight_number), None)
+        flight = data_store.get_flight_by_number(flight_number)
         rec = next((r for r in recommendations_data.get('recommendations', []) if r.get('disruption_id') == disruption_id), None)
         
         if not rec or not flight:
@@ -529,7 +472,7 @@ def get_passenger_suggestions(passenger_id):
         # Filter rebooking options relevant to passenger's next destination
         enhanced_rebooking = []
         for opt in rec.get('rebooking_options', []):
-            rebook_flight = next((f for f in flights_list if f.get('flight_number') == opt.get('flight_number')), None)
+            rebook_flight = data_store.get_flight_by_number(opt.get('flight_number'))
             if rebook_flight:
                 # Check if flight goes to or near passenger's next destination
                 flight_destination = rebook_flight.get('destination')
@@ -550,33 +493,9 @@ def get_passenger_suggestions(passenger_id):
                 }
                 enhanced_rebooking.append(enhanced_opt)
         
-        # Personalize vouchers based on ticket class and wait time
-        vouchers = []
-        base_meal = 25 if ticket_class == 'Economy' else 40 if ticket_class == 'Business' else 75
-        base_hotel = 150 if ticket_class == 'Economy' else 200 if ticket_class == 'Business' else 300
-        
-        if wait_hours > 1:
-            vouchers.append({
-                "type": "meal",
-                "amount": base_meal,
-                "quantity": 1 + int(wait_hours / 4),  # More meals for longer delays
-                "total": base_meal * (1 + int(wait_hours / 4))
-            })
-        
-        if wait_hours > 3:
-            vouchers.append({
-                "type": "hotel",
-                "amount": base_hotel,
-                "quantity": 1,
-                "total": base_hotel
-            })
-        
-        vouchers.append({
-            "type": "transportation",
-            "amount": 50,
-            "quantity": 1,
-            "total": 50
-        })
+        # Personalize vouchers based on ticket class and wait time (eligibility_engine.VOUCHER_RULES)
+        rules = eligibility_engine.evaluate([passenger], flight)
+        vouchers = rules.vouchers(0)
         
         # Personalize compensation based on ticket class and regulations
         compensation_amount = 125 if ticket_class == 'Economy' else 250 if ticket_class == 'Business' else 400
@@ -671,16 +590,23 @@ def get_passenger_suggestions(passenger_id):
             }
         }
         
-        # Add Ollama-generated personalized recommendation
-        ollama_recommendation = query_ollama_for_passenger(passenger, flight, delay_minutes)
-        if ollama_recommendation:
-            passenger_suggestions["ai_personalized_note"] = ollama_recommendation
-            passenger_suggestions["ai_generated"] = True
+        # Ollama-generated personalized note is produced in the background; the client
+        # fetches it with the enrichment token (polling or server-sent events)
+        passenger_suggestions["ai_generated"] = False
+        enrichment = ai_enrichment.submit(passenger_id, passenger, flight, delay_minutes)
+        if enrichment:
+            token = enrichment["token"]
+            passenger_suggestions["ai_enrichment"] = {
+                "token": token,
+                "status": enrichment["status"],
+                "poll_url": f"/api/passenger-suggestions/enrichment/{token}",
+                "stream_url": f"/api/passenger-suggestions/enrichment/{token}/stream"
+            }
         else:
-            passenger_suggestions["ai_generated"] = False
+            passenger_suggestions["ai_enrichment"] = {"status": "unavailable"}
         
         # Calculate and add eligibility data (actions available for this passenger)
-        eligibility = calculate_disruption_eligibility(passenger, flight)
+        eligibility = rules.eligibility(0)
         passenger_suggestions["eligibility"] = {
             "actions": eligibility.get("eligible_for", []),
             "priority": eligibility.get("priority", "normal"),
@@ -692,6 +618,153 @@ def get_passenger_suggestions(passenger_id):
         print(f"Error in get_passenger_suggestions: {e}")
         return jsonify({"error": str(e)}), 500
 
+# Largest passenger_ids list accepted by /api/eligibility/bulk
+MAX_BULK_ELIGIBILITY = 5000
+
+@app.route('/api/eligibility/bulk', methods=['POST'])
+def bulk_eligibility():
+    """
+    Eligibility, priority and suggested vouchers for many passengers in one request.
+    Body: {"passenger_ids": [...]} (a list of id strings) or {"flight_id": "..."}; rules are
+    evaluated for all of them at once. Unknown and repeated ids are listed under "errors".
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
+        passenger_ids = data.get('passenger_ids')
+        flight_id = data.get('flight_id')
+        
+        if not passenger_ids and not flight_id:
+            return jsonify({"error": "Provide passenger_ids or flight_id"}), 400
+        
+        errors = []
+        if flight_id:
+            if not isinstance(flight_id, str):
+                return jsonify({"error": "flight_id must be a string"}), 400
+            flight = data_store.get_flight(flight_id)
+            if not flight:
+                return jsonify({"error": "Flight not found"}), 404
+            # Passengers booked under the flight's id or its flight number
+            table = data_store.passenger_table()
+            rows = np.union1d(table.rows_for('flight_id', flight_id), table.rows_for('flight_number', flight.get('flight_number')))
+            result = eligibility_engine.evaluate_rows(table, rows, flight_delay(flight))
+            passengers = result.passengers
+            flights = [flight] * len(passengers)
+        else:
+            if not is_passenger_id_list(passenger_ids):
+                return jsonify({"error": "passenger_ids must be a list of passenger id strings"}), 400
+            if len(passenger_ids) > MAX_BULK_ELIGIBILITY:
+                return jsonify({"error": f"At most {MAX_BULK_ELIGIBILITY} passenger_ids per request"}), 400
+            # Unknown and duplicate ids become per-id errors, as for mass actions
+            resolved, errors = resolve_selection(data_store, passenger_ids)
+            passengers, flights = [], []
+            for passenger_id, passenger in resolved:
+                flight = data_store.get_flight_by_number(passenger.get('flight_number'))
+                if not flight:
+                    errors.append({"passenger_id": passenger_id, "error": "Flight not found"})
+                else:
+                    passengers.append(passenger)
+                    flights.append(flight)
+            # One vectorized rule evaluation over every resolved passenger, each with their own flight's delay
+            result = eligibility_engine.evaluate(passengers, delay_minutes=[flight_delay(f) for f in flights])
+        
+        results = []
+        for index, (passenger, flight) in enumerate(zip(passengers, flights)):
+            eligibility = result.eligibility(index)
+            results.append({
+                "passenger_id": eligibility['passenger_id'],
+                "passenger_name": passenger.get('passenger_name', passenger.get('full_name')),
+                "pnr": passenger.get('pnr'),
+                "flight_number": flight.get('flight_number'),
+                "ticket_class": passenger.get('ticket_class', passenger.get('fare_class_name', 'Economy')),
+                "loyalty_tier": passenger.get('loyalty_tier'),
+                "delay_minutes": flight.get('delay_minutes'),
+                "disrupted": bool(result.disrupted[index]),
+                "eligibility": {
+                    "actions": eligibility['eligible_for'],
+                    "priority": eligibility['priority'],
+                    "reason": eligibility['reason']
+                },
+                "vouchers": result.vouchers(index)
+            })
+        
+        priorities = {}
+        for item in results:
+            if item['disrupted']:
+                priority = item['eligibility']['priority']
+                priorities[priority] = priorities.get(priority, 0) + 1
+        
+        return jsonify({
+            "flight_id": flight_id,
+            "total": len(results),
+            "passengers": results,
+            "errors": errors,
+            "summary": {
+                "disrupted": int(result.disrupted.sum()),
+                "priority": priorities,
+                "actions": result.action_counts()
+            }
+        }), 200
+    except Exception as e:
+        print(f"Error in bulk_eligibility: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/flights/<flight_id>/ai-notes', methods=['POST'])
+def queue_flight_ai_notes(flight_id):
+    """Queue background AI notes for a flight's passengers (all, or the given passenger_ids)"""
+    try:
+        flight = data_store.get_flight(flight_id)
+        if not flight:
+            return jsonify({"error": "Flight not found"}), 404
+        
+        data = request.get_json(silent=True) or {}
+        passengers = data_store.passengers_for_flight(flight_id, flight.get('flight_number'))
+        if data.get('passenger_ids'):
+            wanted = set(data['passenger_ids'])
+            passengers = [p for p in passengers if p.get('id') in wanted or p.get('passenger_id') in wanted]
+        
+        delay_minutes = flight.get('delay_minutes', 60)
+        enrichments = {}
+        for p in passengers:
+            passenger_id = p.get('id') or p.get('passenger_id')
+            enrichment = ai_enrichment.submit(passenger_id, p, flight, delay_minutes, bulk=True)
+            enrichments[passenger_id] = {"token": enrichment["token"], "status": enrichment["status"]} if enrichment else {"status": "unavailable"}
+        
+        return jsonify({
+            "flight_id": flight_id,
+            "queued": sum(1 for e in enrichments.values() if 'token' in e),
+            "enrichments": enrichments,
+            "poll_url": "/api/passenger-suggestions/enrichment/<token>"
+        }), 202
+    except Exception as e:
+        print(f"Error in queue_flight_ai_notes: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/passenger-suggestions/enrichment/<token>', methods=['GET'])
+def get_passenger_enrichment(token):
+    """Poll the background AI note of a passenger-suggestions response"""
+    enrichment = ai_enrichment.get(token)
+    if enrichment is None:
+        return jsonify({"error": "Enrichment not found or expired"}), 404
+    return jsonify(enrichment), 200
+
+@app.route('/api/passenger-suggestions/enrichment/<token>/stream', methods=['GET'])
+def stream_passenger_enrichment(token):
+    """Server-sent events: one 'enrichment' event once the AI note is ready (or the wait times out)"""
+    if ai_enrichment.get(token) is None:
+        return jsonify({"error": "Enrichment not found or expired"}), 404
+    
+    def events():
+        deadline = time.monotonic() + ENRICHMENT_STREAM_TIMEOUT
+        enrichment = ai_enrichment.get(token)
+        while enrichment and enrichment["status"] in ("pending", "running") and time.monotonic() < deadline:
+            yield ": keep-alive\n\n"
+            enrichment = ai_enrichment.wait(token, timeout=min(15, max(0.0, deadline - time.monotonic())))
+        yield f"event: enrichment\ndata: {json.dumps(enrichment)}\n\n"
+    
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/actions/apply-plan', methods=['POST'])
 def apply_plan():
     """Simulate applying a passenger plan"""
@@ -737,21 +810,8 @@ def save_meal_coupon():
             "validity_days": 90
         }
         
-        # Load existing coupons or create new
-        meal_coupons = load_json_file("meal_coupons.json") if os.path.exists(os.path.join(TEST_DATA_DIR, "meal_coupons.json")) else []
-        if not isinstance(meal_coupons, list):
-            meal_coupons = []
-        
-        meal_coupons.append(meal_coupon)
-        
-        # Save to file
-        filepath = os.path.join(TEST_DATA_DIR, "meal_coupons.json")
-        with open(filepath, 'w') as f:
-            json.dump(meal_coupons, f, indent=2)
-        
-        # Clear cache
-        if "meal_coupons.json" in _data_cache:
-            del _data_cache["meal_coupons.json"]
+        # Append to the action journal
+        action_store.append("meal_coupons", meal_coupon)
         
         return jsonify({
             "status": "success",
@@ -793,18 +853,8 @@ def save_hotel_voucher():
             "validity_days": 90
         }
         
-        hotel_vouchers = load_json_file("hotel_vouchers.json") if os.path.exists(os.path.join(TEST_DATA_DIR, "hotel_vouchers.json")) else []
-        if not isinstance(hotel_vouchers, list):
-            hotel_vouchers = []
-        
-        hotel_vouchers.append(hotel_voucher)
-        
-        filepath = os.path.join(TEST_DATA_DIR, "hotel_vouchers.json")
-        with open(filepath, 'w') as f:
-            json.dump(hotel_vouchers, f, indent=2)
-        
-        if "hotel_vouchers.json" in _data_cache:
-            del _data_cache["hotel_vouchers.json"]
+        # Append to the action journal
+        action_store.append("hotel_vouchers", hotel_voucher)
         
         return jsonify({
             "status": "success",
@@ -846,18 +896,8 @@ def save_compensation():
             "payment_status": "Pending"
         }
         
-        compensations = load_json_file("compensations.json") if os.path.exists(os.path.join(TEST_DATA_DIR, "compensations.json")) else []
-        if not isinstance(compensations, list):
-            compensations = []
-        
-        compensations.append(compensation)
-        
-        filepath = os.path.join(TEST_DATA_DIR, "compensations.json")
-        with open(filepath, 'w') as f:
-            json.dump(compensations, f, indent=2)
-        
-        if "compensations.json" in _data_cache:
-            del _data_cache["compensations.json"]
+        # Append to the action journal
+        action_store.append("compensations", compensation)
         
         return jsonify({
             "status": "success",
@@ -899,18 +939,8 @@ def save_rebooking():
             "confirmation_sent": False
         }
         
-        rebookings = load_json_file("rebookings.json") if os.path.exists(os.path.join(TEST_DATA_DIR, "rebookings.json")) else []
-        if not isinstance(rebookings, list):
-            rebookings = []
-        
-        rebookings.append(rebooking)
-        
-        filepath = os.path.join(TEST_DATA_DIR, "rebookings.json")
-        with open(filepath, 'w') as f:
-            json.dump(rebookings, f, indent=2)
-        
-        if "rebookings.json" in _data_cache:
-            del _data_cache["rebookings.json"]
+        # Append to the action journal
+        action_store.append("rebookings", rebooking)
         
         return jsonify({
             "status": "success",
@@ -949,18 +979,8 @@ def save_message():
             "read_receipt": False
         }
         
-        messages = load_json_file("sent_messages.json") if os.path.exists(os.path.join(TEST_DATA_DIR, "sent_messages.json")) else []
-        if not isinstance(messages, list):
-            messages = []
-        
-        messages.append(message)
-        
-        filepath = os.path.join(TEST_DATA_DIR, "sent_messages.json")
-        with open(filepath, 'w') as f:
-            json.dump(messages, f, indent=2)
-        
-        if "sent_messages.json" in _data_cache:
-            del _data_cache["sent_messages.json"]
+        # Append to the action journal
+        action_store.append("sent_messages", message)
         
         return jsonify({
             "status": "success",
@@ -972,6 +992,26 @@ def save_message():
         print(f"Error in save_message: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/actions/<action_type>', methods=['GET'])
+def get_action_records(action_type):
+    """Get issued action records, optionally filtered by passenger_id, pnr or flight_number"""
+    try:
+        if action_type not in ACTION_TYPES:
+            return jsonify({"error": f"Unknown action type: {action_type}"}), 404
+        
+        filters = {field: request.args.get(field) for field in QUERY_FIELDS if request.args.get(field)}
+        records = action_store.query(action_type, **filters) if filters else action_store.records(action_type)
+        
+        return jsonify({
+            "action_type": action_type,
+            "filters": filters,
+            "records": records,
+            "total": len(records)
+        }), 200
+    except Exception as e:
+        print(f"Error in get_action_records: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/actions/approve-execute', methods=['POST'])
 def approve_execute():
     """Simulate approving and executing all recommendations"""
@@ -1062,62 +1102,72 @@ def internal_error(e):
 # Mass Action Endpoints
 # ========================
 
+def mass_action(action_type, passenger_ids, build_record, records_key, describe):
+    """
+    Run a mass action inline, or as a background job when the selection is larger than
+    MASS_ACTION_JOB_THRESHOLD. Returns the Flask response for either case.
+    """
+    def run(job=None):
+        result = run_mass_action(data_store, action_store, action_type, passenger_ids, build_record, job)
+        return {
+            "success": True,
+            "message": describe(result["processed"]),
+            records_key: result["records"],
+            "processed": result["processed"],
+            "failed": result["failed"]
+        }
+    
+    if len(passenger_ids) <= MASS_ACTION_JOB_THRESHOLD:
+        return jsonify(run()), 200
+    
+    job = mass_action_jobs.submit(action_type, run, passenger_count=len(passenger_ids))
+    return jsonify({
+        "status": "accepted",
+        "message": f"{len(passenger_ids)} passengers queued",
+        "job_id": job.id,
+        "status_url": f"/api/actions/jobs/{job.id}",
+        "job": job.to_dict()
+    }), 202
+
 @app.route('/api/actions/mass-meal-coupons', methods=['POST'])
 def mass_meal_coupons():
     """Issue meal coupons to multiple passengers at once"""
     try:
-        data = request.json
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
         passenger_ids = data.get('passenger_ids', [])
         amount = data.get('amount', 25)
         quantity = data.get('quantity', 1)
         
         if not passenger_ids:
             return jsonify({"error": "No passengers selected"}), 400
+        if not is_passenger_id_list(passenger_ids):
+            return jsonify({"error": "passenger_ids must be a list of passenger id strings"}), 400
+        
+        issued_date = datetime.now().isoformat()
+        
+        def build_coupon(passenger_id, passenger):
+            return {
+                "id": str(uuid.uuid4()),
+                "coupon_id": "MC_" + str(uuid.uuid4())[:8].upper(),
+                "passenger_id": passenger_id,
+                "passenger_name": passenger.get('full_name') or passenger.get('passenger_name'),
+                "pnr": passenger.get('pnr'),
+                "email": passenger.get('email'),
+                "flight_number": passenger.get('flight_number'),
+                "amount": amount,
+                "quantity": quantity,
+                "total_value": amount * quantity,
+                "issued_by": "Mass Action",
+                "issued_date": issued_date,
+                "status": "Issued",
+                "validity_days": 30
+            }
         
-        # Load all passengers to get their details
-        passengers_data = load_json_file("passengers_data.json")
-        
-        meal_coupons = load_json_file("meal_coupons.json") if os.path.exists(os.path.join(TEST_DATA_DIR, "meal_coupons.json")) else []
-        if not isinstance(meal_coupons, list):
-            meal_coupons = []
-        
-        issued_coupons = []
-        
-        for passenger_id in passenger_ids:
-            # Find passenger details
-            passenger = next((p for p in passengers_data if p.get('id') == passenger_id or p.get('passenger_id') == passenger_id), None)
-            
-            if passenger:
-                coupon = {
-                    "id": str(uuid.uuid4()),
-                    "coupon_id": "MC_" + str(uuid.uuid4())[:8].upper(),
-                    "passenger_id": passenger_id,
-                    "passenger_name": passenger.get('full_name') or passenger.get('passenger_name'),
-                    "pnr": passenger.get('pnr'),
-                    "email": passenger.get('email'),
-                    "flight_number": passenger.get('flight_number'),
-                    "amount": amount,
-                    "quantity": quantity,
-                    "total_value": amount * quantity,
-                    "issued_by": "Mass Action",
-                    "issued_date": datetime.now().isoformat(),
-                    "status": "Issued",
-                    "validity_days": 30
-                }
-                
-                meal_coupons.append(coupon)
-                issued_coupons.append(coupon)
-        
-        # Save updated meal coupons
-        filepath = os.path.join(TEST_DATA_DIR, "meal_coupons.json")
-        with open(filepath, 'w') as f:
-            json.dump(meal_coupons, f, indent=2)
-        
-        return jsonify({
-            "success": True,
-            "message": f"Issued meal coupons to {len(issued_coupons)} passengers",
-            "coupons": issued_coupons
-        }), 200
+        # Resolved in one indexed pass and appended to the journal in one write
+        return mass_action("meal_coupons", passenger_ids, build_coupon, "coupons",
+                           lambda count: f"Issued meal coupons to {count} passengers")
         
     except Exception as e:
         print(f"Error in mass_meal_coupons: {str(e)}")
@@ -1127,66 +1177,57 @@ def mass_meal_coupons():
 def mass_rebookings():
     """Rebook multiple passengers to a new flight"""
     try:
-        data = request.json
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Request body must be a JSON object"}), 400
         passenger_ids = data.get('passenger_ids', [])
         new_flight_number = data.get('new_flight_number')
         new_departure_time = data.get('new_departure_time')
         
         if not passenger_ids:
             return jsonify({"error": "No passengers selected"}), 400
+        if not is_passenger_id_list(passenger_ids):
+            return jsonify({"error": "passenger_ids must be a list of passenger id strings"}), 400
         
         if not new_flight_number:
             return jsonify({"error": "No alternative flight selected"}), 400
         
-        # Load all passengers to get their details
-        passengers_data = load_json_file("passengers_data.json")
-        
-        rebookings = load_json_file("rebookings.json") if os.path.exists(os.path.join(TEST_DATA_DIR, "rebookings.json")) else []
-        if not isinstance(rebookings, list):
-            rebookings = []
-        
-        processed_rebookings = []
-        
-        for passenger_id in passenger_ids:
-            # Find passenger details
-            passenger = next((p for p in passengers_data if p.get('id') == passenger_id or p.get('passenger_id') == passenger_id), None)
-            
-            if passenger:
-                rebooking = {
-                    "id": str(uuid.uuid4()),
-                    "rebooking_id": "RBK_" + str(uuid.uuid4())[:8].upper(),
-                    "passenger_id": passenger_id,
-                    "passenger_name": passenger.get('full_name') or passenger.get('passenger_name'),
-                    "pnr": passenger.get('pnr'),
-                    "email": passenger.get('email'),
-                    "original_flight": passenger.get('flight_number'),
-                    "new_flight_number": new_flight_number,
-                    "new_departure_time": new_departure_time,
-                    "rebooking_type": "Mass Rebooking",
-                    "processed_by": "Mass Action",
-                    "processed_date": datetime.now().isoformat(),
-                    "status": "Confirmed",
-                    "confirmation_sent": True
-                }
-                
-                rebookings.append(rebooking)
-                processed_rebookings.append(rebooking)
+        processed_date = datetime.now().isoformat()
+        
+        def build_rebooking(passenger_id, passenger):
+            return {
+                "id": str(uuid.uuid4()),
+                "rebooking_id": "RBK_" + str(uuid.uuid4())[:8].upper(),
+                "passenger_id": passenger_id,
+                "passenger_name": passenger.get('full_name') or passenger.get('passenger_name'),
+                "pnr": passenger.get('pnr'),
+                "email": passenger.get('email'),
+                "original_flight": passenger.get('flight_number'),
+                "new_flight_number": new_flight_number,
+                "new_departure_time": new_departure_time,
+                "rebooking_type": "Mass Rebooking",
+                "processed_by": "Mass Action",
+                "processed_date": processed_date,
+                "status": "Confirmed",
+                "confirmation_sent": True
+            }
         
-        # Save updated rebookings
-        filepath = os.path.join(TEST_DATA_DIR, "rebookings.json")
-        with open(filepath, 'w') as f:
-            json.dump(rebookings, f, indent=2)
-        
-        return jsonify({
-            "success": True,
-            "message": f"Rebooked {len(processed_rebookings)} passengers to {new_flight_number}",
-            "rebookings": processed_rebookings
-        }), 200
+        # Resolved in one indexed pass and appended to the journal in one write
+        return mass_action("rebookings", passenger_ids, build_rebooking, "rebookings",
+                           lambda count: f"Rebooked {count} passengers to {new_flight_number}")
         
     except Exception as e:
         print(f"Error in mass_rebookings: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/actions/jobs/<job_id>', methods=['GET'])
+def get_mass_action_job(job_id):
+    """Status, progress and (once finished) result of a mass-action job"""
+    job = mass_action_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict()), 200
+
 @app.route('/api/flights/<flight_id>/disrupted-passengers', methods=['GET'])
 def get_disrupted_passengers(flight_id):
     """
@@ -1195,28 +1236,27 @@ def get_disrupted_passengers(flight_id):
     """
     try:
         # Get flight
-        flights_data = load_json_file("flights_data.json")
-        flight = next((f for f in flights_data['flights'] if f['flight_id'] == flight_id), None)
+        flight = data_store.get_flight(flight_id)
         
         if not flight:
             return jsonify({"error": "Flight not found"}), 404
         
         # Get all passengers for flight
-        passengers_data = load_json_file("passengers_data.json")
-        flight_passengers = [p for p in passengers_data if p.get('flight_number') == flight.get('flight_number')]
+        table = data_store.passenger_table()
+        rows = table.rows_for('flight_number', flight.get('flight_number'))
         
-        # Filter for disrupted passengers only
+        # Filter for disrupted passengers only (rules evaluated on the flight's columns at once)
+        result = eligibility_engine.evaluate_rows(table, rows, flight_delay(flight))
         disrupted = []
-        for passenger in flight_passengers:
-            if is_passenger_disrupted(passenger, flight):
-                eligibility = calculate_disruption_eligibility(passenger, flight)
-                passenger['disruption_info'] = eligibility
-                disrupted.append(passenger)
+        for index in result.disrupted_indexes():
+            passenger = result.passengers[index]
+            passenger['disruption_info'] = result.eligibility(index)
+            disrupted.append(passenger)
         
         return jsonify({
             "flight_id": flight_id,
             "flight_number": flight.get('flight_number'),
-            "total_passengers": len(flight_passengers),
+            "total_passengers": len(rows),
             "disrupted_passengers": len(disrupted),
             "passengers": disrupted,
             "disruption_details": {
@@ -1233,76 +1273,15 @@ def get_disrupted_passengers(flight_id):
 @app.route('/api/disruption-analysis', methods=['GET'])
 def get_disruption_analysis():
     """
-    Real-time disruption analysis:
+    Real-time disruption analysis (see analysis_view.DisruptionAnalysisView):
     - All disrupted flights
     - Affected passengers count
     - Recovery actions needed
     - Estimated costs
     """
     try:
-        flights_data = load_json_file("flights_data.json")
-        passengers_data = load_json_file("passengers_data.json")
-        
-        analysis = {
-            "timestamp": datetime.now().isoformat(),
-            "disrupted_flights": [],
-            "total_disrupted_passengers": 0,
-            "recovery_actions_needed": {
-                "meal": 0,
-                "rebooking": 0,
-                "hotel": 0,
-                "compensation": 0
-            },
-            "estimated_total_cost": 0
-        }
-        
-        for flight in flights_data['flights']:
-            if not flight.get('is_disrupted'):
-                continue
-            
-            flight_passengers = [p for p in passengers_data if p.get('flight_number') == flight.get('flight_number')]
-            disrupted_passengers = [p for p in flight_passengers if is_passenger_disrupted(p, flight)]
-            
-            if not disrupted_passengers:
-                continue
-            
-            flight_analysis = {
-                "flight_number": flight.get('flight_number'),
-                "origin": flight.get('origin'),
-                "destination": flight.get('destination'),
-                "delay_minutes": flight.get('delay_minutes'),
-                "disruption_reason": flight.get('disruption_reason'),
-                "disrupted_passengers_count": len(disrupted_passengers),
-                "recovery_actions": {
-                    "meal": 0,
-                    "rebooking": 0,
-                    "hotel": 0,
-                    "compensation": 0
-                },
-                "estimated_cost": 0
-            }
-            
-            # Calculate actions needed per passenger
-            for passenger in disrupted_passengers:
-                eligibility = calculate_disruption_eligibility(passenger, flight)
-                
-                for action in eligibility['eligible_for']:
-                    flight_analysis['recovery_actions'][action] += 1
-                    analysis['recovery_actions_needed'][action] += 1
-                
-                # Rough cost estimation
-                if 'meal' in eligibility['eligible_for']:
-                    flight_analysis['estimated_cost'] += 25
-                if 'rebooking' in eligibility['eligible_for']:
-                    flight_analysis['estimated_cost'] += 50
-                if 'hotel' in eligibility['eligible_for']:
-                    flight_analysis['estimated_cost'] += 150
-                if 'compensation' in eligibility['eligible_for']:
-                    flight_analysis['estimated_cost'] += 250
-            
-            analysis['total_disrupted_passengers'] += len(disrupted_passengers)
-            analysis['estimated_total_cost'] += flight_analysis['estimated_cost']
-            analysis['disrupted_flights'].append(flight_analysis)
+        # Materialized per flight; only flights whose delay/status changed are recomputed
+        analysis = analysis_view.snapshot()
         
         return jsonify(analysis), 200
         
@@ -1325,9 +1304,17 @@ if __name__ == "__main__":
     print("  GET  /api/flights/<id>/passengers - Flight passengers with filters")
     print("  GET  /api/disruptions - All disruptions")
     print("  GET  /api/disruptions/<id>/recommendations - Get recommendations")
+    print("  GET  /api/passenger-suggestions/<id> - Passenger suggestions (AI note via enrichment token)")
+    print("  GET  /api/passenger-suggestions/enrichment/<token>[/stream] - AI note: poll or server-sent events")
+    print("  POST /api/eligibility/bulk - Eligibility, priority and vouchers for passenger_ids or a flight_id")
+    print("  POST /api/flights/<id>/ai-notes - Queue batched AI notes for a flight's passengers")
     print("  GET  /api/manager-summary - Manager dashboard summary")
-    print("  POST /api/recommendations/generate - Trigger LLM")
+    print("  POST /api/recommendations/generate - Queue LLM regeneration job")
+    print("  GET  /api/recommendations/jobs[/<job_id>] - Generation job status and progress")
     print("  POST /api/actions/apply-plan - Apply passenger plan")
+    print("  GET  /api/actions/<type>?pnr=&passenger_id=&flight_number= - Issued action records")
+    print("  POST /api/actions/mass-meal-coupons|mass-rebookings - Mass actions (job handle for large selections)")
+    print("  GET  /api/actions/jobs/<job_id> - Mass-action job status and progress")
     print("  POST /api/actions/approve-execute - Approve & execute")
     print("\nServer running on http://localhost:5000")
     print("="*80 + "\n")
@@ -0,0 +1,30 @@
+"""
+Aviation Constants & MCT Rules
+Shared by the Flask API and the disruption detector
+"""
+
+# Minimum connecting time (minutes) per connection airport
+MINIMUM_CONNECTING_TIME = {
+    'LHR': 90,  # London Heathrow
+    'AUH': 75,  # Abu Dhabi
+    'DXB': 90,  # Dubai
+    'JFK': 120, # New York
+    'CDG': 90,  # Paris
+    'LAX': 120, # Los Angeles
+    'SFO': 120, # San Francisco
+    'BOM': 60,  # Mumbai
+    'DEL': 60,  # Delhi
+    'CAI': 60,  # Cairo
+    'SYD': 120, # Sydney
+    'JED': 60,  # Jeddah
+    'MAD': 90,  # Madrid
+}
+
+# MCT assumed for airports missing from the table
+DEFAULT_MINIMUM_CONNECTING_TIME = 90
+
+DELAY_THRESHOLDS = {
+    'short_meal': 120,      # 2 hours = 120 minutes for meal voucher
+    'medium_hotel': 720,    # 12 hours = 720 minutes for hotel needed
+    'high_compensation': 180  # 3 hours = 180 minutes for compensation eligible
+}
@@ -0,0 +1,128 @@
+"""
+Disruption Detector Benchmark
+Compares the per-flight passenger rescan against the flight_id partition built at load time
+
+Usage:
+    python3 benchmarks/bench_detector.py --flights 1000 --passengers 500000
+    python3 benchmarks/bench_detector.py --workers 8    # also time the process-pool run
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from disruption_detector import DisruptionDetector
+
+AIRPORTS = ['AUH', 'LHR', 'JFK', 'CDG', 'BOM', 'DEL', 'SYD', 'MAD', 'DXB', 'LAX']
+STATUSES = ['On Time', 'On Time', 'Delayed', 'Delayed', 'Cancelled', 'Diverted', 'Aircraft Swap']
+TIERS = [None, None, 'Silver', 'Gold', 'Platinum']
+FARE_CLASSES = [('Y', 'Economy'), ('Y', 'Economy'), ('W', 'Premium Economy'), ('J', 'Business'), ('F', 'First')]
+
+
+def generate_flights(count: int, rng: random.Random):
+    flights = []
+    for i in range(count):
+        origin, destination = rng.sample(AIRPORTS, 2)
+        status = rng.choice(STATUSES)
+        delay = rng.choice([45, 95, 150, 200, 300]) if status == 'Delayed' else 0
+        flights.append({
+            'flight_id': f"FL{i:06d}",
+            'flight_number': f"EY{i:04d}",
+            'flight_date': "2025-11-27",
+            'origin': origin,
+            'destination': destination,
+            'disruption_status': status,
+            'disruption_reason': None if status == 'On Time' else "Weather",
+            'delay_minutes': delay,
+            'scheduled_departure': "2025-11-27T10:00:00Z",
+            'estimated_departure': "2025-11-27T10:00:00Z",
+            'scheduled_arrival': "2025-11-27T17:00:00Z",
+            'estimated_arrival': f"2025-11-27T{17 + delay // 60:02d}:{delay % 60:02d}:00Z",
+        })
+    return flights
+
+
+def generate_passengers(count: int, flights, rng: random.Random):
+    passengers = []
+    for i in range(count):
+        flight = flights[rng.randrange(len(flights))]
+        fare_class, fare_class_name = rng.choice(FARE_CLASSES)
+        passengers.append({
+            'passenger_id': f"P{i:07d}",
+            'flight_id': flight['flight_id'],
+            'pnr': f"PNR{i % 99991:05d}",
+            'full_name': "Benchmark Passenger",
+            'email': "pax@example.com",
+            'phone': "+971500000000",
+            'fare_class': fare_class,
+            'fare_class_name': fare_class_name,
+            'seat_number': "12A",
+            'loyalty_tier': rng.choice(TIERS),
+            'check_in_status': 'Checked In' if rng.random() < 0.7 else 'Not Checked In',
+            'boarding_pass_issued': False,
+        })
+        # ~40% connect onwards at the destination, 30 minutes to 6 hours after the scheduled arrival
+        if rng.random() < 0.4:
+            layover = timedelta(minutes=rng.randrange(30, 361))
+            departure = datetime.fromisoformat(flight['scheduled_arrival'].replace('Z', '+00:00')) + layover
+            passengers[-1]['next_segment_departure_iataCode'] = flight['destination']
+            passengers[-1]['next_segment_departure_time'] = departure.strftime('%Y-%m-%dT%H:%M:%SZ')
+    return passengers
+
+
+def run_detection(detector: DisruptionDetector) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        detector.detect_all_disruptions()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DisruptionDetector passenger lookup scaling")
+    parser.add_argument("--flights", type=int, default=1000)
+    parser.add_argument("--passengers", type=int, default=500000)
+    parser.add_argument("--rescan-sample", type=int, default=20,
+                        help="Disrupted flights timed with the legacy rescan (extrapolated to all)")
+    parser.add_argument("--workers", type=int, default=1, help="Also time detection with this many processes")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    flights = generate_flights(args.flights, rng)
+    passengers = generate_passengers(args.passengers, flights, rng)
+    disrupted = [f for f in flights if f['disruption_status'] != 'On Time']
+    print(f"Flights: {len(flights)} ({len(disrupted)} disrupted), passengers: {len(passengers)}")
+
+    # Legacy behaviour: one full passenger scan per disrupted flight
+    sample = disrupted[:args.rescan_sample]
+    start = time.perf_counter()
+    for flight in sample:
+        [p for p in passengers if p['flight_id'] == flight['flight_id']]
+    rescan_per_flight = (time.perf_counter() - start) / max(len(sample), 1)
+    rescan_total = rescan_per_flight * len(disrupted)
+
+    # Partitioned: build flight_id -> passengers once, then run the full detection
+    start = time.perf_counter()
+    detector = DisruptionDetector.from_records(flights, passengers)
+    partition_time = time.perf_counter() - start
+    detection_time = run_detection(detector)
+
+    print(f"\nLegacy rescan lookups (extrapolated): {rescan_total:8.2f}s  ({rescan_per_flight * 1000:.1f} ms/flight)")
+    print(f"Partition build:                      {partition_time:8.2f}s")
+    print(f"Full detection with partition:        {detection_time:8.2f}s")
+    print(f"Lookup speed-up:                      {rescan_total / max(partition_time, 1e-9):8.1f}x")
+
+    if args.workers > 1:
+        parallel_time = run_detection(DisruptionDetector.from_records(flights, passengers, workers=args.workers))
+        label = f"Full detection with {args.workers} workers:"
+        print(f"{label:<38}{parallel_time:8.2f}s")
+
+if __name__ == "__main__":
+    main()
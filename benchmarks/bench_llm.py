@@ -0,0 +1,124 @@
+"""
+LLM Path Benchmark
+Times recommendation concurrency, the response cache, fallbacks and batched passenger notes against the fake Ollama server
+
+Usage:
+    python3 benchmarks/bench_llm.py --disruptions 40 --concurrency 4 --latency lognormal:-1.5,0.4
+    python3 benchmarks/bench_llm.py --malformed-rate 0.2 --error-rate 0.1 --hang-rate 0.1 --call-timeout 1
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_detector import generate_flights, generate_passengers
+from disruption_detector import DisruptionDetector
+from fake_ollama import FakeOllamaConfig, start_server
+from llm_cache import LLMCache
+from llm_client import CircuitBreaker, OllamaClient
+from passenger_notes import PassengerNoteGenerator
+from recommendation_engine import RecommendationEngine
+
+
+def generate_disruptions(count: int, passengers_per_flight: int, rng: random.Random):
+    """Compact disruption dicts from the detector run over synthetic flights"""
+    flights = generate_flights(count * 3, rng)
+    passengers = generate_passengers(len(flights) * passengers_per_flight, flights, rng)
+    detector = DisruptionDetector.from_records(flights, passengers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        events = detector.detect_all_disruptions()
+    return [event.to_dict(detector.passengers_by_id) for event in events[:count]], flights, passengers
+
+
+def run_engine(disruptions, base_url: str, concurrency: int, call_timeout: float,
+               cache=None, breaker_failures: int = 3):
+    """Generate recommendations quietly; returns (seconds, LLM answers, fallbacks, client)"""
+    client = OllamaClient(base_url=base_url, cache=cache, pool_size=concurrency,
+                          breaker=CircuitBreaker(failure_threshold=breaker_failures))
+    engine = RecommendationEngine.from_records(
+        disruptions, concurrency=concurrency, call_timeout=call_timeout, cache=cache, llm=client
+    )
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        recommendations = engine.generate_recommendations()
+    elapsed = time.perf_counter() - start
+    fallbacks = sum(1 for r in recommendations if r.get('source') == 'fallback_rule_based')
+    return elapsed, len(recommendations) - fallbacks, fallbacks, client
+
+
+def report(label: str, elapsed: float, answered: int, fallbacks: int, client: OllamaClient):
+    metrics = client.metrics.snapshot()
+    print(f"{label:<34}{elapsed:8.2f}s  llm {answered:4d}  fallback {fallbacks:4d}  "
+          f"calls {metrics['calls']:4d}  cache hits {metrics['cache_hits']:4d}  "
+          f"p50 {metrics['latency_ms']['p50']} ms  errors {metrics['errors'] or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM recommendation and note paths against a fake Ollama")
+    parser.add_argument("--disruptions", type=int, default=40)
+    parser.add_argument("--passengers-per-flight", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--call-timeout", type=float, default=2.0)
+    parser.add_argument("--latency", default="lognormal:-1.5,0.4", help="Fake server first-token latency (see fake_ollama.py)")
+    parser.add_argument("--token-delay", type=float, default=0.0005)
+    parser.add_argument("--malformed-rate", type=float, default=0.2, help="Used by the fallback run")
+    parser.add_argument("--error-rate", type=float, default=0.1, help="Used by the fallback run")
+    parser.add_argument("--hang-rate", type=float, default=0.05, help="Used by the fallback run")
+    parser.add_argument("--garbage-rate", type=float, default=0.05, help="Used by the fallback run")
+    parser.add_argument("--note-passengers", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    disruptions, flights, passengers = generate_disruptions(args.disruptions, args.passengers_per_flight, rng)
+    print(f"Disruptions: {len(disruptions)}, latency {args.latency}, token delay {args.token_delay}s\n")
+
+    healthy = FakeOllamaConfig(latency=args.latency, token_delay=args.token_delay, seed=args.seed)
+    server, url, _ = start_server(config=healthy)
+
+    # Concurrency: serial against the thread pool
+    for concurrency in sorted({1, args.concurrency}):
+        report(f"Concurrency {concurrency}:", *run_engine(disruptions, url, concurrency, args.call_timeout))
+
+    # Cache: the second run over the same disruptions should not reach the server
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = LLMCache(os.path.join(tmp, "llm_cache.db"))
+        report("Cache cold:", *run_engine(disruptions, url, args.concurrency, args.call_timeout, cache))
+        report("Cache warm:", *run_engine(disruptions, url, args.concurrency, args.call_timeout, cache))
+
+    # Passenger notes: one call per passenger against profile-batched prompts
+    flight = flights[0]
+    note_items = [(p, flight, 120) for p in passengers[:args.note_passengers]]
+    for batch_size in (1, 8):
+        client = OllamaClient(base_url=url)
+        generator = PassengerNoteGenerator(client, batch_size=batch_size)
+        start = time.perf_counter()
+        notes = generator.notes(note_items)
+        elapsed = time.perf_counter() - start
+        print(f"{f'Notes, batch size {batch_size}:':<34}{elapsed:8.2f}s  notes {sum(1 for n in notes if n):4d}  "
+              f"calls {client.metrics.snapshot()['calls']:4d}")
+    server.shutdown()
+
+    # Fallbacks: malformed answers, garbled stream lines, HTTP errors and hangs past the call timeout
+    faulty = FakeOllamaConfig(
+        latency=args.latency, token_delay=args.token_delay, malformed_rate=args.malformed_rate,
+        error_rate=args.error_rate, hang_rate=args.hang_rate, hang_seconds=args.call_timeout * 3,
+        garbage_rate=args.garbage_rate, seed=args.seed
+    )
+    server, url, stats = start_server(config=faulty)
+    print()
+    report("Faults, breaker off:", *run_engine(disruptions, url, args.concurrency, args.call_timeout,
+                                               breaker_failures=len(disruptions) + 1))
+    report("Faults, breaker after 3:", *run_engine(disruptions, url, args.concurrency, args.call_timeout))
+    print(f"Server: {stats.snapshot()}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""
+Fake Ollama Server
+Local /api/generate stand-in with configurable latency, canned schema-valid or malformed answers and failure injection
+
+Usage:
+    python3 benchmarks/fake_ollama.py --port 11434 --latency lognormal:-0.5,0.4 --token-delay 0.01
+    python3 benchmarks/fake_ollama.py --malformed-rate 0.2 --error-rate 0.05 --hang-rate 0.05
+    python3 benchmarks/fake_ollama.py --garbage-rate 0.1
+
+Answers are derived from the prompt: recommendation prompts get a JSON object
+echoing the disruption's id/flight, batched note prompts get one note per key,
+anything else gets a short text note. Randomness is seeded per prompt, so the
+same prompt always gets the same latency, answer and injected failure.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+# Characters per streamed fragment (roughly one token)
+FRAGMENT_CHARS = 4
+
+
+def parse_latency(spec: str):
+    """'0.5', 'fixed:0.5', 'uniform:0.2,1.0' or 'lognormal:mu,sigma' -> rng -> seconds"""
+    kind, _, params = spec.partition(':') if ':' in spec else ('fixed', '', spec)
+    values = [float(v) for v in params.split(',')] if params else []
+    if kind == 'fixed':
+        return lambda rng: values[0]
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'lognormal':
+        return lambda rng: math.exp(rng.gauss(values[0], values[1]))
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class FakeOllamaConfig:
+    """Behaviour of the fake server; rates are probabilities per request"""
+
+    def __init__(self, latency: str = "fixed:0.05", token_delay: float = 0.0, trailing_tokens: int = 40,
+                 malformed_rate: float = 0.0, error_rate: float = 0.0, hang_rate: float = 0.0,
+                 drop_rate: float = 0.0, hang_seconds: float = 120.0, garbage_rate: float = 0.0, seed: int = 42):
+        self.latency = parse_latency(latency)
+        self.latency_spec = latency
+        self.token_delay = token_delay
+        self.trailing_tokens = trailing_tokens
+        self.malformed_rate = malformed_rate
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.drop_rate = drop_rate
+        self.hang_seconds = hang_seconds
+        # Streams with a non-JSON NDJSON line mid-way (broken proxy, truncated write)
+        self.garbage_rate = garbage_rate
+        self.seed = seed
+
+
+class FakeOllamaStats:
+    """Request counters, exposed at GET /stats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+def canned_answer(prompt: str, rng: random.Random, malformed: bool) -> str:
+    """Model output for `prompt`: schema-valid JSON, a keyed batch of notes, or a text note"""
+    if malformed:
+        return rng.choice([
+            'I am sorry, but I cannot produce JSON for this request. ' * 6,
+            '{"disruption_id": "UNKNOWN", "rebooking_options": [{"flight_number": "EY1"',
+            '{"disruption_id": "X", "flight_number": , "flight_date": "x"}',
+        ])
+
+    if "Disruption data:" in prompt:
+        try:
+            disruption = json.loads(prompt.split("Disruption data:", 1)[1].strip())
+        except json.JSONDecodeError:
+            disruption = {}
+        passengers = disruption.get('passengers', {}).get('total', 100) if isinstance(disruption.get('passengers'), dict) else 100
+        return "Here is the plan:\n" + json.dumps({
+            "disruption_id": disruption.get('disruption_id', 'UNKNOWN'),
+            "flight_number": disruption.get('flight_number', 'UNKNOWN'),
+            "flight_date": disruption.get('flight_date', 'UNKNOWN'),
+            "rebooking_options": [{"flight_number": "EY130", "new_departure_time": "2025-11-27T23:00:00",
+                                   "new_arrival_time": "2025-11-28T07:00:00", "passenger_count": passengers}],
+            "vouchers": [{"type": "meal", "amount": 50, "currency": "USD", "quantity": passengers}],
+            "compensation": [{"type": "monetary", "amount": 400, "currency": "USD", "passenger_count": passengers}],
+            "communications": [{"channel": "email", "recipient_group": "all_affected",
+                                "message_template": "Your flight has been disrupted."}],
+            "operational_actions": [{"action": "arrange_transport", "details": "Bus from terminal to hotel"}],
+            "cost_optimization": [{"measure": "use_hotel_voucher_instead_of_cash", "estimated_saving": 5000, "currency": "USD"}],
+        }, indent=2)
+
+    keys = re.findall(r'^- (P\d+):', prompt, re.MULTILINE)
+    if keys:
+        return json.dumps({key: f"We are sorry for the delay ({key}); we have secured priority rebooking and a meal voucher for you."
+                           for key in keys})
+
+    return ("We sincerely apologize for the disruption. We have reserved priority rebooking on the next departure, "
+            "lounge access while you wait, and a meal voucher. Please see the agent at gate for your new boarding pass.")
+
+
+def make_handler(config: FakeOllamaConfig, stats: FakeOllamaStats):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status: int, body: Dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/api/tags":
+                self._json(200, {"models": [{"name": "llama2"}]})
+            elif self.path == "/stats":
+                self._json(200, stats.snapshot())
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/api/generate":
+                self._json(404, {"error": "not found"})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = body.get("prompt", "")
+            digest = hashlib.sha256(f"{config.seed}:{prompt}".encode()).digest()
+            rng = random.Random(int.from_bytes(digest[:8], "big"))
+            stats.add("requests")
+
+            if rng.random() < config.error_rate:
+                stats.add("injected_errors")
+                self._json(500, {"error": "injected failure"})
+                return
+            if rng.random() < config.hang_rate:
+                stats.add("injected_hangs")
+                time.sleep(config.hang_seconds)
+            time.sleep(config.latency(rng))
+
+            malformed = rng.random() < config.malformed_rate
+            if malformed:
+                stats.add("malformed")
+            answer = canned_answer(prompt, rng, malformed)
+            answer += " and that concludes the recommendation." * (config.trailing_tokens // 6)
+            drop = rng.random() < config.drop_rate
+            garbage = rng.random() < config.garbage_rate
+            prompt_tokens = len(prompt) // FRAGMENT_CHARS
+
+            if not body.get("stream", True):
+                time.sleep(config.token_delay * (len(answer) // FRAGMENT_CHARS))
+                if drop:
+                    stats.add("dropped")
+                    self.close_connection = True
+                    return
+                self._json(200, {"model": body.get("model"), "response": answer, "done": True,
+                                 "prompt_eval_count": prompt_tokens, "eval_count": len(answer) // FRAGMENT_CHARS})
+                return
+            self._stream(body, answer, prompt_tokens, drop, garbage)
+
+        def _chunk(self, payload: Dict):
+            self._raw_chunk((json.dumps(payload) + "\n").encode())
+
+        def _raw_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _stream(self, body: Dict, answer: str, prompt_tokens: int, drop: bool, garbage: bool = False):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            fragments = [answer[i:i + FRAGMENT_CHARS] for i in range(0, len(answer), FRAGMENT_CHARS)]
+            try:
+                for i, fragment in enumerate(fragments):
+                    if drop and i == len(fragments) // 2:
+                        stats.add("dropped")
+                        self.close_connection = True
+                        return
+                    if garbage and i == len(fragments) // 2:
+                        stats.add("garbage_lines")
+                        self._raw_chunk(b'{"model": "llama2", "response": "tru\n')
+                    self._chunk({"model": body.get("model"), "response": fragment, "done": False})
+                    stats.add("tokens_streamed")
+                    if config.token_delay:
+                        time.sleep(config.token_delay)
+                self._chunk({"model": body.get("model"), "response": "", "done": True,
+                             "prompt_eval_count": prompt_tokens, "eval_count": len(fragments)})
+                self.wfile.write(b"0\r\n\r\n")
+                stats.add("completed")
+            except (BrokenPipeError, ConnectionResetError):
+                # Client stopped reading (early termination)
+                stats.add("client_disconnects")
+                self.close_connection = True
+
+    return Handler
+
+
+class FakeOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping kept-alive or half-read connections is expected, not an error
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(port: int = 0, config: Optional[FakeOllamaConfig] = None, host: str = "127.0.0.1"):
+    """Serve in a daemon thread; returns (server, base_url, stats). port=0 picks a free port."""
+    config = config or FakeOllamaConfig()
+    stats = FakeOllamaStats()
+    server = FakeOllamaServer((host, port), make_handler(config, stats))
+    threading.Thread(target=server.serve_forever, name="fake-ollama", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}", stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama /api/generate server for tests and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", default="fixed:0.05",
+                        help="Delay before the first token: N, fixed:N, uniform:LO,HI or lognormal:MU,SIGMA (seconds)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds between streamed fragments")
+    parser.add_argument("--trailing-tokens", type=int, default=40,
+                        help="Chatter generated after the answer (what early termination saves)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Share of requests that stall for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Share of responses cut off mid-stream")
+    parser.add_argument("--garbage-rate", type=float, default=0.0, help="Share of streams with a non-JSON line mid-way")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        latency=args.latency, token_delay=args.token_delay, trailing_tokens=args.trailing_tokens,
+        malformed_rate=args.malformed_rate, error_rate=args.error_rate, hang_rate=args.hang_rate,
+        drop_rate=args.drop_rate, hang_seconds=args.hang_seconds, garbage_rate=args.garbage_rate, seed=args.seed
+    )
+    server, url, _ = start_server(args.port, config, args.host)
+    print(f"Fake Ollama listening on {url} (latency {args.latency}, token delay {args.token_delay}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
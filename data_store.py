@@ -0,0 +1,144 @@
+"""
+Indexed Data Store
+Hash indexes over the cached passengers and flights data so endpoints can resolve records without linear scans
+"""
+
+import threading
+from typing import Callable, Dict, List, Optional
+
+from passenger_table import PassengerTable
+
+PASSENGERS_FILE = "passengers_data.json"
+FLIGHTS_FILE = "flights_data.json"
+
+# Passenger fields that get a hash index (key -> row positions)
+PASSENGER_INDEX_FIELDS = ('id', 'passenger_id', 'pnr', 'flight_id', 'flight_number')
+
+# Flight fields that get a hash index (key -> row positions)
+FLIGHT_INDEX_FIELDS = ('flight_id', 'flight_number')
+
+
+class _IndexedTable:
+    """Rows of one data file plus hash indexes on selected fields"""
+
+    def __init__(self, source, rows: List[Dict], fields, version: int = 0):
+        self.source = source
+        self.version = version
+        self.rows = rows
+        self.indexes: Dict[str, Dict[str, List[int]]] = {field: {} for field in fields}
+        for position, row in enumerate(rows):
+            for field, index in self.indexes.items():
+                value = row.get(field)
+                if value is not None:
+                    index.setdefault(value, []).append(position)
+
+    def positions(self, field: str, value) -> List[int]:
+        return self.indexes[field].get(value, [])
+
+    def lookup(self, field: str, value) -> List[Dict]:
+        return [self.rows[i] for i in self.positions(field, value)]
+
+    def first(self, field: str, value) -> Optional[Dict]:
+        positions = self.positions(field, value)
+        return self.rows[positions[0]] if positions else None
+
+
+class DataStore:
+    """
+    Indexed view in front of the JSON data cache.
+    Indexes are rebuilt whenever the loader hands back a different object for a file,
+    i.e. after the file was dropped from the cache and reloaded.
+    """
+
+    def __init__(self, loader: Callable[[str], object]):
+        self._loader = loader
+        self._tables: Dict[str, _IndexedTable] = {}
+        self._lock = threading.Lock()
+        self._builds = 0
+        self._passenger_table: Optional[PassengerTable] = None
+
+    def _table(self, filename: str, fields) -> _IndexedTable:
+        data = self._loader(filename)
+        table = self._tables.get(filename)
+        if table is not None and table.source is data:
+            return table
+        with self._lock:
+            table = self._tables.get(filename)
+            if table is None or table.source is not data:
+                self._builds += 1
+                table = _IndexedTable(data, self._rows(filename, data), fields, self._builds)
+                if filename == PASSENGERS_FILE:
+                    self._passenger_table = PassengerTable(table.rows)
+                self._tables[filename] = table
+            return table
+
+    @staticmethod
+    def _rows(filename: str, data) -> List[Dict]:
+        """Normalize the supported file layouts to a list of records"""
+        if filename == FLIGHTS_FILE:
+            # Handle both old and new data formats
+            data = data.get('flights', data) if isinstance(data, dict) else data
+            if isinstance(data, dict):
+                data = list(data.values())
+        return data if isinstance(data, list) else []
+
+    def _passengers(self) -> _IndexedTable:
+        return self._table(PASSENGERS_FILE, PASSENGER_INDEX_FIELDS)
+
+    def _flights(self) -> _IndexedTable:
+        return self._table(FLIGHTS_FILE, FLIGHT_INDEX_FIELDS)
+
+    # ------------------------
+    # Passengers
+    # ------------------------
+
+    def passengers(self) -> List[Dict]:
+        """All passenger records"""
+        return self._passengers().rows
+
+    def passenger_table(self) -> PassengerTable:
+        """Columnar view of the passengers, rebuilt with the indexes (row positions match passengers())"""
+        self._passengers()
+        return self._passenger_table
+
+    def passengers_version(self) -> int:
+        """Changes whenever the passengers file is reloaded"""
+        return self._passengers().version
+
+    def get_passenger(self, passenger_id: str) -> Optional[Dict]:
+        """Find a passenger by either `id` or `passenger_id`"""
+        table = self._passengers()
+        positions = table.positions('id', passenger_id) + table.positions('passenger_id', passenger_id)
+        return table.rows[min(positions)] if positions else None
+
+    def get_passengers(self, passenger_ids: List[str]) -> Dict[str, Optional[Dict]]:
+        """Resolve many passenger ids in one pass; unknown ids map to None"""
+        return {passenger_id: self.get_passenger(passenger_id) for passenger_id in passenger_ids}
+
+    def passengers_by(self, field: str, value) -> List[Dict]:
+        """Passengers whose indexed `field` equals `value`, in file order"""
+        return self._passengers().lookup(field, value)
+
+    def passengers_for_flight(self, flight_id: str, flight_number: Optional[str] = None) -> List[Dict]:
+        """Passengers matching a flight by flight_id or flight_number, in file order"""
+        table = self._passengers()
+        positions = set(table.positions('flight_id', flight_id))
+        if flight_number is not None:
+            positions.update(table.positions('flight_number', flight_number))
+        return [table.rows[i] for i in sorted(positions)]
+
+    # ------------------------
+    # Flights
+    # ------------------------
+
+    def flights(self) -> List[Dict]:
+        """All flight records"""
+        return self._flights().rows
+
+    def get_flight(self, flight_id: str) -> Optional[Dict]:
+        """Find a flight by flight_id"""
+        return self._flights().first('flight_id', flight_id)
+
+    def get_flight_by_number(self, flight_number: str) -> Optional[Dict]:
+        """Find the first flight with the given flight_number"""
+        return self._flights().first('flight_number', flight_number)
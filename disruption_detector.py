@@ -3,12 +3,21 @@ Disruption Detection Engine
 Monitors flight data and detects operational issues that require intervention
 """
 
+import argparse
+import bisect
+import hashlib
 import json
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Dict, Optional, Tuple
+from dataclasses import dataclass, fields
 from enum import Enum
 
+from aviation_constants import MINIMUM_CONNECTING_TIME, DEFAULT_MINIMUM_CONNECTING_TIME
+from json_export import read_json_stream, write_json_atomic, write_json_stream
+
 class DisruptionSeverity(Enum):
     """Severity levels for disruptions"""
     LOW = "Low"
@@ -26,6 +35,61 @@ class DisruptionType(Enum):
     TECHNICAL = "Technical Issue"
     WEATHER = "Weather"
 
+# Role flags carried per passenger reference
+ROLE_HIGH_VALUE = 1           # Gold/Platinum or Business/First fare
+ROLE_CONNECTING = 2           # Onward connection affected: missed or tight (see _connection_roles)
+ROLE_CONNECTION_AT_RISK = 4   # Connection risk 'High' (needs rebooking)
+
+# Passenger fields exported once per passenger (the affected passenger entry)
+REQUIRED_PASSENGER_FIELDS = (
+    'passenger_id', 'pnr', 'full_name', 'email', 'phone', 'fare_class', 'fare_class_name', 'seat_number'
+)
+OPTIONAL_PASSENGER_FIELDS = (
+    ('loyalty_tier', None), ('frequent_flyer_number', None), ('check_in_status', None),
+    ('boarding_pass_issued', False), ('special_service_request', None), ('checked_bags', 0),
+    ('ticket_price_usd', 0)
+)
+
+PASSENGER_FIELDS = REQUIRED_PASSENGER_FIELDS + tuple(field for field, _ in OPTIONAL_PASSENGER_FIELDS)
+
+def project_passenger(p: Dict) -> List:
+    """Passenger record reduced to a row of PASSENGER_FIELDS values"""
+    return [p[field] for field in REQUIRED_PASSENGER_FIELDS] + \
+        [p.get(field, default) for field, default in OPTIONAL_PASSENGER_FIELDS]
+
+class PassengerRefs:
+    """
+    Affected passengers of one disruption as passenger ids plus a byte of role
+    flags each, instead of three lists of copied passenger dicts.
+    """
+    __slots__ = ('ids', 'roles')
+    
+    def __init__(self, ids: Iterable[str] = (), roles: Iterable[int] = ()):
+        self.ids: List[str] = list(ids)
+        self.roles = array('B', roles)
+        if len(self.roles) != len(self.ids):
+            self.roles.extend([0] * (len(self.ids) - len(self.roles)))
+    
+    def add(self, passenger_id: str, roles: int = 0):
+        self.ids.append(passenger_id)
+        self.roles.append(roles)
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def count(self, role: int) -> int:
+        return sum(1 for r in self.roles if r & role)
+    
+    def with_role(self, role: int) -> List[str]:
+        return [pid for pid, r in zip(self.ids, self.roles) if r & role]
+    
+    def to_dict(self) -> Dict:
+        return {"ids": list(self.ids), "roles": self.roles.tolist()}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'PassengerRefs':
+        return cls(data.get('ids', []), data.get('roles', []))
+
 @dataclass
 class DisruptionEvent:
     """Represents a detected disruption event"""
@@ -49,12 +113,157 @@ class DisruptionEvent:
     requires_rebooking: bool
     requires_accommodation: bool
     estimated_cost_impact: float
-    affected_passenger_list: List[Dict]  # Full passenger details
-    high_value_passenger_list: List[Dict]  # High-value passengers needing priority
-    connecting_passenger_list: List[Dict]  # Passengers with connections at risk
+    passenger_refs: PassengerRefs  # Affected passengers with high-value / connection role flags
+    
+    def to_dict(self, passengers_by_id: Dict[str, Dict], expand: bool = False) -> Dict:
+        """
+        Compact form: scalar fields, passenger_refs and one row of PASSENGER_FIELDS
+        values per referenced passenger. With expand=True, the legacy shape with
+        affected/high-value/connecting passenger lists.
+        """
+        data = {f.name: getattr(self, f.name) for f in fields(self) if f.name != 'passenger_refs'}
+        data['passenger_refs'] = self.passenger_refs.to_dict()
+        data['passenger_fields'] = list(PASSENGER_FIELDS)
+        data['passengers'] = [project_passenger(passengers_by_id[pid]) for pid in self.passenger_refs.ids]
+        return expand_disruption(data) if expand else data
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DisruptionEvent':
+        """Rebuild an event from either the compact or the expanded export shape"""
+        values = {f.name: data[f.name] for f in fields(cls) if f.name != 'passenger_refs'}
+        if 'passenger_refs' in data:
+            refs = PassengerRefs.from_dict(data['passenger_refs'])
+        else:
+            high_value = {p['passenger_id'] for p in data.get('high_value_passenger_list', [])}
+            connecting = {p['passenger_id']: p for p in data.get('connecting_passenger_list', [])}
+            refs = PassengerRefs()
+            for p in data['affected_passenger_list']:
+                pid = p['passenger_id']
+                roles = ROLE_HIGH_VALUE if pid in high_value else 0
+                if pid in connecting:
+                    roles |= ROLE_CONNECTING
+                    if connecting[pid].get('connection_risk') == 'High':
+                        roles |= ROLE_CONNECTION_AT_RISK
+                refs.add(pid, roles)
+        return cls(passenger_refs=refs, **values)
+
+def expand_disruption(data: Dict) -> Dict:
+    """
+    Expand a compact disruption dict to the legacy JSON shape with
+    affected_passenger_list, high_value_passenger_list and connecting_passenger_list.
+    connecting_passenger_list holds only passengers whose onward connection is
+    affected (ROLE_CONNECTING); connections that comfortably clear MCT are not listed.
+    Dicts already in the legacy shape are returned unchanged.
+    """
+    if 'passenger_refs' not in data:
+        return data
+    
+    passenger_fields = data.get('passenger_fields', PASSENGER_FIELDS)
+    expanded = {k: v for k, v in data.items() if k not in ('passenger_refs', 'passenger_fields', 'passengers')}
+    affected, high_value, connecting = [], [], []
+    
+    for row, roles in zip(data.get('passengers', []), data['passenger_refs']['roles']):
+        p = dict(zip(passenger_fields, row))
+        affected.append(p)
+        if roles & ROLE_HIGH_VALUE:
+            high_value.append({
+                'passenger_id': p['passenger_id'],
+                'pnr': p['pnr'],
+                'full_name': p['full_name'],
+                'email': p['email'],
+                'phone': p['phone'],
+                'fare_class': p['fare_class'],
+                'loyalty_tier': p.get('loyalty_tier'),
+                'frequent_flyer_number': p.get('frequent_flyer_number'),
+                'priority_level': 'High' if p.get('loyalty_tier') == 'Platinum' else 'Medium'
+            })
+        if roles & ROLE_CONNECTING:
+            connection_risk = 'High' if roles & ROLE_CONNECTION_AT_RISK else 'Medium'
+            connecting.append({
+                'passenger_id': p['passenger_id'],
+                'pnr': p['pnr'],
+                'full_name': p['full_name'],
+                'email': p['email'],
+                'phone': p['phone'],
+                'fare_class': p['fare_class'],
+                'loyalty_tier': p.get('loyalty_tier'),
+                'has_connection': True,
+                'connection_risk': connection_risk,
+                'needs_rebooking': connection_risk == 'High'
+            })
+    
+    expanded['affected_passenger_list'] = affected
+    expanded['high_value_passenger_list'] = high_value
+    expanded['connecting_passenger_list'] = connecting
+    return expanded
+
+def affected_passenger_count(data: Dict) -> int:
+    """Affected passengers of a disruption dict in either the compact or the expanded shape"""
+    if 'passenger_refs' in data:
+        return len(data['passenger_refs'].get('ids', []))
+    return len(data.get('affected_passenger_list', []))
+
+# Flight fields that change the resulting DisruptionEvent
+FLIGHT_FINGERPRINT_FIELDS = (
+    'flight_number', 'flight_date', 'origin', 'destination', 'disruption_status', 'disruption_reason',
+    'delay_minutes', 'scheduled_departure', 'estimated_departure', 'scheduled_arrival', 'estimated_arrival'
+)
+
+# Passenger fields copied into (or used to build) the passenger lists of an event
+PASSENGER_FINGERPRINT_FIELDS = (
+    'passenger_id', 'pnr', 'full_name', 'email', 'phone', 'fare_class', 'fare_class_name', 'seat_number',
+    'loyalty_tier', 'frequent_flyer_number', 'check_in_status', 'boarding_pass_issued',
+    'special_service_request', 'checked_bags', 'ticket_price_usd',
+    'next_segment_departure_iataCode', 'next_segment_departure_time'
+)
+
+# Connections that still clear MCT but by less than this are flagged 'Medium' risk
+TIGHT_CONNECTION_BUFFER_MINUTES = 60
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """ISO-8601 time (with or without 'Z') as epoch seconds; naive times are taken as UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+class OnwardDepartureIndex:
+    """
+    Onward departures per connection airport, bucketed by inbound flight and
+    sorted by departure time, built from the passengers' next_segment fields.
+    Finding the passengers who misconnect for a given arrival time is a bisect
+    instead of a scan.
+    """
+    
+    def __init__(self, passengers: Iterable[Dict]):
+        buckets: Dict[str, Dict[str, List[Tuple[float, str]]]] = {}
+        for p in passengers:
+            airport = p.get('next_segment_departure_iataCode')
+            departure = parse_timestamp(p.get('next_segment_departure_time'))
+            if not airport or departure is None:
+                continue
+            buckets.setdefault(airport, {}).setdefault(p['flight_id'], []).append((departure, p['passenger_id']))
+        
+        # airport -> inbound flight_id -> (sorted departure times, passenger ids in the same order)
+        self._index: Dict[str, Dict[str, Tuple[array, List[str]]]] = {}
+        for airport, by_flight in buckets.items():
+            self._index[airport] = {}
+            for flight_id, entries in by_flight.items():
+                entries.sort()
+                self._index[airport][flight_id] = (array('d', [t for t, _ in entries]), [pid for _, pid in entries])
     
-    def to_dict(self):
-        return asdict(self)
+    def departing_between(self, airport: str, flight_id: str, start: float, end: float) -> List[str]:
+        """Passengers from `flight_id` whose onward departure at `airport` is in [start, end)"""
+        bucket = self._index.get(airport, {}).get(flight_id)
+        if bucket is None:
+            return []
+        times, passenger_ids = bucket
+        return passenger_ids[bisect.bisect_left(times, start):bisect.bisect_left(times, end)]
 
 class DisruptionDetector:
     """Main disruption detection engine"""
@@ -67,19 +276,55 @@ class DisruptionDetector:
         "severe": 240     # > 240 min: Severe
     }
     
-    def __init__(self, flights_data_path: str, passengers_data_path: str):
-        """Initialize detector with data sources"""
-        self.flights = self._load_json(flights_data_path)
-        self.passengers = self._load_json(passengers_data_path)
+    def __init__(self, flights_data_path: str, passengers_data_path: str, workers: int = 1):
+        """Initialize detector with data sources; workers > 1 analyzes flights in a process pool"""
+        self.workers = workers
+        self._set_data(self._load_json(flights_data_path), self._load_json(passengers_data_path))
+        self._init_state()
+    
+    @classmethod
+    def from_records(cls, flights: List[Dict], passengers: List[Dict], workers: int = 1) -> 'DisruptionDetector':
+        """Initialize detector from already-loaded flight and passenger records"""
+        detector = cls.__new__(cls)
+        detector.workers = workers
+        detector._set_data(flights, passengers)
+        detector._init_state()
+        return detector
+    
+    def _init_state(self):
+        """Detection results plus the per-flight fingerprints used by incremental runs"""
         self.disruptions: List[DisruptionEvent] = []
+        self.flight_fingerprints: Dict[str, str] = {}
+        self._events_by_flight: Dict[str, DisruptionEvent] = {}
+        self.last_delta: Optional[Dict] = None
+    
+    def update_data(self, flights: List[Dict], passengers: List[Dict]):
+        """Swap in a fresh ops feed, keeping the previous run's fingerprints"""
+        self._set_data(flights, passengers)
+    
+    def _set_data(self, flights: List[Dict], passengers: List[Dict]):
+        """Store data and partition passengers by flight_id once for the whole run"""
+        self.flights = flights
+        self.passengers = passengers
+        self.passengers_by_flight: Dict[str, List[Dict]] = {}
+        self.passengers_by_id: Dict[str, Dict] = {}
+        for p in passengers:
+            self.passengers_by_flight.setdefault(p['flight_id'], []).append(p)
+            self.passengers_by_id[p['passenger_id']] = p
+        self.onward_departures = OnwardDepartureIndex(passengers)
         
     def _load_json(self, file_path: str) -> List[Dict]:
         """Load JSON data from file"""
         with open(file_path, 'r') as f:
             return json.load(f)
     
-    def detect_all_disruptions(self) -> List[DisruptionEvent]:
-        """Scan all flights and detect disruptions"""
+    def detect_all_disruptions(self, incremental: bool = False) -> List[DisruptionEvent]:
+        """
+        Scan all flights and detect disruptions.
+        With incremental=True only flights whose fingerprint changed since the previous
+        run are re-analyzed; self.disruptions is rebuilt as the full snapshot and
+        self.last_delta lists added, updated and resolved disruptions.
+        """
         print("="*80)
         print("DISRUPTION DETECTION ENGINE - SCANNING FLIGHTS")
         print("="*80)
@@ -90,17 +335,103 @@ class DisruptionDetector:
         print(f"⚠️  Disrupted flights detected: {len(disrupted_flights)}")
         print("\n" + "-"*80)
         
+        if not incremental:
+            for flight, disruption in zip(disrupted_flights, self._analyze_flights(disrupted_flights)):
+                self.disruptions.append(disruption)
+                self.flight_fingerprints[flight['flight_id']] = self._flight_fingerprint(flight)
+                self._events_by_flight[flight['flight_id']] = disruption
+                self._print_disruption_summary(disruption)
+            return self.disruptions
+        
+        previous = self._events_by_flight
+        fingerprints = {}
+        events_by_flight = {}
+        delta = {"added": [], "updated": [], "resolved": []}
+        
+        changed_flights = []
         for flight in disrupted_flights:
-            disruption = self._analyze_flight_disruption(flight)
-            self.disruptions.append(disruption)
+            flight_id = flight['flight_id']
+            fingerprint = self._flight_fingerprint(flight)
+            fingerprints[flight_id] = fingerprint
+            
+            if flight_id in previous and self.flight_fingerprints.get(flight_id) == fingerprint:
+                events_by_flight[flight_id] = previous[flight_id]
+            else:
+                events_by_flight[flight_id] = None  # placeholder keeps flight order
+                changed_flights.append(flight)
+        
+        for flight, disruption in zip(changed_flights, self._analyze_flights(changed_flights)):
+            flight_id = flight['flight_id']
+            events_by_flight[flight_id] = disruption
+            delta["updated" if flight_id in previous else "added"].append(disruption)
             self._print_disruption_summary(disruption)
         
+        delta["resolved"] = [event for flight_id, event in previous.items() if flight_id not in events_by_flight]
+        
+        self.flight_fingerprints = fingerprints
+        self._events_by_flight = events_by_flight
+        self.disruptions = list(events_by_flight.values())
+        self.last_delta = delta
+        
+        print(f"\n🔁 Incremental run: {len(delta['added'])} added, {len(delta['updated'])} updated, "
+              f"{len(delta['resolved'])} resolved, "
+              f"{len(self.disruptions) - len(delta['added']) - len(delta['updated'])} unchanged")
+        
         return self.disruptions
     
-    def _analyze_flight_disruption(self, flight: Dict) -> DisruptionEvent:
+    def _analyze_flights(self, flights: List[Dict]) -> List[DisruptionEvent]:
+        """
+        Analyze flights serially, or sharded across a process pool when workers > 1.
+        Each shard carries only its own flights' passenger partitions, and results
+        come back in input order.
+        """
+        if self.workers <= 1 or len(flights) < 2:
+            return [self._analyze_flight_disruption(flight) for flight in flights]
+        
+        # Several shards per worker so one slow shard doesn't idle the rest of the pool
+        shard_size = max(1, -(-len(flights) // (self.workers * 4)))
+        shards = [
+            [(flight, self.passengers_by_flight.get(flight['flight_id'], [])) for flight in flights[i:i + shard_size]]
+            for i in range(0, len(flights), shard_size)
+        ]
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            return [event for shard_events in pool.map(_analyze_flight_shard, shards) for event in shard_events]
+    
+    def _flight_fingerprint(self, flight: Dict) -> str:
+        """Stable hash of everything that feeds a flight's DisruptionEvent"""
+        passenger_state = sorted(
+            tuple(p.get(field) for field in PASSENGER_FINGERPRINT_FIELDS)
+            for p in self.passengers_by_flight.get(flight['flight_id'], [])
+        )
+        flight_state = tuple(flight.get(field) for field in FLIGHT_FINGERPRINT_FIELDS)
+        return hashlib.sha1(repr((flight_state, passenger_state)).encode()).hexdigest()
+    
+    def load_previous_snapshot(self, snapshot_path: str) -> bool:
+        """
+        Restore events and fingerprints from a previous export so the next
+        incremental run only re-analyzes changed flights. Returns False when the
+        snapshot is missing or predates fingerprinting.
+        """
+        if not os.path.exists(snapshot_path):
+            return False
+        try:
+            data = read_json_stream(snapshot_path, "disruptions")
+            fingerprints = data.get('flight_fingerprints') or {}
+            events = {d['flight_id']: DisruptionEvent.from_dict(d) for d in data.get('disruptions', [])}
+        except (ValueError, TypeError, KeyError) as e:
+            print(f"Ignoring previous snapshot {snapshot_path}: {e}")
+            return False
+        
+        self.flight_fingerprints = {fid: fp for fid, fp in fingerprints.items() if fid in events}
+        self._events_by_flight = {fid: events[fid] for fid in self.flight_fingerprints}
+        return bool(self._events_by_flight)
+    
+    def _analyze_flight_disruption(self, flight: Dict, flight_passengers: Optional[List[Dict]] = None) -> DisruptionEvent:
         """Analyze a single disrupted flight"""
         # Get affected passengers (only those who have checked in or have boarding pass)
-        all_passengers = [p for p in self.passengers if p['flight_id'] == flight['flight_id']]
+        if flight_passengers is None:
+            flight_passengers = self.passengers_by_flight.get(flight['flight_id'], [])
+        all_passengers = flight_passengers
         
         # Filter to only passengers who are likely to be affected
         # (checked in, at airport, or have boarding pass - not just booked)
@@ -114,31 +445,29 @@ class DisruptionDetector:
             affected_passengers = all_passengers
         
         # Identify high-value passengers (loyalty tier Gold/Platinum or Business/First class)
-        high_value_passengers = [
-            p for p in affected_passengers 
+        high_value_ids = {
+            p['passenger_id'] for p in affected_passengers 
             if p.get('loyalty_tier') in ['Gold', 'Platinum'] or p.get('fare_class') in ['J', 'C']
-        ]
+        }
         
-        # Identify connecting passengers (simulate - in real world, check PNR for onwards flights)
-        # For now, estimate based on long-haul routes and mark them
-        is_long_haul = self._estimate_distance(flight['origin'], flight['destination']) > 3000
-        connecting_ratio = 0.30 if is_long_haul else 0.15
-        
-        # Simulate which passengers have connections
-        import random
-        random.seed(flight['flight_id'])  # Consistent results
-        connecting_passengers = [
-            {**p, 'has_connection': True, 'connection_risk': 'High' if flight.get('delay_minutes', 0) > 90 else 'Medium'}
-            for p in affected_passengers 
-            if random.random() < connecting_ratio
-        ]
+        # Identify connecting passengers whose onward departure no longer clears MCT
+        connection_roles = self._connection_roles(flight)
+        
+        # Reference passengers by id with role flags instead of copying their details
+        passenger_refs = PassengerRefs()
+        for p in affected_passengers:
+            roles = ROLE_HIGH_VALUE if p['passenger_id'] in high_value_ids else 0
+            roles |= connection_roles.get(p['passenger_id'], 0)
+            passenger_refs.add(p['passenger_id'], roles)
+        high_value_count = passenger_refs.count(ROLE_HIGH_VALUE)
+        connecting_count = passenger_refs.count(ROLE_CONNECTING)
         
         # Determine severity
         severity = self._calculate_severity(
             flight['disruption_status'],
             flight.get('delay_minutes', 0),
             len(affected_passengers),
-            len(high_value_passengers)
+            high_value_count
         )
         
         # Check if rebooking needed
@@ -158,59 +487,6 @@ class DisruptionDetector:
             requires_accommodation
         )
         
-        # Prepare passenger lists for export
-        affected_passenger_list = [
-            {
-                'passenger_id': p['passenger_id'],
-                'pnr': p['pnr'],
-                'full_name': p['full_name'],
-                'email': p['email'],
-                'phone': p['phone'],
-                'fare_class': p['fare_class'],
-                'fare_class_name': p['fare_class_name'],
-                'seat_number': p['seat_number'],
-                'loyalty_tier': p.get('loyalty_tier'),
-                'frequent_flyer_number': p.get('frequent_flyer_number'),
-                'check_in_status': p.get('check_in_status'),
-                'boarding_pass_issued': p.get('boarding_pass_issued', False),
-                'special_service_request': p.get('special_service_request'),
-                'checked_bags': p.get('checked_bags', 0),
-                'ticket_price_usd': p.get('ticket_price_usd', 0)
-            }
-            for p in affected_passengers
-        ]
-        
-        high_value_passenger_list = [
-            {
-                'passenger_id': p['passenger_id'],
-                'pnr': p['pnr'],
-                'full_name': p['full_name'],
-                'email': p['email'],
-                'phone': p['phone'],
-                'fare_class': p['fare_class'],
-                'loyalty_tier': p.get('loyalty_tier'),
-                'frequent_flyer_number': p.get('frequent_flyer_number'),
-                'priority_level': 'High' if p.get('loyalty_tier') == 'Platinum' else 'Medium'
-            }
-            for p in high_value_passengers
-        ]
-        
-        connecting_passenger_list = [
-            {
-                'passenger_id': p['passenger_id'],
-                'pnr': p['pnr'],
-                'full_name': p['full_name'],
-                'email': p['email'],
-                'phone': p['phone'],
-                'fare_class': p['fare_class'],
-                'loyalty_tier': p.get('loyalty_tier'),
-                'has_connection': p['has_connection'],
-                'connection_risk': p['connection_risk'],
-                'needs_rebooking': p['connection_risk'] == 'High'
-            }
-            for p in connecting_passengers
-        ]
-        
         return DisruptionEvent(
             disruption_id=f"DISR_{flight['flight_id'][:8]}",
             flight_id=flight['flight_id'],
@@ -226,16 +502,52 @@ class DisruptionDetector:
             scheduled_departure=flight['scheduled_departure'],
             estimated_departure=flight['estimated_departure'],
             passengers_affected=len(affected_passengers),
-            high_value_passengers=len(high_value_passengers),
-            connecting_passengers=len(connecting_passengers),
+            high_value_passengers=high_value_count,
+            connecting_passengers=connecting_count,
             detected_at=datetime.now().isoformat(),
             requires_rebooking=requires_rebooking,
             requires_accommodation=requires_accommodation,
             estimated_cost_impact=cost_impact,
-            affected_passenger_list=affected_passenger_list,
-            high_value_passenger_list=high_value_passenger_list,
-            connecting_passenger_list=connecting_passenger_list
+            passenger_refs=passenger_refs
+        )
+    
+    def _connection_roles(self, flight: Dict) -> Dict[str, int]:
+        """
+        Connection risk per passenger of a disrupted flight, from the onward segment
+        departing the flight's destination:
+        - High: onward departure before the new arrival time + MCT (misconnect)
+        - Medium: clears MCT by less than TIGHT_CONNECTION_BUFFER_MINUTES
+        A cancelled flight puts every onward connection at risk.
+        """
+        airport = flight['destination']
+        mct = MINIMUM_CONNECTING_TIME.get(airport, DEFAULT_MINIMUM_CONNECTING_TIME) * 60
+        
+        if flight['disruption_status'] == 'Cancelled':
+            at_risk = self.onward_departures.departing_between(airport, flight['flight_id'], float('-inf'), float('inf'))
+            return {pid: ROLE_CONNECTING | ROLE_CONNECTION_AT_RISK for pid in at_risk}
+        
+        arrival = self._estimated_arrival(flight)
+        if arrival is None:
+            return {}
+        
+        cutoff = arrival + mct
+        misconnects = self.onward_departures.departing_between(airport, flight['flight_id'], float('-inf'), cutoff)
+        tight = self.onward_departures.departing_between(
+            airport, flight['flight_id'], cutoff, cutoff + TIGHT_CONNECTION_BUFFER_MINUTES * 60
         )
+        roles = {pid: ROLE_CONNECTING for pid in tight}
+        roles.update({pid: ROLE_CONNECTING | ROLE_CONNECTION_AT_RISK for pid in misconnects})
+        return roles
+    
+    def _estimated_arrival(self, flight: Dict) -> Optional[float]:
+        """New arrival time (epoch seconds): the estimate, else scheduled arrival plus the delay"""
+        estimated = parse_timestamp(flight.get('estimated_arrival'))
+        if estimated is not None:
+            return estimated
+        scheduled = parse_timestamp(flight.get('scheduled_arrival'))
+        if scheduled is None:
+            return None
+        return scheduled + flight.get('delay_minutes', 0) * 60
     
     def _calculate_severity(
         self, 
@@ -356,33 +668,65 @@ class DisruptionDetector:
         print(f"   Detected: {disruption.detected_at}")
         
         # Show sample of affected passengers
-        if disruption.affected_passenger_list:
+        refs = disruption.passenger_refs
+        if refs.ids:
             print(f"\n   📋 Sample Affected Passengers (showing first 3):")
-            for pax in disruption.affected_passenger_list[:3]:
-                status = "✓ Checked In" if pax['check_in_status'] == 'Checked In' else "○ Not Checked In"
+            for pid in refs.ids[:3]:
+                pax = self.passengers_by_id[pid]
+                status = "✓ Checked In" if pax.get('check_in_status') == 'Checked In' else "○ Not Checked In"
                 print(f"      - {pax['full_name']} (PNR: {pax['pnr']}) - {pax['fare_class_name']} - {status}")
         
         # Show connecting passengers at risk
-        if disruption.connecting_passenger_list:
-            high_risk = [p for p in disruption.connecting_passenger_list if p['connection_risk'] == 'High']
-            if high_risk:
-                print(f"\n   🔄 Passengers at Risk of Missing Connections: {len(high_risk)}")
-                for pax in high_risk[:2]:
-                    print(f"      - {pax['full_name']} (PNR: {pax['pnr']}) - Connection at risk")
-    
-    def export_disruptions(self, output_path: str = "detected_disruptions.json"):
-        """Export detected disruptions to JSON file"""
-        data = {
+        high_risk = refs.with_role(ROLE_CONNECTION_AT_RISK)
+        if high_risk:
+            print(f"\n   🔄 Passengers at Risk of Missing Connections: {len(high_risk)}")
+            for pid in high_risk[:2]:
+                pax = self.passengers_by_id[pid]
+                print(f"      - {pax['full_name']} (PNR: {pax['pnr']}) - Connection at risk")
+    
+    def export_disruptions(
+        self,
+        output_path: str = "detected_disruptions.json",
+        expand: bool = False,
+        fmt: Optional[str] = None,
+        compress: Optional[bool] = None
+    ):
+        """
+        Stream detected disruptions to a file one record at a time (compact form
+        unless expand=True). fmt is 'json' or 'jsonl' and compress enables gzip;
+        both default from the file extension (.jsonl, .gz). The file is written
+        to a temp file and renamed into place.
+        """
+        header = {
             "detection_timestamp": datetime.now().isoformat(),
             "total_flights_scanned": len(self.flights),
             "total_disruptions_detected": len(self.disruptions),
             "total_passengers_affected": sum(d.passengers_affected for d in self.disruptions),
             "total_estimated_cost": sum(d.estimated_cost_impact for d in self.disruptions),
-            "disruptions": [d.to_dict() for d in self.disruptions]
+            "flight_fingerprints": {
+                d.flight_id: self.flight_fingerprints[d.flight_id]
+                for d in self.disruptions if d.flight_id in self.flight_fingerprints
+            }
+        }
+        records = (d.to_dict(self.passengers_by_id, expand) for d in self.disruptions)
+        write_json_stream(output_path, header, "disruptions", records, fmt=fmt, compress=compress)
+        
+        return output_path
+    
+    def export_delta(self, output_path: str = "detected_disruptions_delta.json", expand: bool = False):
+        """Export the added/updated/resolved disruptions of the last incremental run"""
+        delta = self.last_delta or {"added": [], "updated": [], "resolved": []}
+        data = {
+            "detection_timestamp": datetime.now().isoformat(),
+            "added": [d.to_dict(self.passengers_by_id, expand) for d in delta["added"]],
+            "updated": [d.to_dict(self.passengers_by_id, expand) for d in delta["updated"]],
+            "resolved": [
+                {"disruption_id": d.disruption_id, "flight_id": d.flight_id, "flight_number": d.flight_number}
+                for d in delta["resolved"]
+            ]
         }
         
-        with open(output_path, 'w') as f:
-            json.dump(data, f, indent=2)
+        write_json_atomic(output_path, data)
         
         return output_path
     
@@ -406,20 +750,43 @@ class DisruptionDetector:
             "total_estimated_cost": sum(d.estimated_cost_impact for d in self.disruptions)
         }
 
+def _analyze_flight_shard(shard: List[Tuple[Dict, List[Dict]]]) -> List[DisruptionEvent]:
+    """Process-pool worker: analyze a shard of (flight, flight passengers) pairs"""
+    detector = DisruptionDetector.from_records([], [p for _, passengers in shard for p in passengers])
+    return [detector._analyze_flight_disruption(flight, passengers) for flight, passengers in shard]
+
 def main():
     """Main execution"""
+    parser = argparse.ArgumentParser(description="Detect flight disruptions")
+    parser.add_argument("--flights", default="test_data/flights_data.json")
+    parser.add_argument("--passengers", default="test_data/passengers_data.json")
+    parser.add_argument("--output", default="detected_disruptions.json")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Re-analyze only flights changed since the snapshot at --output and write a delta")
+    parser.add_argument("--delta-output", default="detected_disruptions_delta.json")
+    parser.add_argument("--workers", type=int, default=1, help="Process pool size for flight analysis")
+    parser.add_argument("--expanded", action="store_true",
+                        help="Export full passenger lists per disruption instead of the compact form")
+    parser.add_argument("--format", choices=["json", "jsonl"], help="Export format (default: from --output extension)")
+    parser.add_argument("--gzip", action="store_true", default=None, help="Gzip the export (default: --output ends in .gz)")
+    args = parser.parse_args()
+    
     print("\n" + "="*80)
     print("AIRLINE DISRUPTION DETECTION ENGINE - INITIALIZING")
     print("="*80 + "\n")
     
     # Initialize detector
     detector = DisruptionDetector(
-        flights_data_path="test_data/flights_data.json",
-        passengers_data_path="test_data/passengers_data.json"
+        flights_data_path=args.flights,
+        passengers_data_path=args.passengers,
+        workers=args.workers
     )
     
+    if args.incremental and not detector.load_previous_snapshot(args.output):
+        print(f"ℹ️  No usable previous snapshot at {args.output}; analyzing all flights")
+    
     # Detect disruptions
-    disruptions = detector.detect_all_disruptions()
+    disruptions = detector.detect_all_disruptions(incremental=args.incremental)
     
     # Generate summary
     print("\n" + "="*80)
@@ -443,8 +810,11 @@ def main():
     print(f"   Flights needing accommodation: {summary['flights_requiring_accommodation']}")
     
     # Export results
-    output_file = detector.export_disruptions()
+    output_file = detector.export_disruptions(args.output, expand=args.expanded, fmt=args.format, compress=args.gzip)
     print(f"\n✅ Disruption data exported to: {output_file}")
+    if args.incremental:
+        delta_file = detector.export_delta(args.delta_output, expand=args.expanded)
+        print(f"✅ Disruption delta exported to: {delta_file}")
     
     print("\n" + "="*80)
     print("✓ DETECTION COMPLETE")
@@ -0,0 +1,241 @@
+"""
+Eligibility Rule Engine
+Declarative disruption, recovery-action, priority and voucher rules compiled into NumPy column evaluators that run over many passengers at once
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from aviation_constants import MINIMUM_CONNECTING_TIME, DEFAULT_MINIMUM_CONNECTING_TIME, DELAY_THRESHOLDS
+
+# Arrival delay (minutes) above which a passenger without a connection counts as disrupted
+NO_CONNECTION_DELAY_THRESHOLD = 60
+
+
+class Column:
+    """Rule operand that refers to another column instead of a constant"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+# A condition is (column, op, operand); a rule's `when` holds only if all its conditions do.
+# Disrupted if any of these rules holds (connection missed, or long delay without one)
+DISRUPTION_RULES = [
+    {'when': [('has_connection', 'is', True), ('delay_minutes', '>=', Column('mct'))]},
+    {'when': [('has_connection', 'is', False), ('delay_minutes', '>', NO_CONNECTION_DELAY_THRESHOLD)]},
+]
+
+# Recovery actions of a disrupted passenger, in the order they are listed in `eligible_for`
+ACTION_RULES = [
+    {'action': 'meal', 'when': [('delay_minutes', '>=', DELAY_THRESHOLDS['short_meal'])]},
+    {'action': 'compensation', 'when': [('delay_minutes', '>=', DELAY_THRESHOLDS['high_compensation'])]},
+    {'action': 'rebooking', 'when': []},
+    {'action': 'hotel', 'when': [('delay_minutes', '>=', DELAY_THRESHOLDS['medium_hotel'])]},
+    {'action': 'transport', 'when': [('delay_minutes', '>=', DELAY_THRESHOLDS['medium_hotel'])]},
+]
+
+# First matching rule sets a disrupted passenger's priority; DEFAULT_PRIORITY otherwise
+PRIORITY_RULES = [
+    {'priority': 'high', 'when': [('loyalty_tier', 'in', ('Platinum', 'Gold'))]},
+    {'priority': 'high', 'when': [('has_ssr', 'is', True)]},
+    {'priority': 'high', 'when': [('delay_minutes', '>', 180)]},
+    {'priority': 'medium', 'when': [('delay_minutes', '>', 120)]},
+]
+DEFAULT_PRIORITY = 'low'
+
+# Vouchers suggested to a passenger (disrupted or not); amounts are by ticket class with a
+# `default_amount` for other cabins, and `quantity_every` adds one voucher per that many delay minutes
+VOUCHER_RULES = [
+    {'type': 'meal', 'when': [('delay_minutes', '>', 60)],
+     'amounts': {'Economy': 25, 'Business': 40}, 'default_amount': 75, 'quantity_every': 240},
+    {'type': 'hotel', 'when': [('delay_minutes', '>', 180)],
+     'amounts': {'Economy': 150, 'Business': 200}, 'default_amount': 300},
+    {'type': 'transportation', 'when': [], 'amounts': {}, 'default_amount': 50},
+]
+
+# Rough per-passenger cost (USD) of each recovery action, for disruption analysis
+ACTION_COSTS = {'meal': 25, 'rebooking': 50, 'hotel': 150, 'compensation': 250}
+
+_OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+}
+
+
+def _compile_condition(condition):
+    column, op, operand = condition
+    if op == 'is':
+        return lambda cols: cols[column] == operand
+    if op == 'in':
+        values = list(operand)
+        return lambda cols: np.isin(cols[column], values)
+    compare = _OPERATORS[op]
+    if isinstance(operand, Column):
+        return lambda cols: compare(cols[column], cols[operand.name])
+    return lambda cols: compare(cols[column], operand)
+
+
+def _compile_rule(rule: Dict):
+    """Rule -> cols -> bool array (all conditions hold)"""
+    conditions = [_compile_condition(c) for c in rule['when']]
+
+    def evaluate(cols):
+        mask = np.ones(len(cols['delay_minutes']), dtype=bool)
+        for condition in conditions:
+            mask &= condition(cols)
+        return mask
+
+    return evaluate
+
+
+def passenger_columns(passengers: Sequence[Dict], delay_minutes) -> Dict[str, np.ndarray]:
+    """
+    Rule input columns for `passengers`. `delay_minutes` is one flight's delay or
+    a per-passenger sequence (when the passengers are on different flights).
+    """
+    count = len(passengers)
+    connection_airports = [p.get('next_segment_arrival_iataCode') for p in passengers]
+    return {
+        'delay_minutes': np.broadcast_to(np.asarray(delay_minutes, dtype=np.float64), (count,)),
+        'has_connection': np.fromiter(
+            (bool(p.get('connecting_flight')) and bool(airport) for p, airport in zip(passengers, connection_airports)),
+            dtype=bool, count=count
+        ),
+        'mct': np.fromiter(
+            (MINIMUM_CONNECTING_TIME.get(airport, DEFAULT_MINIMUM_CONNECTING_TIME) for airport in connection_airports),
+            dtype=np.int64, count=count
+        ),
+        'loyalty_tier': np.array([p.get('loyalty_tier') or '' for p in passengers], dtype=object),
+        'has_ssr': np.fromiter((bool(p.get('special_service_request')) for p in passengers), dtype=bool, count=count),
+        'ticket_class': np.array([p.get('ticket_class', p.get('fare_class_name', 'Economy')) for p in passengers], dtype=object),
+    }
+
+
+def flight_delay(flight: Dict) -> int:
+    return flight.get('delay_minutes') or 0
+
+
+def _minutes(value: float):
+    """A delay as the flight data gave it: whole minutes print without a trailing .0"""
+    return int(value) if float(value).is_integer() else float(value)
+
+
+class EligibilityResult:
+    """Per-passenger rule outcomes of one evaluation, as parallel arrays"""
+
+    def __init__(self, passengers: Sequence[Dict], delay_minutes: np.ndarray, disrupted: np.ndarray,
+                 actions: Dict[str, np.ndarray], priority: np.ndarray, vouchers: List[Tuple]):
+        self.passengers = passengers
+        self.delay_minutes = delay_minutes
+        self.disrupted = disrupted
+        self.actions = actions
+        self.priority = priority
+        # (type, mask, amount, quantity) arrays per voucher rule
+        self._vouchers = vouchers
+
+    def __len__(self) -> int:
+        return len(self.passengers)
+
+    def disrupted_indexes(self) -> List[int]:
+        return np.flatnonzero(self.disrupted).tolist()
+
+    def eligibility(self, index: int) -> Dict:
+        """The eligibility dict (eligible_for, priority, reason) for one passenger"""
+        passenger = self.passengers[index]
+        eligibility = {
+            'eligible_for': [],
+            'priority': DEFAULT_PRIORITY,
+            'reason': '',
+            'passenger_id': passenger.get('id') or passenger.get('passenger_id')
+        }
+        if not self.disrupted[index]:
+            return eligibility
+        eligibility['eligible_for'] = [action for action, mask in self.actions.items() if mask[index]]
+        eligibility['priority'] = self.priority[index]
+        eligibility['reason'] = (f"Disrupted passenger: {_minutes(self.delay_minutes[index])}min delay, "
+                                 f"Connection at {passenger.get('next_segment_arrival_iataCode', 'N/A')}")
+        return eligibility
+
+    def vouchers(self, index: int) -> List[Dict]:
+        """Suggested vouchers for one passenger"""
+        return [
+            {
+                "type": voucher_type,
+                "amount": int(amount[index]),
+                "quantity": int(quantity[index]),
+                "total": int(amount[index] * quantity[index])
+            }
+            for voucher_type, mask, amount, quantity in self._vouchers if mask[index]
+        ]
+
+    def action_counts(self) -> Dict[str, int]:
+        """Eligible passengers per action"""
+        return {action: int(mask.sum()) for action, mask in self.actions.items()}
+
+    def estimated_cost(self, costs: Optional[Dict[str, int]] = None) -> int:
+        costs = costs if costs is not None else ACTION_COSTS
+        return sum(costs[action] * count for action, count in self.action_counts().items() if action in costs)
+
+
+class EligibilityEngine:
+    """
+    Compiles DISRUPTION_RULES, ACTION_RULES, PRIORITY_RULES and VOUCHER_RULES (or
+    custom tables) once; evaluate() then applies them to a whole batch of passengers
+    with vectorized column operations. Non-disrupted passengers get no actions.
+    """
+
+    def __init__(self, disruption_rules: Iterable[Dict] = DISRUPTION_RULES, action_rules: Iterable[Dict] = ACTION_RULES,
+                 priority_rules: Iterable[Dict] = PRIORITY_RULES, default_priority: str = DEFAULT_PRIORITY,
+                 voucher_rules: Iterable[Dict] = VOUCHER_RULES):
+        self._disruption = [_compile_rule(rule) for rule in disruption_rules]
+        self._actions = [(rule['action'], _compile_rule(rule)) for rule in action_rules]
+        self._priorities = [(rule['priority'], _compile_rule(rule)) for rule in priority_rules]
+        self.default_priority = default_priority
+        self._vouchers = [(rule, _compile_rule(rule)) for rule in voucher_rules]
+
+    def evaluate_columns(self, passengers: Sequence[Dict], cols: Dict[str, np.ndarray]) -> EligibilityResult:
+        count = len(cols['delay_minutes'])
+        disrupted = np.zeros(count, dtype=bool)
+        for rule in self._disruption:
+            disrupted |= rule(cols)
+
+        actions = {}
+        for action, rule in self._actions:
+            mask = disrupted & rule(cols)
+            actions[action] = actions[action] | mask if action in actions else mask
+
+        # Apply priority rules last-to-first so the first matching rule wins
+        priority = np.full(count, self.default_priority, dtype=object)
+        for level, rule in reversed(self._priorities):
+            priority[rule(cols)] = level
+
+        vouchers = []
+        for rule, condition in self._vouchers:
+            amounts = rule['amounts']
+            amount = np.fromiter((amounts.get(c, rule['default_amount']) for c in cols['ticket_class']),
+                                 dtype=np.int64, count=count)
+            quantity = np.ones(count, dtype=np.int64)
+            if rule.get('quantity_every'):
+                quantity += (np.maximum(cols['delay_minutes'], 0) // rule['quantity_every']).astype(np.int64)
+            vouchers.append((rule['type'], condition(cols), amount, quantity))
+
+        return EligibilityResult(passengers, cols['delay_minutes'], disrupted, actions, priority, vouchers)
+
+    def evaluate(self, passengers: Sequence[Dict], flight: Optional[Dict] = None, delay_minutes=None) -> EligibilityResult:
+        """Rules for `passengers` on `flight`, or with explicit per-passenger `delay_minutes`"""
+        if delay_minutes is None:
+            delay_minutes = flight_delay(flight or {})
+        return self.evaluate_columns(passengers, passenger_columns(passengers, delay_minutes))
+
+    def evaluate_rows(self, table, rows, delay_minutes) -> EligibilityResult:
+        """Rules for `rows` of a passenger_table.PassengerTable, read from its columns"""
+        return self.evaluate_columns(table.records_at(rows), table.eligibility_columns(rows, delay_minutes))
+
+
+# Shared engine for the default rule tables
+default_engine = EligibilityEngine()
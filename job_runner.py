@@ -0,0 +1,154 @@
+"""
+In-Process Job Runner
+Worker threads that run queued background jobs and track their status and progress
+"""
+
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_WORKERS = 1
+
+# Finished jobs kept for status queries before the oldest are forgotten
+DEFAULT_MAX_FINISHED = 100
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    """A queued unit of work; `fn(job)` reports progress through advance()"""
+
+    def __init__(self, kind: str, fn: Callable[['Job'], object], params: Dict, key: Optional[str] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.params = params
+        self.fn = fn
+        self.status = QUEUED
+        self.total = 0
+        self.completed = 0
+        self.counts: Dict[str, int] = {}
+        self.result = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+        self.elapsed_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def set_total(self, total: int):
+        with self._lock:
+            self.total = total
+
+    def advance(self, outcome: Optional[str] = None, amount: int = 1):
+        """Mark `amount` items complete, optionally tallied under `outcome`"""
+        with self._lock:
+            self.completed += amount
+            if outcome:
+                self.counts[outcome] = self.counts.get(outcome, 0) + amount
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "kind": self.kind,
+                "params": self.params,
+                "status": self.status,
+                "progress": {
+                    "total": self.total,
+                    "completed": self.completed,
+                    "percent": round(100 * self.completed / self.total, 1) if self.total else (100.0 if self.finished else 0.0),
+                    **self.counts,
+                },
+                "result": self.result,
+                "error": self.error,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_seconds": self.elapsed_seconds,
+            }
+
+
+class JobRunner:
+    """
+    Runs submitted jobs on `workers` daemon threads in submission order.
+    A job submitted with a `key` that matches a queued or running job returns
+    that job instead of queueing a duplicate.
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_finished: int = DEFAULT_MAX_FINISHED, name: str = "job"):
+        self._workers = workers
+        self._max_finished = max_finished
+        self._name = name
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._active_keys: Dict[str, Job] = {}
+        self._threads: List[threading.Thread] = []
+
+    def _start(self):
+        """Start the worker threads on first use (called with the lock held)"""
+        if self._threads:
+            return
+        for i in range(self._workers):
+            thread = threading.Thread(target=self._run, name=f"{self._name}-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind: str, fn: Callable[[Job], object], key: Optional[str] = None, **params) -> Job:
+        with self._lock:
+            self._start()
+            if key is not None and key in self._active_keys:
+                return self._active_keys[key]
+            job = Job(kind, fn, params, key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active_keys[key] = job
+            self._prune()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """All tracked jobs, newest first"""
+        with self._lock:
+            return list(reversed(list(self._jobs.values())))
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond max_finished (called with the lock held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self._max_finished)]:
+            del self._jobs[job_id]
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            job.status = RUNNING
+            job.started_at = datetime.now().isoformat()
+            start = time.monotonic()
+            try:
+                job.result = job.fn(job)
+                job.status = SUCCEEDED
+            except Exception as e:
+                print(f"Error in {job.kind} job {job.id}: {e}")
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                job.finished_at = datetime.now().isoformat()
+                job.elapsed_seconds = round(time.monotonic() - start, 2)
+                with self._lock:
+                    if job.key is not None and self._active_keys.get(job.key) is job:
+                        del self._active_keys[job.key]
+                self._queue.task_done()
@@ -0,0 +1,103 @@
+"""
+Streaming JSON Export
+Atomic, optionally gzip-compressed writers that emit records one at a time as a JSON document or JSONL
+"""
+
+import gzip
+import io
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+FORMATS = ("json", "jsonl")
+
+
+def resolve_format(path: str, fmt: Optional[str] = None, compress: Optional[bool] = None) -> Tuple[str, bool]:
+    """Format and compression for `path`; unspecified values are inferred from the extension"""
+    if compress is None:
+        compress = path.endswith(".gz")
+    if fmt is None:
+        base = path[:-3] if path.endswith(".gz") else path
+        fmt = "jsonl" if base.endswith(".jsonl") else "json"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return fmt, compress
+
+
+@contextmanager
+def atomic_writer(path: str, compress: bool = False):
+    """
+    Text stream into a temp file next to `path` that is fsync'd and renamed over
+    `path` on success, so readers never see a half-written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", dir=directory)
+    raw = os.fdopen(fd, 'wb')
+    try:
+        stream = gzip.GzipFile(fileobj=raw, mode='wb', filename='') if compress else raw
+        text = io.TextIOWrapper(stream, encoding='utf-8')
+        yield text
+        text.flush()
+        text.detach()
+        if compress:
+            stream.close()  # writes the gzip trailer; raw stays open
+        raw.flush()
+        os.fsync(raw.fileno())
+        raw.close()
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        raw.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_json_atomic(path: str, data, indent: Optional[int] = None):
+    """Dump a whole object to `path` through a temp file and rename"""
+    with atomic_writer(path) as f:
+        json.dump(data, f, indent=indent)
+
+
+def write_json_stream(path: str, header: Dict, records_key: str, records: Iterable[Dict],
+                      fmt: Optional[str] = None, compress: Optional[bool] = None) -> int:
+    """
+    Write `header` plus `records` without building the document in memory.
+    json:  {<header fields>, "<records_key>": [record, record, ...]}
+    jsonl: the header object on the first line, then one record per line
+    Returns the number of records written.
+    """
+    fmt, compress = resolve_format(path, fmt, compress)
+    count = 0
+    with atomic_writer(path, compress) as f:
+        if fmt == "jsonl":
+            f.write(json.dumps(header) + "\n")
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+                count += 1
+        else:
+            f.write("{")
+            for key, value in header.items():
+                f.write(f"{json.dumps(key)}: {json.dumps(value)}, ")
+            f.write(f"{json.dumps(records_key)}: [")
+            for record in records:
+                if count:
+                    f.write(", ")
+                f.write(json.dumps(record))
+                count += 1
+            f.write("]}")
+    return count
+
+
+def read_json_stream(path: str, records_key: str, fmt: Optional[str] = None, compress: Optional[bool] = None) -> Dict:
+    """Read a document written by write_json_stream back into {<header fields>, records_key: [...]}"""
+    fmt, compress = resolve_format(path, fmt, compress)
+    opener = gzip.open if compress else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        if fmt == "json":
+            return json.load(f)
+        header = json.loads(f.readline() or "{}")
+        header[records_key] = [json.loads(line) for line in f if line.strip()]
+        return header
@@ -0,0 +1,158 @@
+"""
+LLM Response Cache
+Persistent content-addressed cache of Ollama responses keyed by a hash of (model, options, prompt)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+DEFAULT_CACHE_FILE = "llm_cache.db"
+
+# Entries kept before least-recently-used ones are evicted
+DEFAULT_MAX_ENTRIES = 5000
+
+# Seconds an entry stays valid (None = never expires)
+DEFAULT_TTL = 7 * 24 * 3600
+
+
+def cache_key(model: str, options: Dict, prompt: str) -> str:
+    """Content address of an LLM request: sha256 over the canonical JSON of (model, options, prompt)"""
+    payload = json.dumps([model, options or {}, prompt], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """
+    LLM responses in a local SQLite database, bounded to `max_entries` with LRU
+    eviction and an optional TTL. Hit/miss counters cover this process only.
+    """
+
+    SCHEMA = (
+        """CREATE TABLE IF NOT EXISTS llm_responses (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            response TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            last_used REAL NOT NULL
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used)",
+    )
+
+    def __init__(self, db_path: str, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: Optional[float] = DEFAULT_TTL):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside the writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def get(self, model: str, options: Dict, prompt: str) -> Optional[str]:
+        """Cached response for the request, or None on a miss or an expired entry"""
+        key = cache_key(model, options, prompt)
+        conn = self._conn()
+        row = conn.execute("SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+            with conn:
+                conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            self._count('expired')
+            row = None
+        if row is None:
+            self._count('misses')
+            return None
+        with conn:
+            conn.execute("UPDATE llm_responses SET last_used = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        return row[0]
+
+    def put(self, model: str, options: Dict, prompt: str, response: str):
+        """Store a response, evicting least-recently-used entries beyond max_entries"""
+        key = cache_key(model, options, prompt)
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, model, response, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now)
+            )
+            evicted = conn.execute(
+                "DELETE FROM llm_responses WHERE key IN ("
+                "SELECT key FROM llm_responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+        if evicted > 0:
+            self._count('evictions', evicted)
+
+    def clear(self):
+        """Drop every cached response"""
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM llm_responses")
+
+    def stats(self) -> Dict:
+        """Counters since start-up plus the current number of entries"""
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['entries'] = self._conn().execute("SELECT COUNT(*) FROM llm_responses").fetchone()[0]
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl
+        return stats
+
+
+def open_cache(data_dir: str = "test_data") -> Optional[LLMCache]:
+    """
+    Cache configured from the environment, or None when disabled:
+    LLM_CACHE=off disables it, LLM_CACHE_DB overrides the file path,
+    LLM_CACHE_MAX_ENTRIES and LLM_CACHE_TTL (seconds, 0 = no expiry) bound it.
+    """
+    if os.environ.get('LLM_CACHE', 'on').lower() in ('0', 'off', 'false', 'no'):
+        return None
+    ttl = float(os.environ.get('LLM_CACHE_TTL', DEFAULT_TTL))
+    return LLMCache(
+        os.environ.get('LLM_CACHE_DB') or os.path.join(data_dir, DEFAULT_CACHE_FILE),
+        max_entries=int(os.environ.get('LLM_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)),
+        ttl=ttl or None
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or clear the LLM response cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    parser.add_argument("--db", default=os.path.join("test_data", DEFAULT_CACHE_FILE))
+    args = parser.parse_args()
+
+    cache = LLMCache(args.db)
+    if args.command == "clear":
+        cache.clear()
+        print(f"Cleared {args.db}")
+    else:
+        print(json.dumps(cache.stats(), indent=2))
+
+if __name__ == "__main__":
+    main()
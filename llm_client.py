@@ -0,0 +1,417 @@
+"""
+Streaming Ollama Client
+Consumes Ollama's token stream, extracts the JSON object incrementally and stops generation once it is complete
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from llm_cache import LLMCache
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+# Non-JSON characters tolerated before the first '{' before giving up on a JSON answer
+MAX_PREAMBLE_CHARS = 200
+
+# Keep-alive connections held open to the Ollama server
+DEFAULT_POOL_SIZE = 8
+
+# Seconds to establish a TCP connection; the per-call timeout applies to reads only
+DEFAULT_CONNECT_TIMEOUT = 3.05
+
+# Recent calls kept for latency percentiles
+METRICS_WINDOW = 1000
+
+# Consecutive failures that open the circuit, and seconds before a half-open probe
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_RESET_TIMEOUT = 30
+
+
+class LLMUnavailable(requests.exceptions.RequestException):
+    """Raised without contacting Ollama while the circuit breaker is open"""
+
+
+class LLMDeadlineExceeded(requests.exceptions.Timeout):
+    """Raised when a streamed call passes its deadline or is cancelled; the response is closed"""
+
+
+class LLMMalformedResponse(requests.exceptions.RequestException):
+    """Raised when a line of Ollama's NDJSON stream is not valid JSON (garbled or truncated)"""
+
+
+def _percentile(values, fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LLMMetrics:
+    """
+    Per-call latency, time to first token, token counts and errors.
+    Counters cover the process lifetime; percentiles the last METRICS_WINDOW calls.
+    """
+
+    def __init__(self, window: int = METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._first_token = deque(maxlen=window)
+        self.calls = 0
+        self.cache_hits = 0
+        self.errors: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.generation_seconds = 0.0
+
+    def record_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def record(self, call: Dict, error: Optional[Exception] = None):
+        """Record one finished call from the stats dict filled in while streaming"""
+        latency = time.monotonic() - call['started']
+        with self._lock:
+            self.calls += 1
+            self._latencies.append(latency)
+            if call.get('first_token') is not None:
+                self._first_token.append(call['first_token'] - call['started'])
+            self.prompt_tokens += call.get('prompt_tokens', 0)
+            self.completion_tokens += call.get('completion_tokens', 0)
+            self.generation_seconds += latency
+            if error is not None:
+                name = type(error).__name__
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            latencies = list(self._latencies)
+            first_token = list(self._first_token)
+            error_count = sum(self.errors.values())
+            return {
+                'calls': self.calls,
+                'cache_hits': self.cache_hits,
+                'errors': dict(self.errors),
+                'error_rate': round(error_count / self.calls, 3) if self.calls else 0.0,
+                'latency_ms': {
+                    'p50': _ms(_percentile(latencies, 0.5)),
+                    'p95': _ms(_percentile(latencies, 0.95)),
+                    'max': _ms(max(latencies) if latencies else None),
+                },
+                'first_token_ms_p50': _ms(_percentile(first_token, 0.5)),
+                'tokens': {
+                    'prompt': self.prompt_tokens,
+                    'completion': self.completion_tokens,
+                    'completion_per_second': round(self.completion_tokens / self.generation_seconds, 1)
+                    if self.generation_seconds else 0.0,
+                },
+            }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+
+class CircuitBreaker:
+    """
+    closed: calls go through; `failure_threshold` consecutive failures open the circuit.
+    open: calls are refused until `reset_timeout` seconds have passed.
+    half_open: a single probe call is let through; success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD, reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the probe slot when half-open)"""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Exception):
+        with self._lock:
+            self.consecutive_failures += 1
+            self.last_error = str(error)
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            retry_in = None
+            if self.state == self.OPEN:
+                retry_in = round(max(0.0, self.opened_at + self.reset_timeout - time.monotonic()), 1)
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout_seconds': self.reset_timeout,
+                'retry_in_seconds': retry_in,
+                'rejected_calls': self.rejected,
+                'last_error': self.last_error,
+            }
+
+
+class JSONObjectScanner:
+    """
+    Incremental scanner for the first top-level JSON object in a text stream.
+    Tracks brace depth outside string literals, so a complete object is spotted
+    the moment its closing brace arrives without re-parsing the whole buffer.
+    """
+
+    def __init__(self, max_preamble: int = MAX_PREAMBLE_CHARS):
+        self.max_preamble = max_preamble
+        self.reset()
+
+    def reset(self):
+        self._object: list = []
+        self._preamble = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._rest = ''
+        self.hopeless = False
+
+    def feed(self, text: str) -> Optional[str]:
+        """Consume a chunk; returns the object text as soon as its outermost brace closes"""
+        for i, ch in enumerate(text):
+            if self._depth == 0:
+                if ch == '{':
+                    self._depth = 1
+                    self._object = ['{']
+                elif not ch.isspace():
+                    self._preamble += 1
+                    if self._preamble > self.max_preamble:
+                        self.hopeless = True
+                        return None
+                continue
+
+            self._object.append(ch)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == '{':
+                self._depth += 1
+            elif ch == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._rest = text[i + 1:]
+                    return ''.join(self._object)
+        return None
+
+    def resume(self) -> Optional[str]:
+        """After a rejected object, scan the remainder of the chunk it closed in for the next one"""
+        rest = self._rest
+        preamble = self._preamble
+        self.reset()
+        self._preamble = preamble
+        return self.feed(rest) if rest else None
+
+
+class OllamaClient:
+    """
+    Ollama /api/generate client using streamed responses.
+    generate_json() returns as soon as a complete object with the required keys
+    has been received and closes the stream, which makes Ollama stop generating;
+    it also gives up early when the output is clearly not JSON.
+    Responses are looked up in / stored to the optional LLMCache.
+    Calls go through a CircuitBreaker: while it is open they raise LLMUnavailable
+    immediately so callers fall back to their rule-based path.
+    All traffic shares one keep-alive Session (pool_size connections) with a short
+    connect timeout; the per-call timeout bounds each read. A call can also be given
+    an absolute `deadline` (time.monotonic()) and a `cancel` Event, checked between
+    stream chunks, so a slowly trickling answer is cut off and its connection freed.
+    Per-call latency, token counts and errors are recorded in `metrics`.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, cache: Optional[LLMCache] = None,
+                 breaker: Optional[CircuitBreaker] = None, pool_size: Optional[int] = None,
+                 connect_timeout: Optional[float] = None):
+        self.base_url = (base_url or os.environ.get('OLLAMA_URL', DEFAULT_OLLAMA_URL)).rstrip('/')
+        self.cache = cache
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.environ.get('LLM_BREAKER_FAILURES', DEFAULT_FAILURE_THRESHOLD)),
+            reset_timeout=float(os.environ.get('LLM_BREAKER_RESET_SECONDS', DEFAULT_RESET_TIMEOUT))
+        )
+        self.pool_size = pool_size or int(os.environ.get('LLM_POOL_SIZE', DEFAULT_POOL_SIZE))
+        self.connect_timeout = connect_timeout or float(os.environ.get('LLM_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT))
+        self.metrics = LLMMetrics()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=False, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def status(self) -> Dict:
+        """Endpoint, pool settings, circuit breaker state and call metrics, for health checks"""
+        return {
+            'url': self.base_url,
+            'pool_size': self.pool_size,
+            'connect_timeout_seconds': self.connect_timeout,
+            'circuit_breaker': self.breaker.snapshot(),
+            'metrics': self.metrics.snapshot(),
+        }
+
+    def _guarded(self, call):
+        """Run `call(stats)` through the circuit breaker, recording its outcome and metrics"""
+        if not self.breaker.allow():
+            raise LLMUnavailable(f"circuit open for {self.base_url}")
+        stats = {'started': time.monotonic()}
+        try:
+            result = call(stats)
+        except Exception as e:
+            self.breaker.record_failure(e)
+            self.metrics.record(stats, e)
+            raise
+        self.breaker.record_success()
+        self.metrics.record(stats)
+        return result
+
+    def _cached(self, model: str, options: Dict, prompt: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        cached = self.cache.get(model, options, prompt)
+        if cached is not None:
+            self.metrics.record_cache_hit()
+        return cached
+
+    @staticmethod
+    def _check_deadline(deadline: Optional[float], cancel: Optional[threading.Event]):
+        if cancel is not None and cancel.is_set():
+            raise LLMDeadlineExceeded("call cancelled")
+        if deadline is not None and time.monotonic() >= deadline:
+            raise LLMDeadlineExceeded("call passed its deadline")
+
+    def _stream(self, model: str, prompt: str, options: Dict, timeout: float, stats: Dict,
+                deadline: Optional[float] = None, cancel: Optional[threading.Event] = None) -> Iterable[str]:
+        """
+        Yield response fragments; the HTTP response is closed when the caller stops iterating.
+        Token counts come from Ollama's final chunk, or the fragment count when stopped early.
+        The read timeout resets on every chunk, so `deadline` and `cancel` are checked per
+        chunk as well (and a silent server is cut off at the deadline by the read timeout).
+        """
+        self._check_deadline(deadline, cancel)
+        read_timeout = timeout if deadline is None else max(0.01, min(timeout, deadline - time.monotonic()))
+        response = self.session.post(
+            f"{self.base_url}/api/generate",
+            json={"model": model, "prompt": prompt, "stream": True, "options": options},
+            timeout=(self.connect_timeout, read_timeout),
+            stream=True
+        )
+        try:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                self._check_deadline(deadline, cancel)
+                if not line:
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except ValueError as e:
+                    raise LLMMalformedResponse(f"invalid stream chunk: {line[:80]!r}") from e
+                if chunk.get('error'):
+                    raise requests.exceptions.RequestException(chunk['error'])
+                if stats.get('first_token') is None:
+                    stats['first_token'] = time.monotonic()
+                stats['completion_tokens'] = stats.get('completion_tokens', 0) + 1
+                yield chunk.get('response', '')
+                if chunk.get('done'):
+                    stats['prompt_tokens'] = chunk.get('prompt_eval_count', 0)
+                    stats['completion_tokens'] = chunk.get('eval_count', stats['completion_tokens'])
+                    break
+        finally:
+            response.close()
+
+    def generate(self, prompt: str, model: str = "llama2", options: Optional[Dict] = None, timeout: float = 60,
+                 deadline: Optional[float] = None, cancel: Optional[threading.Event] = None) -> str:
+        """Full text completion (streamed); raises requests exceptions on transport errors"""
+        options = options or {}
+        cached = self._cached(model, options, prompt)
+        if cached is not None:
+            return cached
+        text = self._guarded(lambda stats: ''.join(self._stream(model, prompt, options, timeout, stats, deadline, cancel)))
+        if text and self.cache is not None:
+            self.cache.put(model, options, prompt, text)
+        return text
+
+    def generate_json(self, prompt: str, model: str = "llama2", options: Optional[Dict] = None,
+                      timeout: float = 60, required_keys: Iterable[str] = (), deadline: Optional[float] = None,
+                      cancel: Optional[threading.Event] = None) -> str:
+        """
+        Text of the first JSON object in the completion that parses and has
+        `required_keys`, or "" when the model did not produce one.
+        Raises LLMDeadlineExceeded once `deadline` passes or `cancel` is set.
+        """
+        options = options or {}
+        cached = self._cached(model, options, prompt)
+        if cached is not None:
+            return cached
+
+        result = self._guarded(lambda stats: self._first_object(
+            model, prompt, options, timeout, tuple(required_keys), stats, deadline, cancel
+        ))
+        if result and self.cache is not None:
+            self.cache.put(model, options, prompt, result)
+        return result
+
+    def _first_object(self, model: str, prompt: str, options: Dict, timeout: float, required_keys, stats: Dict,
+                      deadline: Optional[float] = None, cancel: Optional[threading.Event] = None) -> str:
+        scanner = JSONObjectScanner()
+        stream = self._stream(model, prompt, options, timeout, stats, deadline, cancel)
+        try:
+            for fragment in stream:
+                candidate = scanner.feed(fragment)
+                while candidate is not None:
+                    if self._acceptable(candidate, required_keys):
+                        return candidate
+                    candidate = scanner.resume()
+                if scanner.hopeless:
+                    break
+        finally:
+            stream.close()
+        return ""
+
+    @staticmethod
+    def _acceptable(candidate: str, required_keys) -> bool:
+        try:
+            parsed = json.loads(candidate)
+        except json.JSONDecodeError:
+            return False
+        return isinstance(parsed, dict) and all(key in parsed for key in required_keys)
@@ -0,0 +1,67 @@
+"""
+Mass Action Pipeline
+Resolves a passenger selection in one indexed pass, builds the action records as a batch and commits them in one write
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+from action_store import ActionStore
+from data_store import DataStore
+from job_runner import Job
+
+# Selections larger than this run as a background job (the request gets a job handle)
+DEFAULT_JOB_THRESHOLD = 500
+
+# Records built between job progress updates
+PROGRESS_CHUNK = 100
+
+
+def is_passenger_id_list(passenger_ids) -> bool:
+    """True for a JSON list of passenger id strings (what selection endpoints accept)"""
+    return isinstance(passenger_ids, list) and all(isinstance(pid, str) for pid in passenger_ids)
+
+
+def resolve_selection(data_store: DataStore, passenger_ids: List) -> Tuple[List[Tuple[str, Dict]], List[Dict]]:
+    """
+    (passenger_id, passenger) pairs for the known ids in selection order, and one
+    failure entry per id that is unknown, repeated or not a string
+    """
+    resolved, failures, seen = [], [], set()
+    valid = [pid for pid in passenger_ids if isinstance(pid, str)]
+    passengers = data_store.get_passengers(valid)
+    for passenger_id in passenger_ids:
+        if not isinstance(passenger_id, str):
+            failures.append({"passenger_id": passenger_id, "error": "Invalid passenger id"})
+        elif passenger_id in seen:
+            failures.append({"passenger_id": passenger_id, "error": "Duplicate passenger id in selection"})
+        elif passengers.get(passenger_id) is None:
+            failures.append({"passenger_id": passenger_id, "error": "Passenger not found"})
+        else:
+            resolved.append((passenger_id, passengers[passenger_id]))
+        if isinstance(passenger_id, str):
+            seen.add(passenger_id)
+    return resolved, failures
+
+
+def run_mass_action(data_store: DataStore, action_store: ActionStore, action_type: str, passenger_ids: List,
+                    build_record: Callable[[str, Dict], Dict], job: Optional[Job] = None) -> Dict:
+    """
+    Resolve, build `build_record(passenger_id, passenger)` for every known passenger,
+    then commit all records with one action_store.extend. With a job, progress counts
+    failed and prepared passengers as the batch is built.
+    Returns {"records": [...], "processed": n, "failed": [{"passenger_id", "error"}, ...]}.
+    """
+    resolved, failures = resolve_selection(data_store, passenger_ids)
+    if job is not None:
+        job.set_total(len(passenger_ids))
+        job.advance("failed", len(failures))
+
+    records = []
+    for start in range(0, len(resolved), PROGRESS_CHUNK):
+        chunk = resolved[start:start + PROGRESS_CHUNK]
+        records.extend(build_record(passenger_id, passenger) for passenger_id, passenger in chunk)
+        if job is not None:
+            job.advance("prepared", len(chunk))
+
+    action_store.extend(action_type, records)
+    return {"records": records, "processed": len(records), "failed": failures}
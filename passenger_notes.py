@@ -0,0 +1,266 @@
+"""
+Personalized Passenger Notes
+LLM prompts for per-passenger service-recovery notes, batching passengers with the same profile into one call
+"""
+
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+from llm_client import OllamaClient
+
+NOTE_MODEL = "llama2"
+NOTE_OPTIONS = {"temperature": 0.8, "num_predict": 180}
+NOTE_TIMEOUT = 30
+
+# Passengers sharing one batched prompt
+DEFAULT_BATCH_SIZE = 8
+
+# Longest note accepted from a batched answer (the prompt asks for under 120 words)
+MAX_NOTE_WORDS = 200
+
+# What each service level is entitled to
+SERVICE_BENEFITS = {
+    'VIP/Executive': "executive lounge access, priority rebooking, concierge service, complimentary upgrades.",
+    'Premium': "lounge access, standard priority rebooking, meal vouchers.",
+    'Standard': "standard rebooking, meal vouchers, compensation per regulations.",
+}
+
+
+def note_profile(passenger: Dict) -> Dict:
+    """Service guidelines that depend only on tier, cabin, SSR and connection"""
+    loyalty_tier = passenger.get('loyalty_tier', 'Guest')
+    ticket_class = passenger.get('ticket_class', passenger.get('fare_class_name', 'Economy'))
+    ssr = passenger.get('special_service_request')
+    next_dest = passenger.get('next_segment_arrival_iataCode', 'None')
+
+    # Build tier-specific context
+    if loyalty_tier in ['Platinum', 'Gold']:
+        service_level = "VIP/Executive"
+        tier_benefits = f"This {loyalty_tier} tier passenger should receive: {SERVICE_BENEFITS[service_level]}"
+    elif loyalty_tier == 'Silver':
+        service_level = "Premium"
+        tier_benefits = f"This Silver tier passenger should receive: {SERVICE_BENEFITS[service_level]}"
+    else:
+        service_level = "Standard"
+        tier_benefits = f"This standard tier passenger should receive: {SERVICE_BENEFITS[service_level]}"
+
+    # Build class-specific compensation
+    if ticket_class in ['First', 'Business']:
+        class_compensation = "As a premium cabin passenger, offer suite upgrades, premium hotel options, or cash compensation at higher tier."
+    else:
+        class_compensation = "As an economy/premium economy passenger, standard compensation and meal vouchers apply."
+
+    # Build special needs context
+    special_needs = ""
+    if ssr:
+        special_needs = f"IMPORTANT: Passenger has special service requirement ({ssr}) - ensure dedicated assistance and priority handling."
+
+    has_connection = bool(next_dest and next_dest != 'None')
+
+    return {
+        'loyalty_tier': loyalty_tier,
+        'service_level': service_level,
+        'ticket_class': ticket_class,
+        'ssr': ssr,
+        'next_dest': next_dest,
+        'has_connection': has_connection,
+        'tier_benefits': tier_benefits,
+        'class_compensation': class_compensation,
+        'special_needs': special_needs,
+    }
+
+
+def profile_key(passenger: Dict, flight: Dict, delay_minutes) -> Tuple:
+    """
+    Passengers with equal keys get the same guidelines and can share a batched prompt:
+    flight and delay, service level, cabin group, whether they have an SSR and a connection.
+    The exact tier, cabin, SSR and connection go on each passenger's roster line.
+    """
+    profile = note_profile(passenger)
+    return (
+        flight.get('flight_number'), delay_minutes, profile['service_level'], profile['class_compensation'],
+        bool(profile['special_needs']), profile['has_connection']
+    )
+
+
+def single_note_prompt(passenger: Dict, flight: Dict, delay_minutes) -> str:
+    """Prompt for one passenger's note"""
+    profile = note_profile(passenger)
+    next_dest = profile['next_dest']
+
+    # Build connection context
+    if profile['has_connection']:
+        connection_context = f"Passenger has tight connection to {next_dest}. Prioritize rebooking to preserve connection. If connection cannot be guaranteed, offer alternative routing."
+    else:
+        connection_context = "Passenger has no onward connection - focus on comfort and compensation."
+
+    return f"""You are an airline disruption manager providing personalized service recovery. Generate a unique, tailored recommendation.
+
+PASSENGER PROFILE:
+- Name: {passenger.get('passenger_name', 'Unknown')}
+- Loyalty Status: {profile['loyalty_tier']} ({profile['service_level']} Service Level)
+- Ticket Class: {profile['ticket_class']}
+- Flight: {flight.get('flight_number')} ({flight.get('origin')} → {flight.get('destination')})
+- Delay: {delay_minutes} minutes
+- Next Connection: {next_dest}
+
+SERVICE GUIDELINES:
+{profile['tier_benefits']}
+{profile['class_compensation']}
+{profile['special_needs'] if profile['special_needs'] else ''}
+{connection_context}
+
+Generate a PERSONALIZED recommendation (2-3 sentences) that:
+1. Reflects their loyalty tier and service level
+2. Offers tier-appropriate solutions (mention specific benefits like lounge, concierge, upgrades for high tiers)
+3. Addresses their specific situation (connection, special needs, etc.)
+4. Provides concrete next steps
+
+IMPORTANT: Make it DIFFERENT for each tier. Platinum/Gold get executive treatment, Silver gets standard premium, others get basic + compensation.
+
+Keep response under 120 words and make it sound personal and empathetic."""
+
+
+def _roster_line(key: str, passenger: Dict, profile: Dict) -> str:
+    """A passenger's line in a batched prompt, with the details their note is personalised on"""
+    details = [f"{profile['loyalty_tier']} tier", profile['ticket_class']]
+    if profile['ssr']:
+        details.append(f"SSR: {profile['ssr']}")
+    details.append(f"Next Connection: {profile['next_dest']}")
+    return f"- {key}: {passenger.get('passenger_name', 'Unknown')} ({', '.join(details)})"
+
+
+def batch_note_prompt(passengers: List[Dict], flight: Dict, delay_minutes) -> Tuple[str, List[str]]:
+    """
+    One prompt for several passengers with the same profile_key: the shared guidelines
+    once, then one line per passenger (name, tier, cabin, SSR, connection) under a
+    short key (P1, P2, ...). Returns the prompt and the keys in passenger order.
+    """
+    profiles = [note_profile(p) for p in passengers]
+    profile = profiles[0]
+    keys = [f"P{i + 1}" for i in range(len(passengers))]
+    if profile['has_connection']:
+        connection_context = "Each passenger has a tight connection to the listed destination. Prioritize rebooking to preserve it. If it cannot be guaranteed, offer alternative routing."
+    else:
+        connection_context = "These passengers have no onward connection - focus on comfort and compensation."
+    special_needs = ""
+    if profile['special_needs']:
+        special_needs = "IMPORTANT: Each passenger has the special service requirement shown on their line - ensure dedicated assistance and priority handling."
+
+    roster = "\n".join(_roster_line(key, p, pp) for key, p, pp in zip(keys, passengers, profiles))
+    example = json.dumps({key: "..." for key in keys[:2]})
+
+    prompt = f"""You are an airline disruption manager providing personalized service recovery. Generate a unique, tailored recommendation for EACH passenger below.
+
+SHARED PROFILE:
+- Service Level: {profile['service_level']}
+- Flight: {flight.get('flight_number')} ({flight.get('origin')} → {flight.get('destination')})
+- Delay: {delay_minutes} minutes
+
+PASSENGERS:
+{roster}
+
+SERVICE GUIDELINES:
+Passengers at the {profile['service_level']} service level should receive: {SERVICE_BENEFITS[profile['service_level']]}
+{profile['class_compensation']}
+{special_needs}
+{connection_context}
+
+Each recommendation (2-3 sentences, under 120 words) must address the passenger by name, reflect their own loyalty tier and cabin, offer tier-appropriate solutions, address their special needs and connection, and give concrete next steps. Make them personal and empathetic.
+
+Return ONLY a JSON object mapping every passenger key to its recommendation, e.g. {example}"""
+    return prompt, keys
+
+
+def parse_batch_notes(text: str, keys: List[str]) -> Dict[str, str]:
+    """Valid notes from a batched answer, by key; missing, empty or oversized entries are left out"""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end <= start:
+        return {}
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(parsed, dict):
+        return {}
+    notes = {}
+    for key in keys:
+        note = parsed.get(key)
+        if isinstance(note, str) and note.strip() and len(note.split()) <= MAX_NOTE_WORDS:
+            notes[key] = note.strip()
+    return notes
+
+
+class PassengerNoteGenerator:
+    """
+    Generates notes through an OllamaClient. notes() groups passengers by
+    profile_key, sends each group in batches of `batch_size`, and retries
+    individually only the passengers whose entry was missing or invalid
+    (a batch that failed on transport is not retried per passenger).
+    With `on_note`, each note is reported as soon as its own chunk settles.
+    """
+
+    def __init__(self, llm: OllamaClient, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.llm = llm
+        self.batch_size = max(1, batch_size)
+
+    def note(self, passenger: Dict, flight: Dict, delay_minutes) -> Optional[str]:
+        """One passenger, one call; None when the LLM is unavailable"""
+        try:
+            text = self.llm.generate(
+                single_note_prompt(passenger, flight, delay_minutes),
+                model=NOTE_MODEL,
+                options=NOTE_OPTIONS,
+                timeout=NOTE_TIMEOUT
+            )
+            if text:
+                return text.strip()
+        except Exception as e:
+            print(f"Ollama error: {e}")
+        return None
+
+    def notes(self, items: List[Tuple[Dict, Dict, int]],
+              on_note: Optional[Callable[[int, Optional[str]], None]] = None) -> List[Optional[str]]:
+        """
+        Notes for (passenger, flight, delay_minutes) items, in input order.
+        on_note(index, note) is called for every item as its chunk settles (note None on failure).
+        """
+        results: List[Optional[str]] = [None] * len(items)
+        groups: Dict[Tuple, List[int]] = {}
+        for index, (passenger, flight, delay_minutes) in enumerate(items):
+            groups.setdefault(profile_key(passenger, flight, delay_minutes), []).append(index)
+
+        for indexes in groups.values():
+            for start in range(0, len(indexes), self.batch_size):
+                chunk = indexes[start:start + self.batch_size]
+                notes = self._batch([items[i] for i in chunk]) if len(chunk) > 1 else {}
+                retries = []
+                for position, index in enumerate(chunk):
+                    if notes is not None and notes.get(position) is None:
+                        retries.append(index)
+                        continue
+                    results[index] = notes.get(position) if notes is not None else None
+                    self._report(on_note, index, results[index])
+                # Entries the batched answer got right are out before the one-by-one retries
+                for index in retries:
+                    results[index] = self.note(*items[index])
+                    self._report(on_note, index, results[index])
+        return results
+
+    @staticmethod
+    def _report(on_note, index: int, note: Optional[str]):
+        if on_note is not None:
+            on_note(index, note)
+
+    def _batch(self, chunk: List[Tuple[Dict, Dict, int]]) -> Optional[Dict[int, str]]:
+        """Notes by position within the chunk for the entries the batched answer got right; None if the call failed"""
+        _, flight, delay_minutes = chunk[0]
+        prompt, keys = batch_note_prompt([passenger for passenger, _, _ in chunk], flight, delay_minutes)
+        options = {**NOTE_OPTIONS, "num_predict": NOTE_OPTIONS["num_predict"] * len(chunk)}
+        try:
+            text = self.llm.generate_json(prompt, model=NOTE_MODEL, options=options, timeout=NOTE_TIMEOUT * 2)
+        except Exception as e:
+            print(f"Ollama error: {e}")
+            return None
+        notes = parse_batch_notes(text, keys)
+        return {position: notes[key] for position, key in enumerate(keys) if key in notes}
@@ -0,0 +1,132 @@
+"""
+Columnar Passenger Table
+NumPy columns over the passenger records (dictionary-encoded categoricals and flags) for vectorized analytics
+"""
+
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+from aviation_constants import MINIMUM_CONNECTING_TIME, DEFAULT_MINIMUM_CONNECTING_TIME
+
+# Dictionary-encoded columns: name -> getter on the passenger record
+CATEGORICAL_COLUMNS = {
+    'flight_id': lambda p: p.get('flight_id'),
+    'flight_number': lambda p: p.get('flight_number'),
+    'pnr': lambda p: p.get('pnr'),
+    'loyalty_tier': lambda p: p.get('loyalty_tier'),
+    'fare_class': lambda p: p.get('fare_class'),
+    'ticket_class': lambda p: p.get('ticket_class', p.get('fare_class_name', 'Economy')),
+    'segment_departure_iataCode': lambda p: p.get('segment_departure_iataCode'),
+    'segment_arrival_iataCode': lambda p: p.get('segment_arrival_iataCode'),
+    'next_segment_departure_iataCode': lambda p: p.get('next_segment_departure_iataCode'),
+    'next_segment_arrival_iataCode': lambda p: p.get('next_segment_arrival_iataCode'),
+}
+
+# Boolean columns: name -> getter
+FLAG_COLUMNS = {
+    'has_ssr': lambda p: bool(p.get('special_service_request')),
+    'has_connecting_flight': lambda p: bool(p.get('connecting_flight')),
+}
+
+
+class Categorical:
+    """Values as int32 codes into `categories`; None is code -1"""
+
+    def __init__(self, values: Iterable):
+        lookup: Dict = {}
+        codes = []
+        for value in values:
+            if value is None:
+                codes.append(-1)
+            else:
+                codes.append(lookup.setdefault(value, len(lookup)))
+        self.lookup = lookup
+        self.categories = list(lookup)
+        self.codes = np.array(codes, dtype=np.int32)
+        # Rows grouped by code, for O(matches) lookups of a single value
+        self._order = np.argsort(self.codes, kind='stable')
+        self._sorted = self.codes[self._order]
+
+    def codes_for(self, values: Iterable) -> List[int]:
+        return [self.lookup[v] for v in values if v in self.lookup]
+
+    def rows_for(self, value) -> np.ndarray:
+        """Row positions holding `value`, ascending"""
+        code = self.lookup.get(value)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        start, end = np.searchsorted(self._sorted, [code, code + 1])
+        return self._order[start:end].astype(np.int64)
+
+    def rows_in(self, values: Iterable) -> np.ndarray:
+        """Row positions holding any of `values`, ascending"""
+        return np.flatnonzero(np.isin(self.codes, self.codes_for(values)))
+
+    def isin(self, rows: np.ndarray, values: Iterable) -> np.ndarray:
+        return np.isin(self.codes[rows], self.codes_for(values))
+
+    def per_category(self, table: Sequence, default) -> np.ndarray:
+        """Map `table` (one entry per category, plus `default` for None) over the codes"""
+        return np.asarray(list(table) + [default])[self.codes]
+
+    def decode(self, rows: np.ndarray, missing=None) -> np.ndarray:
+        return np.array(self.categories + [missing], dtype=object)[self.codes[rows]]
+
+    def counts(self, rows: np.ndarray) -> Dict:
+        """Occurrences of each value among `rows` (None excluded)"""
+        codes = self.codes[rows]
+        tally = np.bincount(codes[codes >= 0], minlength=len(self.categories))
+        return {category: int(n) for category, n in zip(self.categories, tally) if n}
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self._order.nbytes + self._sorted.nbytes
+
+
+class PassengerTable:
+    """
+    Column view over the passenger records, built once per load. Row positions match
+    the record list, so endpoints filter and aggregate on the columns and only fetch
+    the records (records_at) for the rows they return.
+    """
+
+    def __init__(self, records: Sequence[Dict]):
+        self.records = records
+        self.size = len(records)
+        self.categorical = {name: Categorical(get(p) for p in records) for name, get in CATEGORICAL_COLUMNS.items()}
+        self.flags = {name: np.fromiter((get(p) for p in records), dtype=bool, count=self.size)
+                      for name, get in FLAG_COLUMNS.items()}
+
+        # Per-row rule inputs that only depend on the connection airport
+        airports = self.categorical['next_segment_arrival_iataCode']
+        self._mct = airports.per_category(
+            [MINIMUM_CONNECTING_TIME.get(a, DEFAULT_MINIMUM_CONNECTING_TIME) for a in airports.categories],
+            DEFAULT_MINIMUM_CONNECTING_TIME
+        ).astype(np.int64)
+        self._has_connection = self.flags['has_connecting_flight'] & airports.per_category(
+            [bool(a) for a in airports.categories], False
+        ).astype(bool)
+
+    def rows_for(self, column: str, value) -> np.ndarray:
+        """Row positions where a categorical column equals `value`"""
+        return self.categorical[column].rows_for(value)
+
+    def records_at(self, rows: Iterable[int]) -> List[Dict]:
+        return [self.records[i] for i in rows]
+
+    def eligibility_columns(self, rows: np.ndarray, delay_minutes) -> Dict[str, np.ndarray]:
+        """eligibility_engine rule inputs for `rows`, read from the columns"""
+        return {
+            'delay_minutes': np.broadcast_to(np.asarray(delay_minutes, dtype=np.float64), (len(rows),)),
+            'has_connection': self._has_connection[rows],
+            'mct': self._mct[rows],
+            'loyalty_tier': self.categorical['loyalty_tier'].decode(rows, missing=''),
+            'has_ssr': self.flags['has_ssr'][rows],
+            'ticket_class': self.categorical['ticket_class'].decode(rows),
+        }
+
+    def stats(self) -> Dict:
+        column_bytes = sum(c.nbytes for c in self.categorical.values())
+        column_bytes += sum(a.nbytes for a in self.flags.values())
+        return {'rows': self.size, 'column_bytes': column_bytes}
@@ -0,0 +1,130 @@
+"""
+Disruption Prompt Builder
+Reduces a disruption to aggregate passenger counts and histograms so LLM prompts stay within a token budget
+"""
+
+import json
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from disruption_detector import expand_disruption
+
+# Estimated prompt tokens allowed per disruption
+DEFAULT_TOKEN_BUDGET = 1500
+
+# Rough chars-per-token ratio for English/JSON text with llama-family tokenizers
+CHARS_PER_TOKEN = 4
+
+# Flight-level fields passed through to the LLM as-is
+FLIGHT_FIELDS = (
+    'disruption_id', 'flight_number', 'flight_date', 'origin', 'destination', 'disruption_type',
+    'disruption_status', 'disruption_reason', 'severity', 'delay_minutes', 'scheduled_departure',
+    'estimated_departure', 'requires_rebooking', 'requires_accommodation', 'estimated_cost_impact'
+)
+
+# Flight fields dropped first when a summary is over budget
+OPTIONAL_FLIGHT_FIELDS = ('scheduled_departure', 'estimated_departure', 'estimated_cost_impact', 'disruption_reason')
+
+# Histogram buckets kept per histogram at each reduction level (None = all, 0 = counts only)
+HISTOGRAM_LIMITS = (None, 8, 4, 0)
+
+PROMPT_HEADER = (
+    "You are an airline disruption management assistant. Generate ONLY valid JSON output (no text before or after) based on this disruption. "
+    "Use this exact JSON schema: {schema}. "
+    "Return a JSON object with the same keys, adapting values for this disruption. "
+)
+
+
+def _dumps(data) -> str:
+    return json.dumps(data, separators=(',', ':'))
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of `text`"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def _histogram(values) -> Dict[str, int]:
+    counts = Counter(str(v) if v not in (None, '') else 'None' for v in values)
+    return dict(counts.most_common())
+
+
+def _truncate(histogram: Dict[str, int], limit) -> Dict[str, int]:
+    """Keep the `limit` largest buckets and fold the rest into 'other'"""
+    if limit is None or len(histogram) <= limit:
+        return histogram
+    items = list(histogram.items())
+    kept = dict(items[:limit])
+    kept['other'] = sum(count for _, count in items[limit:])
+    return kept
+
+
+def summarize_passengers(disruption: Dict) -> Dict:
+    """Aggregate counts, tier/cabin histograms and connection-risk buckets of a disruption's passengers"""
+    data = expand_disruption(disruption)
+    affected = data.get('affected_passenger_list', [])
+    connecting = data.get('connecting_passenger_list', [])
+    return {
+        'total': len(affected),
+        'high_value': len(data.get('high_value_passenger_list', [])),
+        'connecting': len(connecting),
+        'connection_risk': _histogram(p.get('connection_risk') for p in connecting),
+        'loyalty_tiers': _histogram(p.get('loyalty_tier') for p in affected),
+        'cabins': _histogram(p.get('fare_class_name') or p.get('fare_class') for p in affected),
+        'special_service_requests': _histogram(
+            p['special_service_request'] for p in affected if p.get('special_service_request')
+        ),
+        'checked_in': sum(1 for p in affected if p.get('check_in_status') == 'Checked In'),
+    }
+
+
+class PromptBuilder:
+    """
+    Builds the recommendation prompt for a disruption from its flight fields and a
+    passenger summary instead of the full passenger lists. When the prompt is over
+    `token_budget`, histograms are truncated step by step, then optional flight
+    fields are dropped; the smallest form is used even if still over budget.
+    """
+
+    def __init__(self, schema: Dict, token_budget: int = DEFAULT_TOKEN_BUDGET):
+        self.header = PROMPT_HEADER.format(schema=_dumps(schema))
+        self.token_budget = token_budget
+
+    def build(self, disruption: Dict) -> Tuple[str, Dict]:
+        """Prompt text plus size stats: estimated tokens, level used and the legacy full-dump estimate"""
+        expanded = expand_disruption(disruption)
+        summary = summarize_passengers(expanded)
+        flight = {field: disruption.get(field) for field in FLIGHT_FIELDS if field in disruption}
+
+        for level, payload in enumerate(self._reductions(flight, summary)):
+            prompt = f"{self.header}Disruption data: {_dumps(payload)}"
+            tokens = estimate_tokens(prompt)
+            if tokens <= self.token_budget:
+                break
+
+        stats = {
+            'disruption_id': disruption.get('disruption_id'),
+            'estimated_tokens': tokens,
+            # The legacy prompt dumped the expanded record with all three passenger lists
+            'legacy_estimated_tokens': estimate_tokens(
+                f"{self.header}Disruption data: {json.dumps(expanded)}"
+            ),
+            'reduction_level': level,
+            'within_budget': tokens <= self.token_budget,
+        }
+        return prompt, stats
+
+    @staticmethod
+    def _reductions(flight: Dict, summary: Dict) -> List[Dict]:
+        """Candidate payloads from most to least detailed"""
+        candidates = []
+        for limit in HISTOGRAM_LIMITS:
+            passengers = {
+                key: _truncate(value, limit) if isinstance(value, dict) else value
+                for key, value in summary.items()
+                if not (isinstance(value, dict) and (limit == 0 or not value))
+            }
+            candidates.append({**flight, 'passengers': passengers})
+        trimmed = {k: v for k, v in flight.items() if k not in OPTIONAL_FLIGHT_FIELDS}
+        candidates.append({**trimmed, 'passengers': candidates[-1]['passengers']})
+        return candidates
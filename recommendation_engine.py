@@ -3,17 +3,70 @@ AI Decision Recommendation Engine
 Generates rebooking, compensation, and communication options for disrupted flights and affected passengers
 """
 
+import argparse
 import json
+import threading
+import time
 import requests
-from typing import List, Dict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, List, Dict, Optional
 from datetime import datetime
 
+from disruption_detector import affected_passenger_count
+from json_export import write_json_stream
+from llm_cache import LLMCache, open_cache
+from llm_client import OllamaClient
+from prompt_builder import DEFAULT_TOKEN_BUDGET, PromptBuilder
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_CALL_TIMEOUT = 60  # seconds per LLM call
+
+# Keys an LLM answer must contain to be used instead of the fallback
+REQUIRED_KEYS = ("disruption_id", "flight_number", "flight_date")
+
+# JSON shape the LLM is asked to fill in for each disruption
+RECOMMENDATION_SCHEMA = {
+    "disruption_id": "string",
+    "flight_number": "string",
+    "flight_date": "string",
+    "rebooking_options": [
+        {"flight_number": "EY130", "new_departure_time": "2025-11-27T23:00:00", "new_arrival_time": "2025-11-28T07:00:00", "passenger_count": 100}
+    ],
+    "vouchers": [
+        {"type": "meal", "amount": 50, "currency": "USD", "quantity": 100}
+    ],
+    "compensation": [
+        {"type": "monetary", "amount": 400, "currency": "USD", "passenger_count": 100}
+    ],
+    "communications": [
+        {"channel": "email", "recipient_group": "all_affected", "message_template": "Your flight has been disrupted. Compensation details: ..."}
+    ],
+    "operational_actions": [
+        {"action": "arrange_transport", "details": "Bus from terminal to hotel"}
+    ],
+    "cost_optimization": [
+        {"measure": "use_hotel_voucher_instead_of_cash", "estimated_saving": 5000, "currency": "USD"}
+    ]
+}
+
 class RecommendationEngine:
-    """Engine to generate recommendations for disruptions"""
-    def __init__(self, disruptions_path: str, flights_path: str = None, passengers_path: str = None, bookings_path: str = None, resources_path: str = None, disruption_events_path: str = None):
+    """
+    Engine to generate recommendations for disruptions.
+    concurrency: LLM calls in flight at once (1 = serial)
+    call_timeout: deadline in seconds for each disruption's LLM call
+    budget: optional deadline in seconds for the whole run
+    cache: optional LLMCache; identical prompts are answered from it instead of Ollama
+    llm: OllamaClient to share (and its circuit breaker); one is created when omitted
+    token_budget: estimated prompt tokens per disruption (passengers are sent as aggregates)
+    Disruptions whose call misses a deadline get the rule-based fallback.
+    """
+    def __init__(self, disruptions_path: str, flights_path: str = None, passengers_path: str = None, bookings_path: str = None, resources_path: str = None, disruption_events_path: str = None,
+                 concurrency: int = DEFAULT_CONCURRENCY, call_timeout: float = DEFAULT_CALL_TIMEOUT, budget: Optional[float] = None,
+                 cache: Optional[LLMCache] = None, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 llm: Optional[OllamaClient] = None):
         with open(disruptions_path, 'r') as f:
             self.data = json.load(f)
-        self.recommendations = []
+        self._configure(concurrency, call_timeout, budget, cache, token_budget, llm)
         self.flights = []
         self.passengers = []
         self.bookings = []
@@ -35,61 +88,143 @@ class RecommendationEngine:
             with open(disruption_events_path, 'r') as f:
                 self.disruption_events = json.load(f)
 
+    @classmethod
+    def from_records(cls, disruptions: List[Dict], **options) -> 'RecommendationEngine':
+        """Initialize the engine from already-loaded disruption dicts (options as for __init__)"""
+        engine = cls.__new__(cls)
+        engine.data = {'disruptions': disruptions}
+        engine.flights, engine.passengers, engine.bookings, engine.resources, engine.disruption_events = [], [], [], [], []
+        engine._configure(**options)
+        return engine
+
+    def _configure(self, concurrency: int = DEFAULT_CONCURRENCY, call_timeout: float = DEFAULT_CALL_TIMEOUT,
+                   budget: Optional[float] = None, cache: Optional[LLMCache] = None,
+                   token_budget: int = DEFAULT_TOKEN_BUDGET, llm: Optional[OllamaClient] = None):
+        self.cache = cache
+        self.llm = llm or OllamaClient(cache=cache)
+        self.prompt_builder = PromptBuilder(RECOMMENDATION_SCHEMA, token_budget)
+        self.prompt_stats: Dict[str, Dict] = {}
+        self.concurrency = max(1, concurrency)
+        self.call_timeout = call_timeout
+        self.budget = budget
+        self.recommendations = []
+        # Called as on_progress(index, recommendation) as each disruption is settled
+        self.on_progress: Optional[Callable[[int, Dict], None]] = None
+
+    def _settle(self, results: List[Optional[Dict]], index: int, recommendation: Dict):
+        results[index] = recommendation
+        if self.on_progress is not None:
+            self.on_progress(index, recommendation)
+
     def generate_recommendations(self):
-        for disruption in self.data['disruptions']:
-            rec = self._recommend_for_disruption(disruption)
-            self.recommendations.append(rec)
+        disruptions = self.data['disruptions']
+        if self.concurrency == 1:
+            recommendations = self._generate_serial(disruptions)
+        else:
+            recommendations = self._generate_concurrent(disruptions)
+        self.recommendations.extend(recommendations)
         return self.recommendations
 
-    def _query_ollama(self, prompt: str, model: str = "llama2") -> str:
-        """Sends a prompt to the Ollama API and returns the response."""
+    def _call_deadline(self, started: float, run_deadline: Optional[float]) -> float:
+        """Absolute deadline of a call started at `started`: call_timeout, capped by the run budget"""
+        deadline = started + self.call_timeout
+        return min(deadline, run_deadline) if run_deadline is not None else deadline
+
+    def _generate_serial(self, disruptions: List[Dict]) -> List[Dict]:
+        """One call at a time, each cut off at its deadline; once the budget is spent the rest fall back"""
+        run_deadline = time.monotonic() + self.budget if self.budget is not None else None
+        recommendations: List[Optional[Dict]] = [None] * len(disruptions)
+        for index, disruption in enumerate(disruptions):
+            if run_deadline is not None and time.monotonic() >= run_deadline:
+                self._settle(recommendations, index, self._fallback_recommendations(disruption))
+            else:
+                deadline = self._call_deadline(time.monotonic(), run_deadline)
+                self._settle(recommendations, index, self._recommend_for_disruption(disruption, deadline))
+        return recommendations
+
+    def _generate_concurrent(self, disruptions: List[Dict]) -> List[Dict]:
+        """
+        Run up to `concurrency` calls on a thread pool and reassemble results in input order.
+        A call still running past its own deadline (measured from when it started) or past
+        the run budget falls back; the worker stops reading the stream at that deadline and
+        closes it, so queued disruptions get the thread. Calls not yet started when the
+        budget runs out are cancelled.
+        """
+        results: List[Optional[Dict]] = [None] * len(disruptions)
+        started: Dict[int, float] = {}
+        started_lock = threading.Lock()
+        run_deadline = time.monotonic() + self.budget if self.budget is not None else None
+        # Set on exit so calls still streaming for an abandoned disruption stop at their next chunk
+        cancel = threading.Event()
+
+        def run(index: int, disruption: Dict) -> Dict:
+            now = time.monotonic()
+            with started_lock:
+                started[index] = now
+            return self._recommend_for_disruption(disruption, self._call_deadline(now, run_deadline), cancel)
+
+        pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="ollama")
         try:
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={"model": model, "prompt": prompt, "stream": False, "options": {"temperature": 0.0}},
-                timeout=60
+            pending = {pool.submit(run, i, d): i for i, d in enumerate(disruptions)}
+            while pending:
+                now = time.monotonic()
+                with started_lock:
+                    call_deadlines = [started[i] + self.call_timeout for i in pending.values() if i in started]
+                deadlines = call_deadlines + ([run_deadline] if run_deadline is not None else [])
+                timeout = max(0.0, min(deadlines) - now) if deadlines else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    index = pending.pop(future)
+                    try:
+                        recommendation = future.result()
+                    except Exception as e:
+                        print(f"Error generating recommendation: {e}. Falling back to rule-based recommendations.")
+                        recommendation = self._fallback_recommendations(disruptions[index])
+                    self._settle(results, index, recommendation)
+
+                now = time.monotonic()
+                budget_spent = run_deadline is not None and now >= run_deadline
+                with started_lock:
+                    expired = [f for f, i in pending.items()
+                               if budget_spent or (i in started and now >= started[i] + self.call_timeout)]
+                for future in expired:
+                    future.cancel()
+                    index = pending.pop(future)
+                    print(f"LLM call for {disruptions[index].get('disruption_id')} missed its deadline")
+                    self._settle(results, index, self._fallback_recommendations(disruptions[index]))
+        finally:
+            cancel.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        return results
+
+    def _query_ollama(self, prompt: str, model: str = "llama2", deadline: Optional[float] = None,
+                      cancel: Optional[threading.Event] = None) -> str:
+        """Sends a prompt to the Ollama API and returns the response ("" on failure or past `deadline`)."""
+        try:
+            # Streamed; stops generating once a complete object with the required keys arrives
+            return self.llm.generate_json(
+                prompt,
+                model=model,
+                options={"temperature": 0.0},
+                timeout=self.call_timeout,
+                required_keys=REQUIRED_KEYS,
+                deadline=deadline,
+                cancel=cancel
             )
-            response.raise_for_status()
-            return response.json().get("response", "")
         except requests.exceptions.RequestException as e:
             print(f"Error querying Ollama: {e}")
             return ""
 
-    def _recommend_for_disruption(self, disruption: Dict) -> Dict:
+    def _recommend_for_disruption(self, disruption: Dict, deadline: Optional[float] = None,
+                                  cancel: Optional[threading.Event] = None) -> Dict:
         """Generates recommendations for a single disruption using Ollama."""
-        # Prepare prompt for LLM with explicit instructions for JSON-only output
-        json_schema = {
-            "disruption_id": "string",
-            "flight_number": "string",
-            "flight_date": "string",
-            "rebooking_options": [
-                {"flight_number": "EY130", "new_departure_time": "2025-11-27T23:00:00", "new_arrival_time": "2025-11-28T07:00:00", "passenger_count": 100}
-            ],
-            "vouchers": [
-                {"type": "meal", "amount": 50, "currency": "USD", "quantity": 100}
-            ],
-            "compensation": [
-                {"type": "monetary", "amount": 400, "currency": "USD", "passenger_count": 100}
-            ],
-            "communications": [
-                {"channel": "email", "recipient_group": "all_affected", "message_template": "Your flight has been disrupted. Compensation details: ..."}
-            ],
-            "operational_actions": [
-                {"action": "arrange_transport", "details": "Bus from terminal to hotel"}
-            ],
-            "cost_optimization": [
-                {"measure": "use_hotel_voucher_instead_of_cash", "estimated_saving": 5000, "currency": "USD"}
-            ]
-        }
+        # Prompt with flight fields and passenger aggregates (not the passenger lists), JSON-only output
+        prompt, stats = self.prompt_builder.build(disruption)
+        self.prompt_stats[disruption.get('disruption_id')] = stats
         
-        prompt = (
-            "You are an airline disruption management assistant. Generate ONLY valid JSON output (no text before or after) based on this disruption. "
-            f"Use this exact JSON schema: {json.dumps(json_schema)}. "
-            "Return a JSON object with the same keys, adapting values for this disruption. "
-            f"Disruption data: {json.dumps(disruption)}"
-        )
-        
-        llm_output = self._query_ollama(prompt)
+        llm_output = self._query_ollama(prompt, deadline=deadline, cancel=cancel)
 
         if not llm_output:
             return self._fallback_recommendations(disruption)
@@ -106,7 +241,7 @@ class RecommendationEngine:
             try:
                 parsed = json.loads(candidate)
                 # Verify it has the required keys
-                if all(key in parsed for key in ["disruption_id", "flight_number", "flight_date"]):
+                if all(key in parsed for key in REQUIRED_KEYS):
                     return parsed
                 else:
                     return self._fallback_recommendations(disruption)
@@ -117,6 +252,19 @@ class RecommendationEngine:
         # If no valid JSON found, use fallback
         return self._fallback_recommendations(disruption)
     
+    def prompt_size_report(self) -> Dict:
+        """Estimated prompt tokens per disruption against the legacy full-dump prompt"""
+        per_disruption = list(self.prompt_stats.values())
+        total = sum(s['estimated_tokens'] for s in per_disruption)
+        legacy_total = sum(s['legacy_estimated_tokens'] for s in per_disruption)
+        return {
+            'token_budget': self.prompt_builder.token_budget,
+            'estimated_tokens': total,
+            'legacy_estimated_tokens': legacy_total,
+            'over_budget': sum(1 for s in per_disruption if not s['within_budget']),
+            'disruptions': per_disruption,
+        }
+
     def _fallback_recommendations(self, disruption: Dict) -> Dict:
         """Rule-based fallback recommendations when LLM fails."""
         rebooking_options = []
@@ -125,10 +273,12 @@ class RecommendationEngine:
         communications = []
         operational_actions = []
         cost_optimization = []
+        # Detector records are compact (passenger_refs); legacy ones carry affected_passenger_list
+        passenger_count = affected_passenger_count(disruption)
         
         # Condition: Flight delayed >= 3 hours (180 min)
         if disruption.get('delay_minutes', 0) >= 180 and disruption.get('disruption_status') == 'Delayed':
-            for pax in disruption.get('affected_passenger_list', [])[:5]:  # Limit to first 5 for demo
+            for _ in range(min(passenger_count, 5)):  # Limit to first 5 for demo
                 vouchers.append({
                     "type": "meal",
                     "amount": 50,
@@ -142,13 +292,13 @@ class RecommendationEngine:
                 "flight_number": "EY130",
                 "new_departure_time": disruption.get('estimated_departure', ''),
                 "new_arrival_time": disruption.get('estimated_arrival', ''),
-                "passenger_count": len(disruption.get('affected_passenger_list', []))
+                "passenger_count": passenger_count
             })
             compensation.append({
                 "type": "monetary",
                 "amount": 600,
                 "currency": "USD",
-                "passenger_count": len(disruption.get('affected_passenger_list', []))
+                "passenger_count": passenger_count
             })
         
         # Default compensation
@@ -157,7 +307,7 @@ class RecommendationEngine:
                 "type": "monetary",
                 "amount": 400,
                 "currency": "USD",
-                "passenger_count": len(disruption.get('affected_passenger_list', []))
+                "passenger_count": passenger_count
             })
         
         # Communications
@@ -193,18 +343,37 @@ class RecommendationEngine:
             "source": "fallback_rule_based"
         }
 
-    def export_recommendations(self, output_path: str = "recommendations.json"):
-        data = {
-            'generated_at': datetime.now().isoformat(),
-            'recommendations': self.recommendations
-        }
-        # Always export to test_data folder
-        output_path = "test_data/recommendations.json"
-        with open(output_path, 'w') as f:
-            json.dump(data, f, indent=2)
+    def export_recommendations(
+        self,
+        output_path: str = "test_data/recommendations.json",
+        fmt: Optional[str] = None,
+        compress: Optional[bool] = None
+    ):
+        """
+        Stream recommendations to a file one record at a time, written to a temp
+        file and renamed into place. fmt ('json' or 'jsonl') and compress (gzip)
+        default from the file extension.
+        """
+        header = {'generated_at': datetime.now().isoformat()}
+        if self.cache is not None:
+            header['llm_cache'] = self.cache.stats()
+        if self.prompt_stats:
+            header['prompt_sizes'] = self.prompt_size_report()
+        write_json_stream(output_path, header, 'recommendations', self.recommendations, fmt=fmt, compress=compress)
         return output_path
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate recommendations for detected disruptions")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="LLM calls in flight at once (1 = serial)")
+    parser.add_argument("--call-timeout", type=float, default=DEFAULT_CALL_TIMEOUT,
+                        help="Seconds allowed per LLM call before falling back")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Seconds allowed for the whole run; unfinished disruptions fall back")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help="Estimated prompt tokens allowed per disruption")
+    args = parser.parse_args()
+
     print("="*80)
     print("AI DECISION RECOMMENDATION ENGINE - INITIALIZING")
     print("="*80)
@@ -214,11 +383,22 @@ def main():
         passengers_path="test_data/passengers_data.json",
         bookings_path="test_data/bookings_data.json",
         resources_path="test_data/resources_data.json",
-        disruption_events_path="test_data/disruption_events_data.json"
+        disruption_events_path="test_data/disruption_events_data.json",
+        concurrency=args.concurrency,
+        call_timeout=args.call_timeout,
+        budget=args.budget,
+        cache=open_cache(),
+        token_budget=args.token_budget
     )
     engine.generate_recommendations()
     output_file = engine.export_recommendations()
     print(f"\n✅ Recommendations exported to: {output_file}")
+    if engine.prompt_stats:
+        sizes = engine.prompt_size_report()
+        print(f"Prompt size: ~{sizes['estimated_tokens']} tokens (full passenger lists: ~{sizes['legacy_estimated_tokens']})")
+    if engine.cache is not None:
+        stats = engine.cache.stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses ({stats['entries']} entries)")
     print("="*80)
 
 if __name__ == "__main__":
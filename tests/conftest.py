@@ -0,0 +1,50 @@
+import contextlib
+import io
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_detector import generate_flights, generate_passengers
+from disruption_detector import DisruptionDetector
+from fake_ollama import start_server
+
+
+@pytest.fixture(scope="session")
+def detector_records():
+    """(compact disruption dicts, flights, passengers) from the detector over seeded synthetic data"""
+    rng = random.Random(7)
+    flights = generate_flights(30, rng)
+    passengers = generate_passengers(600, flights, rng)
+    detector = DisruptionDetector.from_records(flights, passengers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        events = detector.detect_all_disruptions()
+    return [event.to_dict(detector.passengers_by_id) for event in events], flights, passengers
+
+
+@pytest.fixture
+def fake_ollama():
+    """Start a fake Ollama server with the given FakeOllamaConfig; returns (base_url, stats)"""
+    servers = []
+
+    def start(config):
+        server, url, stats = start_server(config=config)
+        servers.append(server)
+        return url, stats
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Flask test client over the repository's test_data"""
+    monkeypatch.chdir(ROOT)
+    import app
+    return app.app.test_client()
@@ -0,0 +1,29 @@
+import json
+import os
+
+from action_store import ActionJournal
+
+
+def test_compaction_failure_does_not_fail_a_durable_append(tmp_path, monkeypatch):
+    journal = ActionJournal(str(tmp_path), 'meal_coupons.json', compact_threshold=2)
+
+    def broken_compact():
+        raise OSError("disk full")
+
+    monkeypatch.setattr(journal, 'compact', broken_compact)
+    journal.extend([{"id": "1"}, {"id": "2"}])
+    journal.extend([{"id": "3"}])
+
+    assert [r['id'] for r in journal.records()] == ["1", "2", "3"]
+
+
+def test_journal_is_compacted_once_past_the_threshold(tmp_path):
+    journal = ActionJournal(str(tmp_path), 'meal_coupons.json', compact_threshold=2)
+    journal.extend([{"id": "1"}, {"id": "2"}])
+    # The writer compacts after releasing the first batch, before it commits the next one
+    journal.extend([{"id": "3"}])
+
+    with open(journal.snapshot_path) as f:
+        assert [r['id'] for r in json.load(f)] == ["1", "2"]
+    assert os.path.getsize(journal.journal_path) == len(json.dumps({"id": "3"})) + 1
+    assert [r['id'] for r in journal.records()] == ["1", "2", "3"]
@@ -0,0 +1,61 @@
+import threading
+import time
+
+from ai_enrichment import DONE, RUNNING, EnrichmentPool
+
+
+def _pool(generate_batch):
+    """A pool whose bulk worker is parked on a 'hold' item, so later bulk submissions drain together"""
+    hold = threading.Event()
+
+    def generate(name):
+        if name == "hold":
+            hold.wait(5)
+        return f"note {name}"
+
+    pool = EnrichmentPool(generate, workers=1, generate_batch=generate_batch)
+    held = pool.submit("hold", "hold", bulk=True)
+    while pool.get(held["token"])["status"] != RUNNING:
+        time.sleep(0.01)
+    return pool, hold, held
+
+
+def test_interactive_note_does_not_wait_behind_bulk_drain():
+    release = threading.Event()
+
+    def generate_batch(args_list, on_note):
+        release.wait(5)
+        return [f"bulk {args[0]}" for args in args_list]
+
+    pool, hold, held = _pool(generate_batch)
+    bulk = [pool.submit(f"B{i}", f"B{i}", bulk=True) for i in range(10)]
+    hold.set()
+    pool.wait(held["token"], timeout=5)
+    interactive = pool.submit("A1", "A1")
+
+    assert pool.wait(interactive["token"], timeout=2)["ai_personalized_note"] == "note A1"
+    assert pool.get(bulk[-1]["token"])["status"] != DONE
+    release.set()
+    assert [pool.wait(b["token"], timeout=5)["ai_personalized_note"] for b in bulk] == [f"bulk B{i}" for i in range(10)]
+
+
+def test_bulk_notes_are_published_as_their_chunk_returns():
+    first_chunk_out = threading.Event()
+    release = threading.Event()
+
+    def generate_batch(args_list, on_note):
+        on_note(0, f"bulk {args_list[0][0]}")
+        first_chunk_out.set()
+        release.wait(5)
+        for index in range(1, len(args_list)):
+            on_note(index, f"bulk {args_list[index][0]}")
+        return [f"bulk {args[0]}" for args in args_list]
+
+    pool, hold, _ = _pool(generate_batch)
+    tokens = [pool.submit(f"B{i}", f"B{i}", bulk=True)["token"] for i in range(4)]
+    hold.set()
+
+    assert first_chunk_out.wait(5)
+    assert [pool.get(token)["status"] == DONE for token in tokens] == [True, False, False, False]
+    release.set()
+    assert all(pool.wait(token, timeout=5)["status"] == DONE for token in tokens)
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from conftest import ROOT
+
+
+@pytest.fixture(scope="module")
+def flights_and_passengers():
+    with open(f"{ROOT}/test_data/flights_data.json") as f:
+        flights = json.load(f)['flights']
+    with open(f"{ROOT}/test_data/passengers_data.json") as f:
+        passengers = json.load(f)
+    return flights, passengers
+
+
+@pytest.mark.parametrize("passenger_ids", ["P001", {"id": 1}, [{"id": 1}], ["P001", 7], [None]])
+def test_rejects_anything_but_a_list_of_strings(client, passenger_ids):
+    response = client.post('/api/eligibility/bulk', json={"passenger_ids": passenger_ids})
+    assert response.status_code == 400
+    assert "list of passenger id strings" in response.get_json()['error']
+
+
+@pytest.mark.parametrize("kwargs", [{"json": ["P001"]}, {"data": "passenger_ids=P001"}, {"data": "{not json", "content_type": "application/json"}])
+def test_rejects_a_body_that_is_not_a_json_object(client, kwargs):
+    response = client.post('/api/eligibility/bulk', **kwargs)
+    assert response.status_code == 400
+    assert "JSON object" in response.get_json()['error']
+
+
+def test_reports_unknown_and_duplicate_ids(client, flights_and_passengers):
+    _, passengers = flights_and_passengers
+    known = passengers[0]['id']
+    response = client.post('/api/eligibility/bulk', json={"passenger_ids": [known, "NO_SUCH_PAX", known]})
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert [p['passenger_id'] for p in body['passengers']] == [known]
+    assert body['errors'] == [
+        {"passenger_id": "NO_SUCH_PAX", "error": "Passenger not found"},
+        {"passenger_id": known, "error": "Duplicate passenger id in selection"},
+    ]
+
+
+def test_flight_matches_passengers_by_flight_id_or_number(client, flights_and_passengers):
+    flights, passengers = flights_and_passengers
+    flight = flights[0]
+    expected = {p['id'] for p in passengers
+                if p.get('flight_id') == flight['flight_id'] or p.get('flight_number') == flight['flight_number']}
+
+    response = client.post('/api/eligibility/bulk', json={"flight_id": flight['flight_id']})
+    body = response.get_json()
+
+    assert response.status_code == 200
+    assert {p['passenger_id'] for p in body['passengers']} == expected
+    assert body['total'] == len(expected)
+
+
+def test_rejects_non_string_flight_id(client):
+    response = client.post('/api/eligibility/bulk', json={"flight_id": {"id": 1}})
+    assert response.status_code == 400
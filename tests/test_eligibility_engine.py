@@ -0,0 +1,23 @@
+import numpy as np
+
+from eligibility_engine import default_engine
+from passenger_table import PassengerTable
+
+PASSENGER = {'id': 'P1', 'ticket_class': 'Economy', 'connecting_flight': None}
+
+
+def test_fractional_delay_past_threshold_is_disrupted():
+    result = default_engine.evaluate([PASSENGER], delay_minutes=60.5)
+
+    assert result.disrupted[0]
+    assert 'meal' in [v['type'] for v in result.vouchers(0)]
+    assert result.eligibility(0)['reason'].startswith("Disrupted passenger: 60.5min delay")
+
+
+def test_table_rows_keep_fractional_delay():
+    table = PassengerTable([PASSENGER])
+    result = default_engine.evaluate_rows(table, np.array([0]), 60.5)
+
+    assert result.disrupted[0]
+    assert default_engine.evaluate([PASSENGER], delay_minutes=180).eligibility(0)['reason'].startswith(
+        "Disrupted passenger: 180min delay")
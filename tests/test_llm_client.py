@@ -0,0 +1,37 @@
+import contextlib
+import io
+
+import pytest
+
+from fake_ollama import FakeOllamaConfig
+from llm_client import CircuitBreaker, LLMMalformedResponse, OllamaClient
+from recommendation_engine import REQUIRED_KEYS, RecommendationEngine
+
+
+def test_garbage_stream_line_raises_client_error(fake_ollama):
+    url, stats = fake_ollama(FakeOllamaConfig(garbage_rate=1.0))
+    client = OllamaClient(base_url=url)
+
+    with pytest.raises(LLMMalformedResponse):
+        client.generate_json('Disruption data: {"disruption_id": "D1"}', required_keys=REQUIRED_KEYS)
+    with pytest.raises(LLMMalformedResponse):
+        client.generate("Write a short apology note")
+    assert stats.snapshot()['garbage_lines'] == 2
+    assert client.metrics.snapshot()['errors'] == {'LLMMalformedResponse': 2}
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_garbage_stream_line_falls_back(detector_records, fake_ollama, concurrency):
+    url, _ = fake_ollama(FakeOllamaConfig(garbage_rate=1.0))
+    client = OllamaClient(base_url=url, breaker=CircuitBreaker(failure_threshold=100))
+    disruptions = detector_records[0][:6]
+    engine = RecommendationEngine.from_records(disruptions, concurrency=concurrency, llm=client)
+
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        recommendations = engine.generate_recommendations()
+
+    assert [r['source'] for r in recommendations] == ['fallback_rule_based'] * len(disruptions)
+    # Handled in _query_ollama, not by the concurrent path's catch-all
+    assert "Error querying Ollama" in output.getvalue()
+    assert "Error generating recommendation" not in output.getvalue()
@@ -0,0 +1,21 @@
+import pytest
+
+ENDPOINTS = [
+    ('/api/actions/mass-meal-coupons', {}),
+    ('/api/actions/mass-rebookings', {"new_flight_number": "EY 100"}),
+]
+
+
+@pytest.mark.parametrize("url, extra", ENDPOINTS)
+@pytest.mark.parametrize("passenger_ids", ["P001", 7, {"id": "P001"}, ["P001", 7]])
+def test_rejects_anything_but_a_list_of_strings(client, url, extra, passenger_ids):
+    response = client.post(url, json={"passenger_ids": passenger_ids, **extra})
+    assert response.status_code == 400
+    assert "list of passenger id strings" in response.get_json()['error']
+
+
+@pytest.mark.parametrize("url, extra", ENDPOINTS)
+def test_rejects_a_body_that_is_not_a_json_object(client, url, extra):
+    response = client.post(url, json=["P001"])
+    assert response.status_code == 400
+    assert "JSON object" in response.get_json()['error']
@@ -0,0 +1,50 @@
+import json
+
+from conftest import ROOT
+from fake_ollama import FakeOllamaConfig
+from llm_client import OllamaClient
+from passenger_notes import DEFAULT_BATCH_SIZE, PassengerNoteGenerator, batch_note_prompt, profile_key
+
+# Service levels x cabin groups x SSR or not x connection or not
+MAX_PROFILES_PER_FLIGHT = 3 * 2 * 2 * 2
+
+
+def _flight_items():
+    with open(f"{ROOT}/test_data/flights_data.json") as f:
+        flight = json.load(f)['flights'][0]
+    with open(f"{ROOT}/test_data/passengers_data.json") as f:
+        passengers = [p for p in json.load(f) if p['flight_number'] == flight['flight_number']]
+    return [(p, flight, 180) for p in passengers]
+
+
+def test_full_flight_needs_few_calls(fake_ollama):
+    url, _ = fake_ollama(FakeOllamaConfig(latency="0"))
+    client = OllamaClient(base_url=url)
+    items = _flight_items()
+    assert len(items) == 300
+
+    notes = PassengerNoteGenerator(client).notes(items)
+
+    groups = {}
+    for item in items:
+        groups[profile_key(*item)] = groups.get(profile_key(*item), 0) + 1
+    expected_calls = sum(-(-size // DEFAULT_BATCH_SIZE) for size in groups.values())
+    assert all(notes)
+    assert len(groups) <= MAX_PROFILES_PER_FLIGHT
+    assert client.metrics.snapshot()['calls'] == expected_calls
+    assert expected_calls <= len(items) // DEFAULT_BATCH_SIZE + MAX_PROFILES_PER_FLIGHT
+
+
+def test_batch_prompt_lists_each_passengers_details():
+    items = _flight_items()
+    key = profile_key(*items[0])
+    group = [p for p, flight, delay in items if profile_key(p, flight, delay) == key][:DEFAULT_BATCH_SIZE]
+    prompt, keys = batch_note_prompt(group, items[0][1], 180)
+
+    assert keys == [f"P{i + 1}" for i in range(len(group))]
+    for k, passenger in zip(keys, group):
+        line = next(l for l in prompt.splitlines() if l.startswith(f"- {k}: "))
+        assert passenger['passenger_name'] in line
+        assert f"{passenger.get('loyalty_tier', 'Guest')} tier" in line
+        if passenger.get('special_service_request'):
+            assert passenger['special_service_request'] in line
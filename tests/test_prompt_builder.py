@@ -0,0 +1,18 @@
+import json
+
+from disruption_detector import expand_disruption
+from prompt_builder import PromptBuilder, estimate_tokens
+from recommendation_engine import RECOMMENDATION_SCHEMA
+
+
+def test_legacy_estimate_measures_the_expanded_record(detector_records):
+    builder = PromptBuilder(RECOMMENDATION_SCHEMA)
+    for disruption in detector_records[0]:
+        expanded = expand_disruption(disruption)
+        compact_stats = builder.build(disruption)[1]
+        legacy = estimate_tokens(f"{builder.header}Disruption data: {json.dumps(expanded)}")
+
+        assert compact_stats['legacy_estimated_tokens'] == legacy
+        # Compact and expanded inputs describe the same legacy prompt
+        assert builder.build(expanded)[1]['legacy_estimated_tokens'] == legacy
+        assert compact_stats['estimated_tokens'] < legacy
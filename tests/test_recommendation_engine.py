@@ -0,0 +1,65 @@
+import contextlib
+import io
+import time
+
+import pytest
+
+from disruption_detector import expand_disruption
+from fake_ollama import FakeOllamaConfig
+from llm_client import CircuitBreaker, OllamaClient
+from recommendation_engine import RecommendationEngine
+
+
+def _generate(disruptions, client, **options):
+    engine = RecommendationEngine.from_records(disruptions, llm=client, **options)
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        recommendations = engine.generate_recommendations()
+    return recommendations, time.monotonic() - start
+
+
+def _unreachable_client():
+    # Nothing listens on port 9; every call fails and the engine falls back
+    return OllamaClient(base_url="http://127.0.0.1:9", breaker=CircuitBreaker(failure_threshold=1))
+
+
+def test_fallback_counts_passengers_of_compact_records(detector_records):
+    disruptions, _, _ = detector_records
+    recommendations, _ = _generate(disruptions, _unreachable_client(), concurrency=1)
+    fallback = RecommendationEngine.from_records([], llm=_unreachable_client())._fallback_recommendations
+
+    assert all(r['source'] == 'fallback_rule_based' for r in recommendations)
+    for disruption, recommendation in zip(disruptions, recommendations):
+        assert 'passenger_refs' in disruption
+        affected = len(disruption['passenger_refs']['ids'])
+        assert affected > 0
+        assert all(c['passenger_count'] == affected for c in recommendation['compensation'])
+        assert all(r['passenger_count'] == affected for r in recommendation['rebooking_options'])
+        # Same answer as for the legacy expanded shape
+        assert recommendation == fallback(expand_disruption(disruption))
+
+
+def test_fallback_meal_vouchers_for_long_delays(detector_records):
+    disruptions, _, _ = detector_records
+    long_delays = [d for d in disruptions if d['disruption_status'] == 'Delayed' and d['delay_minutes'] >= 180]
+    assert long_delays
+    engine = RecommendationEngine.from_records(long_delays, llm=_unreachable_client())
+    for disruption in long_delays:
+        vouchers = engine._fallback_recommendations(disruption)['vouchers']
+        assert len(vouchers) == min(5, len(disruption['passenger_refs']['ids']))
+
+
+@pytest.mark.parametrize("concurrency, count", [(2, 6), (1, 3)])
+def test_slow_streams_are_cut_off_at_the_call_deadline(detector_records, fake_ollama, concurrency, count):
+    # ~0.05s per fragment: each answer takes several seconds to stream, far past call_timeout
+    url, _ = fake_ollama(FakeOllamaConfig(token_delay=0.05))
+    client = OllamaClient(base_url=url, breaker=CircuitBreaker(failure_threshold=100))
+    disruptions = detector_records[0][:count]
+    call_timeout = 0.5
+
+    recommendations, elapsed = _generate(disruptions, client, concurrency=concurrency, call_timeout=call_timeout)
+
+    assert all(r['source'] == 'fallback_rule_based' for r in recommendations)
+    # Queued disruptions start as soon as a worker's call hits its deadline
+    rounds = -(-count // concurrency)
+    assert elapsed < rounds * call_timeout + 1.5